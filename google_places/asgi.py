@@ -0,0 +1,5 @@
+import os
+from django.core.asgi import get_asgi_application
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'google_places.settings')
+os.environ.setdefault('ASYNC_VIEWS', 'True')
+application = get_asgi_application()
@@ -0,0 +1,210 @@
+"""Async versions of the search, geocoding and place-details endpoints for ASGI serving.
+
+Under WSGI with a single worker, one slow search blocks every other client. Served
+through `asgi.py` (which turns on ASYNC_VIEWS), these views keep the event loop free:
+
+- geocoding goes through the provider's async path (`upstream.get_async_client()` for
+  live calls) and is awaited on the loop;
+- the grid search itself, which fans out over a thread pool, coalesces through the
+  shared cache and waits on the rate limiter, runs unchanged on a worker thread
+  (ASYNC_VIEW_THREADS of them), so many searches and their upstream calls are in
+  flight at once while the loop keeps accepting and streaming to clients;
+- NDJSON/SSE streams are pulled from the search generator on a worker thread, one
+  event at a time;
+- batch job results streamed with `?wait=true` are polled from the event loop
+  (`batch_jobs.aiter_items`), so a client waiting on a long job holds no thread.
+
+The classes keep the names of their `views.py` counterparts, so `urls.py` picks one
+module or the other. Responses are identical to the sync views'.
+"""
+import asyncio
+import contextvars
+import functools
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.conf import settings
+from rest_framework.views import APIView
+
+import batch_jobs
+import geocoding
+import metrics
+import views
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=getattr(settings, 'ASYNC_VIEW_THREADS', 64),
+                                               thread_name_prefix='async-view')
+    return _executor
+
+
+async def run_in_thread(func, *args, **kwargs):
+    """Await `func(*args, **kwargs)` run on a worker thread, in a copy of the current context."""
+    context = contextvars.copy_context()
+    return await asyncio.get_running_loop().run_in_executor(
+        _get_executor(), functools.partial(context.run, func, *args, **kwargs))
+
+
+async def iterate_in_thread(iterator):
+    """Async iterator over a blocking iterator, advancing it on a worker thread."""
+    iterator = iter(iterator)
+    done = object()
+    try:
+        while True:
+            item = await run_in_thread(next, iterator, done)
+            if item is done:
+                return
+            yield item
+    finally:
+        # Client went away mid-stream: let the search generator clean up off the loop
+        close = getattr(iterator, 'close', None)
+        if close is not None:
+            _get_executor().submit(close)
+
+
+class AsyncAPIView(APIView):
+    """APIView whose handlers are coroutines; DRF's own dispatch only calls sync handlers."""
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+        try:
+            # Authentication may touch the session store, which must not run on the loop
+            await run_in_thread(self.initial, request, *args, **kwargs)
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+            response = handler(request, *args, **kwargs)
+            if asyncio.iscoroutine(response):
+                response = await response
+        except Exception as exc:
+            response = self.handle_exception(exc)
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        if self.response.streaming and not self.response.is_async:
+            self.response.streaming_content = iterate_in_thread(self.response.streaming_content)
+        return self.response
+
+
+class AsyncSearchMixin(AsyncAPIView):
+    """Geocode `address` on the event loop, then run the sync search handler on a worker thread."""
+
+    _geocoded = None
+
+    async def get(self, request, *args, **kwargs):
+        params = request.query_params
+        address = params.get('address')
+        if address and not params.get('cursor') and not (params.get('latitude') and params.get('longitude')) \
+                and self._valid_search_options(request):
+            region_code = params.get('region', settings.GEOCODE_DEFAULT_REGION)
+            try:
+                self._geocoded = (address, region_code, await self._ageocode_address(address, region_code))
+            except requests.RequestException as e:
+                # Raised again from `_geocode_address`, so the handler answers 503 as under WSGI
+                self._geocoded = (address, region_code, e)
+        return await run_in_thread(super().get, request, *args, **kwargs)
+
+    def _valid_search_options(self, request) -> bool:
+        # Malformed options are answered with 400 by the handler, without geocoding first
+        try:
+            self._get_search_options(request)
+        except ValueError:
+            return False
+        return True
+
+    async def _ageocode_address(self, address: str, region_code: str = None):
+        with metrics.phase('geocode'):
+            return await geocoding.ageocode(address, region_code, timeout=8) or {}
+
+    def _geocode_address(self, address: str, region_code: str = None):
+        # Already resolved by `get`; only a different address goes upstream from the thread
+        if self._geocoded is not None and self._geocoded[:2] == (address, region_code):
+            if isinstance(self._geocoded[2], requests.RequestException):
+                raise self._geocoded[2]
+            return self._geocoded[2]
+        return super()._geocode_address(address, region_code)
+
+
+class GooglePlacesHotelSearchView(AsyncSearchMixin, views.GooglePlacesHotelSearchView):
+    pass
+
+
+class AddressSearchAPI(AsyncSearchMixin, views.AddressSearchAPI):
+    pass
+
+
+class LocationSearchAPI(AsyncSearchMixin, views.LocationSearchAPI):
+    pass
+
+
+class LocationPermissionAPI(AsyncSearchMixin, views.LocationPermissionAPI):
+    pass
+
+
+class ConsolidatedPlacesAPI(AsyncSearchMixin, views.ConsolidatedPlacesAPI):
+    pass
+
+
+class PlaceDetailsAPI(AsyncAPIView, views.PlaceDetailsAPI):
+    async def get(self, request, place_id):
+        return await run_in_thread(super().get, request, place_id)
+
+
+class PlaceDetailsBatchAPI(AsyncAPIView, views.PlaceDetailsBatchAPI):
+    async def get(self, request):
+        return await run_in_thread(super().get, request)
+
+    async def post(self, request):
+        return await run_in_thread(super().post, request)
+
+
+class BatchSearchAPI(AsyncAPIView, views.BatchSearchAPI):
+    async def post(self, request):
+        return await run_in_thread(super().post, request)
+
+
+class BatchSearchStatusAPI(AsyncAPIView, views.BatchSearchStatusAPI):
+    async def get(self, request, job_id):
+        return await run_in_thread(super().get, request, job_id)
+
+
+class BatchSearchResultsAPI(AsyncAPIView, views.BatchSearchResultsAPI):
+    async def get(self, request, job_id):
+        return await run_in_thread(super().get, request, job_id)
+
+    async def _batch_events(self, job_id: str, total: int, fields=None, wait: bool = False):
+        async for record in batch_jobs.aiter_items(job_id, total, wait=wait):
+            # Reads the place store, so it runs off the loop
+            output = await run_in_thread(self._batch_item_output, record, fields)
+            yield dict(output, type='search')
+        yield {'type': 'status', 'job': await run_in_thread(batch_jobs.status, job_id)}
+
+
+class GoogleGeocodingView(AsyncAPIView, views.GoogleGeocodingView):
+    async def get(self, request):
+        address = request.query_params.get('address')
+        region_code = request.query_params.get('region', settings.GEOCODE_DEFAULT_REGION)
+        invalid = self._check_geocode_request(address)
+        if invalid is not None:
+            return invalid
+
+        try:
+            with metrics.phase('geocode'):
+                place = await geocoding.ageocode(address, region_code)
+            return self._geocode_response(address, place)
+        except Exception as e:
+            return self._geocode_error(e)
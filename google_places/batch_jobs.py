@@ -0,0 +1,177 @@
+"""Background batch search jobs.
+
+`POST /api/search/batch/` hands a list of searches to `submit`, which returns a job ID
+straight away and runs the searches on a small in-process thread pool at BACKGROUND
+upstream priority, so bulk sweeps share the cache and rate limiter with interactive
+traffic without occupying request workers or jumping ahead of map users.
+
+Job state lives in the shared cache, so any worker can report progress:
+
+    batch_job_<id>           the job definition (items, total, created_at), written once
+    batch_job_<id>_<n>       the outcome of item n, written once when it finishes
+    batch_job_<id>_done      finished-item counter (read with incr(key, 0) so it bypasses L1)
+    batch_job_<id>_failed    failed-item counter
+
+Jobs run in the process that accepted them and are not resumed after a restart.
+"""
+import asyncio
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import AsyncIterator, Callable, Dict, Iterator, List, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+
+import rate_limiter
+
+logger = logging.getLogger(__name__)
+
+# Seconds between checks while a results download waits for unfinished items
+POLL_INTERVAL = 0.5
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=getattr(settings, 'BATCH_WORKERS', 2),
+                                               thread_name_prefix='batch-search')
+    return _executor
+
+
+def _timeout() -> int:
+    return getattr(settings, 'BATCH_JOB_TIMEOUT', 86400)
+
+
+def _counter(key: str) -> Optional[int]:
+    try:
+        return cache.incr(key, 0)
+    except ValueError:
+        return None
+
+
+def submit(items: List[Dict], run_item: Callable[[Dict], Dict]) -> str:
+    """Queue `run_item(item)` for every item and return the new job's ID.
+
+    `run_item` returns a JSON-serialisable dict; a dict with an `error` key counts as failed.
+    """
+    job_id = uuid.uuid4().hex
+    cache.set(f'batch_job_{job_id}', {
+        'items': items,
+        'total': len(items),
+        'created_at': datetime.now().isoformat(),
+    }, timeout=_timeout())
+    cache.set(f'batch_job_{job_id}_done', 0, timeout=_timeout())
+    cache.set(f'batch_job_{job_id}_failed', 0, timeout=_timeout())
+    executor = _get_executor()
+    for index, item in enumerate(items):
+        executor.submit(_run, job_id, index, item, run_item)
+    return job_id
+
+
+def _run(job_id: str, index: int, item: Dict, run_item: Callable[[Dict], Dict]):
+    with rate_limiter.priority(rate_limiter.BACKGROUND):
+        try:
+            outcome = run_item(item)
+        except Exception as e:
+            logger.exception('Batch job %s item %s failed', job_id, index)
+            outcome = {'error': str(e)}
+    failed = 'error' in outcome
+    record = dict(outcome, index=index, input=item, status='error' if failed else 'ok')
+    cache.set(f'batch_job_{job_id}_{index}', record, timeout=_timeout())
+    if failed:
+        cache.incr(f'batch_job_{job_id}_failed')
+    cache.incr(f'batch_job_{job_id}_done')
+
+
+def status(job_id: str) -> Optional[Dict]:
+    """Progress of a job, or None if it is unknown or has expired."""
+    job = cache.get(f'batch_job_{job_id}')
+    done = _counter(f'batch_job_{job_id}_done')
+    if job is None or done is None:
+        return None
+    if done >= job['total']:
+        state = 'done'
+    elif done:
+        state = 'running'
+    else:
+        state = 'queued'
+    return {
+        'job_id': job_id,
+        'status': state,
+        'total': job['total'],
+        'completed': done,
+        'failed': _counter(f'batch_job_{job_id}_failed') or 0,
+        'created_at': job['created_at'],
+    }
+
+
+def finished_items(job_id: str, total: int) -> List[Dict]:
+    """Outcome records of every finished item, in submission order."""
+    found = cache.get_many([f'batch_job_{job_id}_{index}' for index in range(total)])
+    return [found[f'batch_job_{job_id}_{index}'] for index in range(total) if f'batch_job_{job_id}_{index}' in found]
+
+
+class _Progress:
+    """Watches a job's finished-item counter to tell a slow job from a stalled or expired one."""
+
+    def __init__(self, job_id: str):
+        self._key = f'batch_job_{job_id}_done'
+        self._stall_timeout = getattr(settings, 'BATCH_STALL_TIMEOUT', 300)
+        self._last_done, self._last_progress = None, time.monotonic()
+
+    def stalled(self) -> bool:
+        """True once the job has expired or made no progress for BATCH_STALL_TIMEOUT seconds."""
+        done = _counter(self._key)
+        if done is None:
+            return True
+        if done != self._last_done:
+            self._last_done, self._last_progress = done, time.monotonic()
+            return False
+        return time.monotonic() - self._last_progress > self._stall_timeout
+
+
+def iter_items(job_id: str, total: int, wait: bool = False) -> Iterator[Dict]:
+    """Yield item outcomes in submission order.
+
+    Without `wait` unfinished items are skipped. With it, each is waited for in turn,
+    giving up once the job has made no progress for BATCH_STALL_TIMEOUT seconds.
+    """
+    progress = _Progress(job_id)
+    for index in range(total):
+        key = f'batch_job_{job_id}_{index}'
+        record = cache.get(key)
+        while record is None and wait:
+            if progress.stalled():
+                return
+            time.sleep(POLL_INTERVAL)
+            record = cache.get(key)
+        if record is not None:
+            yield record
+
+
+async def aiter_items(job_id: str, total: int, wait: bool = False) -> AsyncIterator[Dict]:
+    """`iter_items` for async views.
+
+    Cache reads run on a worker thread and the polling sleeps on the event loop, so a
+    client waiting for a long job holds no thread between polls.
+    """
+    progress = _Progress(job_id)
+    for index in range(total):
+        key = f'batch_job_{job_id}_{index}'
+        record = await asyncio.to_thread(cache.get, key)
+        while record is None and wait:
+            if await asyncio.to_thread(progress.stalled):
+                return
+            await asyncio.sleep(POLL_INTERVAL)
+            record = await asyncio.to_thread(cache.get, key)
+        if record is not None:
+            yield record
@@ -0,0 +1,398 @@
+"""Offline search benchmarks against the local stub Places server.
+
+Starts `stub_places.StubServer` (or uses one given with --stub-url), points the app
+at it through PLACES_API_BASE_URL, and runs every combination of the given grid
+sizes, area sizes, cache states and client concurrencies over each transport:
+
+- `call`: `perform_search` on a view instance, no HTTP or Django request handling;
+- `client`: `GET /api/search/` through the full middleware stack with Django's test client;
+- `http`: `GET /api/search/` over sockets, to the app served on a local port, or to
+  --target (e.g. gunicorn or uvicorn started with PLACES_API_BASE_URL at the stub).
+
+`cold` scenarios search a new location with every request, so every cell is a cache
+miss; `warm` scenarios first search --warm-locations locations once, unmeasured, then
+repeat them. Each scenario reports p50/p95/p99 latency, throughput and upstream calls
+per request (counted by the stub), as JSON comparable across releases:
+
+    python -m benchmarks.run --transports call,client --grid-sizes 3,5 --concurrency 1,8 \\
+        --output bench-$(git rev-parse --short HEAD).json
+    python -m benchmarks.run ... --baseline bench-previous.json
+
+Run from the directory holding manage.py. Upstream rate limiting is off by default
+(--upstream-qps) so the numbers show the service, not the limiter. The stub started
+here shares the interpreter (and the GIL) with the app; on small machines run
+`python -m benchmarks.stub_places` separately and pass --stub-url.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from socketserver import ThreadingMixIn
+from typing import Callable, Dict, List, Tuple
+from urllib.parse import urlencode
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+import numpy as np
+import requests
+
+from benchmarks.stub_places import StubPlaces, StubServer
+
+SCHEMA_VERSION = 1
+TRANSPORTS = ('call', 'client', 'http')
+CACHE_STATES = ('cold', 'warm')
+
+# Benchmark locations sit on a lattice wider than any searched area, so no two share a cell
+BASE_LAT, BASE_LNG = 12.9716, 77.5946
+LOCATION_SPACING = 0.25
+LOCATIONS_PER_ROW = 40
+
+
+def _csv(kind):
+    return lambda value: [kind(item) for item in value.split(',') if item.strip()]
+
+
+class Locations:
+    """Fresh locations for cold requests, and one fixed set for warm scenarios."""
+
+    def __init__(self):
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def fresh(self) -> Tuple[float, float]:
+        with self._lock:
+            n = self._next
+            self._next += 1
+        row, col = divmod(n, LOCATIONS_PER_ROW)
+        return round(BASE_LAT + row * LOCATION_SPACING, 6), round(BASE_LNG + col * LOCATION_SPACING, 6)
+
+    @staticmethod
+    def warm(count: int) -> List[Tuple[float, float]]:
+        # South of the fresh lattice, which only grows northwards
+        return [(round(BASE_LAT - 10 + (n // LOCATIONS_PER_ROW) * LOCATION_SPACING, 6),
+                 round(BASE_LNG + (n % LOCATIONS_PER_ROW) * LOCATION_SPACING, 6)) for n in range(count)]
+
+
+class CallTransport:
+    """`perform_search` on one shared view instance."""
+
+    name = 'call'
+
+    def __init__(self):
+        import views
+        self.view = views.ConsolidatedPlacesAPI()
+
+    def search(self, lat: float, lng: float, category: str, area_size: int, grid_size: int) -> Tuple[float, str]:
+        started = time.perf_counter()
+        result = self.view.perform_search(lat, lng, category, area_size_meters=area_size, grid_size=grid_size)
+        elapsed = time.perf_counter() - started
+        if 'error' in result:
+            return elapsed, 'error'
+        return elapsed, 'degraded' if result['metadata'].get('degraded') else 'ok'
+
+
+class _HttpLikeTransport:
+    def _outcome(self, status_code: int, body: bytes) -> str:
+        if status_code != 200:
+            return 'error'
+        try:
+            return 'degraded' if json.loads(body)['metadata'].get('degraded') else 'ok'
+        except (ValueError, KeyError, TypeError):
+            return 'error'
+
+    @staticmethod
+    def _query(lat: float, lng: float, category: str, area_size: int, grid_size: int) -> str:
+        return urlencode({'latitude': lat, 'longitude': lng, 'category': category, 'area_size': area_size,
+                          'grid_size': grid_size})
+
+
+class ClientTransport(_HttpLikeTransport):
+    """`GET /api/search/` through Django's test client (URL routing, middleware, rendering)."""
+
+    name = 'client'
+
+    def __init__(self):
+        from django.test import Client
+        self._client = Client
+        self._local = threading.local()
+
+    def search(self, lat: float, lng: float, category: str, area_size: int, grid_size: int) -> Tuple[float, str]:
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = self._client(HTTP_HOST='localhost', HTTP_ACCEPT_ENCODING='identity')
+        started = time.perf_counter()
+        response = client.get('/api/search/?' + self._query(lat, lng, category, area_size, grid_size))
+        elapsed = time.perf_counter() - started
+        return elapsed, self._outcome(response.status_code, response.content)
+
+
+class _ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+class _QuietHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class HttpTransport(_HttpLikeTransport):
+    """`GET /api/search/` over HTTP, one keep-alive session per client thread."""
+
+    name = 'http'
+
+    def __init__(self, base_url: str = None):
+        self._server = None
+        if base_url is None:
+            from django.core.wsgi import get_wsgi_application
+            self._server = make_server('127.0.0.1', 0, get_wsgi_application(),
+                                       server_class=_ThreadingWSGIServer, handler_class=_QuietHandler)
+            threading.Thread(target=self._server.serve_forever, name='bench-app', daemon=True).start()
+            base_url = f'http://127.0.0.1:{self._server.server_address[1]}'
+        self.base_url = base_url.rstrip('/')
+        self._local = threading.local()
+
+    def search(self, lat: float, lng: float, category: str, area_size: int, grid_size: int) -> Tuple[float, str]:
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        url = f'{self.base_url}/api/search/?' + self._query(lat, lng, category, area_size, grid_size)
+        started = time.perf_counter()
+        try:
+            response = session.get(url, headers={'Accept-Encoding': 'gzip'}, timeout=120)
+        except requests.RequestException:
+            return time.perf_counter() - started, 'error'
+        elapsed = time.perf_counter() - started
+        return elapsed, self._outcome(response.status_code, response.content)
+
+    def close(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+
+def _latency_summary(latencies: List[float]) -> Dict:
+    values = np.array(latencies) * 1000
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        'p50': round(float(p50), 2), 'p95': round(float(p95), 2), 'p99': round(float(p99), 2),
+        'mean': round(float(values.mean()), 2), 'min': round(float(values.min()), 2),
+        'max': round(float(values.max()), 2),
+    }
+
+
+def run_scenario(transport, upstream_calls: Callable[[], int], locations: Locations, category: str,
+                 grid_size: int, area_size: int, cache_state: str, concurrency: int, count: int,
+                 warm_locations: int) -> Dict:
+    if cache_state == 'warm':
+        targets = Locations.warm(warm_locations)
+        for lat, lng in targets:
+            transport.search(lat, lng, category, area_size, grid_size)
+    else:
+        targets = [locations.fresh() for _ in range(count)]
+
+    def one(n: int) -> Tuple[float, str]:
+        lat, lng = targets[n % len(targets)]
+        return transport.search(lat, lng, category, area_size, grid_size)
+
+    calls_before = upstream_calls()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='bench-client') as pool:
+        outcomes = list(pool.map(one, range(count)))
+    wall = time.perf_counter() - started
+    calls = upstream_calls() - calls_before
+
+    latencies = [elapsed for elapsed, _ in outcomes]
+    return {
+        'name': f'{transport.name}/grid{grid_size}/area{area_size}/{cache_state}/c{concurrency}',
+        'transport': transport.name,
+        'grid_size': grid_size,
+        'area_size': area_size,
+        'cache': cache_state,
+        'concurrency': concurrency,
+        'requests': count,
+        'errors': sum(1 for _, outcome in outcomes if outcome == 'error'),
+        'degraded': sum(1 for _, outcome in outcomes if outcome == 'degraded'),
+        'latency_ms': _latency_summary(latencies),
+        'throughput_rps': round(count / wall, 2) if wall else None,
+        'wall_seconds': round(wall, 3),
+        'upstream_calls': calls,
+        'upstream_calls_per_request': round(calls / count, 3),
+    }
+
+
+def _git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, timeout=10,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def compare(report: Dict, baseline: Dict) -> List[str]:
+    """One line per scenario present in both runs: relative change of p50, p95, throughput and upstream calls."""
+    previous = {scenario['name']: scenario for scenario in baseline.get('scenarios', [])}
+
+    def change(new, old):
+        if new is None or not old:
+            return '   n/a'
+        return f'{(new - old) / old * 100:+6.1f}%'
+
+    lines = []
+    for scenario in report['scenarios']:
+        old = previous.get(scenario['name'])
+        if old is None:
+            continue
+        lines.append(f"{scenario['name']:<40} p50 {change(scenario['latency_ms']['p50'], old['latency_ms']['p50'])}"
+                     f"  p95 {change(scenario['latency_ms']['p95'], old['latency_ms']['p95'])}"
+                     f"  rps {change(scenario['throughput_rps'], old['throughput_rps'])}"
+                     f"  upstream/req {change(scenario['upstream_calls_per_request'], old['upstream_calls_per_request'])}")
+    return lines
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--transports', type=_csv(str), default=['call', 'client', 'http'])
+    parser.add_argument('--grid-sizes', type=_csv(int), default=[3, 5])
+    parser.add_argument('--area-sizes', type=_csv(int), default=[2000, 5000])
+    parser.add_argument('--cache', type=_csv(str), default=list(CACHE_STATES), help='cold, warm or both')
+    parser.add_argument('--concurrency', type=_csv(int), default=[1, 8], help='concurrent clients')
+    parser.add_argument('--requests', type=int, default=40, help='measured requests per scenario')
+    parser.add_argument('--warm-locations', type=int, default=8, help='distinct locations repeated in warm scenarios')
+    parser.add_argument('--category', default='hotels')
+    parser.add_argument('--latency-ms', type=float, default=50, help='stub latency per upstream call')
+    parser.add_argument('--jitter-ms', type=float, default=20)
+    parser.add_argument('--error-rate', type=float, default=0)
+    parser.add_argument('--density', type=float, default=50, help='stub places per square kilometre')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--stub-url', help='use an already running stub_places server instead of starting one')
+    parser.add_argument('--stub-port', type=int, default=0, help='port for the started stub (0 = any free port)')
+    parser.add_argument('--target', help='base URL of an already running app for the http transport')
+    parser.add_argument('--provider', choices=['google', 'record', 'replay'], default='google',
+                        help='UPSTREAM_PROVIDER for the in-process app; replay serves --cassette with no stub calls')
+    parser.add_argument('--cassette', help='UPSTREAM_CASSETTE for the record and replay providers')
+    parser.add_argument('--upstream-qps', default='0', help='UPSTREAM_QPS for the in-process app (0 = unlimited)')
+    parser.add_argument('--output', help='write the JSON report here instead of stdout')
+    parser.add_argument('--baseline', help='earlier JSON report to compare against')
+    args = parser.parse_args(argv)
+
+    for name in args.transports:
+        if name not in TRANSPORTS:
+            parser.error(f'unknown transport {name!r}; choose from {", ".join(TRANSPORTS)}')
+    for name in args.cache:
+        if name not in CACHE_STATES:
+            parser.error(f'unknown cache state {name!r}; choose from {", ".join(CACHE_STATES)}')
+
+    stub = None
+    if args.stub_url:
+        stub_url = args.stub_url.rstrip('/')
+
+        def upstream_calls() -> int:
+            return requests.get(f'{stub_url}/_stats', timeout=10).json().get('total', 0)
+    else:
+        stub = StubServer(StubPlaces(args.latency_ms, args.jitter_ms, args.error_rate, args.density, args.seed),
+                          port=args.stub_port).start()
+        stub_url = stub.url
+
+        def upstream_calls() -> int:
+            return stub.stub.stats()['total']
+    print(f'Stub Places API at {stub_url}', file=sys.stderr)
+
+    # The app reads these at import, so they must be in place before Django is set up
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'settings')
+    os.environ['PLACES_API_BASE_URL'] = stub_url
+    os.environ['UPSTREAM_QPS'] = str(args.upstream_qps)
+    os.environ['UPSTREAM_PROVIDER'] = args.provider
+    if args.cassette:
+        os.environ['UPSTREAM_CASSETTE'] = os.path.abspath(args.cassette)
+    os.environ.setdefault('GOOGLE_PLACES_API_KEY', 'benchmark')
+    # App logs go to stderr, apart from the report; keep per-request INFO lines out of the timings
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    cache_dir = tempfile.TemporaryDirectory(prefix='places-bench-')
+    os.environ['PLACES_CACHE_PATH'] = os.path.join(cache_dir.name, 'cache.sqlite3')
+    in_process = any(name != 'http' for name in args.transports) or not args.target
+    if in_process:
+        import django
+        django.setup()
+        from django.conf import settings
+
+    transports = []
+    for name in args.transports:
+        if name == 'call':
+            transports.append(CallTransport())
+        elif name == 'client':
+            transports.append(ClientTransport())
+        else:
+            transports.append(HttpTransport(args.target))
+
+    locations = Locations()
+    report = {
+        'schema': SCHEMA_VERSION,
+        'started_at': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        'git_revision': _git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'stub': {
+            'url': stub_url, 'external': stub is None,
+            'latency_ms': args.latency_ms, 'jitter_ms': args.jitter_ms, 'error_rate': args.error_rate,
+            'density': args.density, 'seed': args.seed,
+        },
+        'settings': {
+            name: getattr(settings, name, None)
+            for name in ('UPSTREAM_PROVIDER', 'UPSTREAM_QPS', 'PLACES_SEARCH_CONCURRENCY', 'PLACES_SPATIAL_INDEX', 'PLACES_MAX_PAGES',
+                         'PLACES_SEARCH_FIELD_MASK', 'SINGLEFLIGHT_SHARED', 'RESPONSE_COMPRESSION')
+        } if in_process else {},
+        'category': args.category,
+        'scenarios': [],
+    }
+
+    try:
+        for transport in transports:
+            for grid_size in args.grid_sizes:
+                for area_size in args.area_sizes:
+                    for cache_state in args.cache:
+                        for concurrency in args.concurrency:
+                            result = run_scenario(transport, upstream_calls, locations, args.category,
+                                                  grid_size, area_size, cache_state, concurrency,
+                                                  args.requests, args.warm_locations)
+                            report['scenarios'].append(result)
+                            latency = result['latency_ms']
+                            print(f"{result['name']:<40} p50 {latency['p50']:>8.1f}ms  "
+                                  f"p95 {latency['p95']:>8.1f}ms  p99 {latency['p99']:>8.1f}ms  "
+                                  f"{result['throughput_rps']:>7.1f} req/s  "
+                                  f"{result['upstream_calls_per_request']:>6.2f} upstream/req  "
+                                  f"{result['errors']} errors", file=sys.stderr)
+    finally:
+        for transport in transports:
+            if hasattr(transport, 'close'):
+                transport.close()
+        if stub is not None:
+            stub.shutdown()
+            stub.server_close()
+        cache_dir.cleanup()
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        print(f"\nChange against {args.baseline} ({baseline.get('git_revision') or 'unknown revision'}):",
+              file=sys.stderr)
+        for line in compare(report, baseline):
+            print(line, file=sys.stderr)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+        print(f'Report written to {args.output}', file=sys.stderr)
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,277 @@
+"""Local stand-in for the Places API (New) endpoints this service calls.
+
+Answers `POST /v1/places:searchText` (area searches with `locationBias`, and address
+lookups without one) and `GET /v1/places/<id>` with synthetic but stable data: the
+world is divided into 0.01 degree buckets, each holding a seeded, repeatable set of
+places per query at about `density` places per square kilometre. A search returns
+the places of the biased circle nearest first, `maxResultCount` at a time with a
+`nextPageToken`, so dense areas saturate cells the way real city centres do.
+
+Every answer waits `latency_ms` (plus up to `jitter_ms`), and a share `error_rate`
+of calls fail with a 500. Call counts are served at `GET /_stats` and cleared with
+`POST /_reset`. Point the app at it with PLACES_API_BASE_URL:
+
+    python -m benchmarks.stub_places --port 8765 --latency-ms 80 --error-rate 0.01
+    PLACES_API_BASE_URL=http://127.0.0.1:8765 python manage.py runserver
+"""
+import argparse
+import base64
+import hashlib
+import json
+import math
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+
+EARTH_RADIUS = 6378137
+BUCKET_DEGREES = 0.01
+TYPES = ['lodging', 'restaurant', 'cafe', 'store', 'tourist_attraction', 'point_of_interest']
+
+
+def _bucket_places(query: str, i: int, j: int, density: float) -> List[Dict]:
+    """The places of bucket (i, j) for `query`; the same every time they are asked for."""
+    rnd = random.Random(f'{query}:{i}:{j}')
+    lat = i * BUCKET_DEGREES
+    width_km = BUCKET_DEGREES * 111.32
+    area_km2 = width_km * width_km * max(0.05, math.cos(math.radians(lat)))
+    # Vary density between buckets so some cells saturate and others stay sparse
+    count = int(rnd.expovariate(1 / max(density * area_km2, 1e-9)))
+    places = []
+    for k in range(count):
+        places.append(_place(query, i, j, k, rnd))
+    return places
+
+
+def _query_tag(query: str) -> str:
+    return hashlib.sha1(query.encode('utf-8')).hexdigest()[:8]
+
+
+def _place(query: str, i: int, j: int, k: int, rnd: random.Random) -> Dict:
+    place_id = f'stub_{i}_{j}_{k}_{_query_tag(query)}'
+    name = f'{query.title()} {abs(i) % 1000}-{abs(j) % 1000}-{k}'
+    return {
+        'id': place_id,
+        'displayName': {'text': name, 'languageCode': 'en'},
+        'formattedAddress': f'{k} Stub Street, Block {i}/{j}, Stubville',
+        'shortFormattedAddress': f'{k} Stub Street',
+        'location': {
+            'latitude': round((i + rnd.random()) * BUCKET_DEGREES, 7),
+            'longitude': round((j + rnd.random()) * BUCKET_DEGREES, 7),
+        },
+        'rating': round(rnd.uniform(2.5, 5), 1),
+        'userRatingCount': rnd.randint(0, 4000),
+        'types': [rnd.choice(TYPES), 'point_of_interest', 'establishment'],
+        'priceLevel': rnd.choice(['PRICE_LEVEL_INEXPENSIVE', 'PRICE_LEVEL_MODERATE', 'PRICE_LEVEL_EXPENSIVE']),
+        'businessStatus': 'OPERATIONAL',
+        'nationalPhoneNumber': f'0{rnd.randint(100000000, 999999999)}',
+        'websiteUri': f'https://example.com/{place_id}',
+    }
+
+
+def _distance(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    a = (math.sin((phi2 - phi1) / 2) ** 2
+         + math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lng2 - lng1) / 2) ** 2)
+    return 2 * EARTH_RADIUS * math.asin(min(1.0, math.sqrt(a)))
+
+
+class StubPlaces:
+    """Synthetic search and details answers; thread-safe call counters."""
+
+    def __init__(self, latency_ms: float = 50, jitter_ms: float = 0, error_rate: float = 0,
+                 density: float = 50, seed: int = 0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.density = density
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._counts = {}
+        # Query tag -> query, so a details call can rebuild the bucket a search ID came from
+        self._queries = {}
+
+    def _count(self, name: str):
+        with self._lock:
+            self._counts[name] = self._counts.get(name, 0) + 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            counts = dict(self._counts)
+        # Failed calls are counted under 'errors' only, so every call is in exactly one bucket
+        counts['total'] = sum(counts.values())
+        return counts
+
+    def reset(self):
+        with self._lock:
+            self._counts = {}
+
+    def delay_and_fail(self) -> bool:
+        """Sleep for one call's latency; True when this call should fail."""
+        with self._lock:
+            delay = self.latency_ms + self._random.uniform(0, self.jitter_ms)
+            failed = self._random.random() < self.error_rate
+        time.sleep(delay / 1000)
+        if failed:
+            self._count('errors')
+        return failed
+
+    def search_text(self, payload: Dict) -> Dict:
+        query = str(payload.get('textQuery', '')).strip().lower()
+        circle = (payload.get('locationBias') or payload.get('locationRestriction') or {}).get('circle')
+        if not circle:
+            self._count('geocode')
+            return self.geocode(query)
+        self._count('search')
+        with self._lock:
+            self._queries[_query_tag(query)] = query
+        centre = circle['center']
+        lat, lng = centre['latitude'], centre['longitude']
+        # Like Google, the bias circle is loose: take places up to half again its radius
+        reach = float(circle.get('radius', 1000)) * 1.5
+        lat_span = math.degrees(reach / EARTH_RADIUS)
+        lng_span = math.degrees(reach / (EARTH_RADIUS * max(0.05, math.cos(math.radians(lat)))))
+        found = []
+        for i in range(math.floor((lat - lat_span) / BUCKET_DEGREES), math.floor((lat + lat_span) / BUCKET_DEGREES) + 1):
+            for j in range(math.floor((lng - lng_span) / BUCKET_DEGREES),
+                           math.floor((lng + lng_span) / BUCKET_DEGREES) + 1):
+                for place in _bucket_places(query, i, j, self.density):
+                    distance = _distance(lat, lng, place['location']['latitude'], place['location']['longitude'])
+                    if distance <= reach:
+                        found.append((distance, place))
+        found.sort(key=lambda item: item[0])
+        page_size = max(1, min(int(payload.get('maxResultCount') or 20), 20))
+        offset = 0
+        if payload.get('pageToken'):
+            offset = int(base64.urlsafe_b64decode(payload['pageToken'].encode('ascii')))
+        # Google stops at 60 results per query
+        found = found[:60]
+        body = {'places': [place for _, place in found[offset:offset + page_size]]}
+        if offset + page_size < len(found):
+            body['nextPageToken'] = base64.urlsafe_b64encode(str(offset + page_size).encode('ascii')).decode('ascii')
+        return body
+
+    def geocode(self, query: str) -> Dict:
+        """A stable location for any address, somewhere in a 10 x 10 degree box."""
+        digest = hashlib.sha1(query.encode('utf-8')).digest()
+        lat = 8 + int.from_bytes(digest[:4], 'big') / 2 ** 32 * 10
+        lng = 72 + int.from_bytes(digest[4:8], 'big') / 2 ** 32 * 10
+        return {'places': [{
+            'formattedAddress': f'{query.title()}, Stubville',
+            'location': {'latitude': round(lat, 7), 'longitude': round(lng, 7)},
+            'types': ['locality', 'political'],
+            'viewport': {
+                'low': {'latitude': round(lat - 0.05, 7), 'longitude': round(lng - 0.05, 7)},
+                'high': {'latitude': round(lat + 0.05, 7), 'longitude': round(lng + 0.05, 7)},
+            },
+        }]}
+
+    def details(self, place_id: str):
+        """The place behind a stub ID, or None for IDs this stub did not hand out."""
+        self._count('details')
+        parts = place_id.split('_')
+        if len(parts) != 5 or parts[0] != 'stub':
+            return None
+        try:
+            i, j, k = int(parts[1]), int(parts[2]), int(parts[3])
+        except ValueError:
+            return None
+        with self._lock:
+            query = self._queries.get(parts[4])
+        if query is None:
+            return None
+        places = _bucket_places(query, i, j, self.density)
+        return places[k] if k < len(places) else None
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status: int, body: Dict):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _error(self, status: int, message: str):
+        self._send(status, {'error': {'code': status, 'message': message, 'status': 'INTERNAL'}})
+
+    def do_GET(self):
+        stub = self.server.stub
+        path = self.path.split('?', 1)[0]
+        if path == '/_stats':
+            return self._send(200, stub.stats())
+        if path.startswith('/v1/places/'):
+            if stub.delay_and_fail():
+                return self._error(500, 'Injected failure')
+            place = stub.details(path[len('/v1/places/'):])
+            if place is None:
+                return self._send(404, {'error': {'code': 404, 'message': 'Not found', 'status': 'NOT_FOUND'}})
+            return self._send(200, place)
+        self._send(404, {'error': {'code': 404, 'message': f'No stub for {path}', 'status': 'NOT_FOUND'}})
+
+    def do_POST(self):
+        stub = self.server.stub
+        path = self.path.split('?', 1)[0]
+        length = int(self.headers.get('Content-Length') or 0)
+        raw = self.rfile.read(length) if length else b''
+        if path == '/_reset':
+            stub.reset()
+            return self._send(200, {'reset': True})
+        if path != '/v1/places:searchText':
+            return self._send(404, {'error': {'code': 404, 'message': f'No stub for {path}', 'status': 'NOT_FOUND'}})
+        try:
+            payload = json.loads(raw or b'{}')
+        except ValueError:
+            return self._send(400, {'error': {'code': 400, 'message': 'Invalid JSON', 'status': 'INVALID_ARGUMENT'}})
+        if stub.delay_and_fail():
+            return self._error(500, 'Injected failure')
+        self._send(200, stub.search_text(payload))
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, stub: StubPlaces, host: str = '127.0.0.1', port: int = 0):
+        super().__init__((host, port), _Handler)
+        self.stub = stub
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self) -> 'StubServer':
+        """Serve on a daemon thread and return immediately."""
+        threading.Thread(target=self.serve_forever, name='stub-places', daemon=True).start()
+        return self
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency-ms', type=float, default=50)
+    parser.add_argument('--jitter-ms', type=float, default=0)
+    parser.add_argument('--error-rate', type=float, default=0)
+    parser.add_argument('--density', type=float, default=50, help='average places per square kilometre per query')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    stub = StubPlaces(args.latency_ms, args.jitter_ms, args.error_rate, args.density, args.seed)
+    server = StubServer(stub, args.host, args.port)
+    print(f'Stub Places API on {server.url} (latency {args.latency_ms}+{args.jitter_ms}ms, '
+          f'error rate {args.error_rate}, density {args.density}/km2)')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
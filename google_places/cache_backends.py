@@ -0,0 +1,371 @@
+"""Django cache backends for the places service.
+
+`SQLiteCache` is a size-bounded LRU store on local disk (SQLite in WAL mode) that every
+gunicorn worker on the host shares and that survives restarts. `TieredCache` puts the
+usual in-process LocMemCache in front of it: L1 answers hot keys without touching disk,
+L2 keeps everything warm across workers, `--max-requests` recycles and cold starts.
+
+Both work without any external service, e.g.::
+
+    CACHES = {
+        'default': {
+            'BACKEND': 'cache_backends.TieredCache',
+            'LOCATION': '/var/tmp/places_cache.sqlite3',
+            'OPTIONS': {'MAX_ENTRIES': 200000, 'MAX_SIZE_BYTES': 256 * 1024 * 1024},
+        }
+    }
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.cache.backends.locmem import LocMemCache
+
+_initialised_paths = set()
+_init_lock = threading.Lock()
+
+_stats_lock = threading.Lock()
+_stats = defaultdict(int)
+
+# Django builds one backend instance per thread, so write counts are tracked per file
+_writes_lock = threading.Lock()
+_writes_since_cull = defaultdict(int)
+
+
+def _count(name: str, amount: int = 1):
+    with _stats_lock:
+        _stats[name] += amount
+
+
+def cache_stats() -> dict:
+    """Hit/miss counters per tier for this process."""
+    with _stats_lock:
+        return dict(_stats)
+
+
+class SQLiteCache(BaseCache):
+    """Shared on-disk cache with TTLs and least-recently-used eviction.
+
+    OPTIONS:
+        MAX_ENTRIES     -- evict least recently used rows above this many entries (default 300)
+        MAX_SIZE_BYTES  -- evict least recently used rows above this many value bytes (default unbounded)
+        CULL_EVERY      -- check the bounds once every this many writes per process (default 50)
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._path = location
+        self._max_size_bytes = options.get('MAX_SIZE_BYTES', options.get('max_size_bytes'))
+        self._cull_every = int(options.get('CULL_EVERY', options.get('cull_every', 50)))
+        self._local = threading.local()
+
+    # -- connection handling -------------------------------------------------
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            directory = os.path.dirname(self._path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self._path, timeout=10, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            with _init_lock:
+                if self._path not in _initialised_paths:
+                    conn.execute(
+                        'CREATE TABLE IF NOT EXISTS cache_entries ('
+                        ' key TEXT PRIMARY KEY,'
+                        ' value BLOB NOT NULL,'
+                        ' expires REAL,'
+                        ' accessed REAL NOT NULL,'
+                        ' size INTEGER NOT NULL)'
+                    )
+                    conn.execute('CREATE INDEX IF NOT EXISTS cache_entries_accessed ON cache_entries (accessed)')
+                    conn.execute('CREATE INDEX IF NOT EXISTS cache_entries_expires ON cache_entries (expires)')
+                    _initialised_paths.add(self._path)
+            self._local.conn = conn
+        return conn
+
+    # -- helpers -------------------------------------------------------------
+
+    def get_many_with_expiry(self, keys, version=None) -> dict:
+        """Return {key: (value, expires)} for live entries; `expires` is an epoch timestamp or None."""
+        keys = list(keys)
+        if not keys:
+            return {}
+        key_map = {self.make_and_validate_key(key, version=version): key for key in keys}
+        conn = self._connection()
+        now = time.time()
+        found = {}
+        db_keys = list(key_map)
+        # Stay well below SQLite's bound-parameter limit
+        for start in range(0, len(db_keys), 500):
+            chunk = db_keys[start:start + 500]
+            placeholders = ','.join('?' * len(chunk))
+            rows = conn.execute(
+                f'SELECT key, value, expires FROM cache_entries WHERE key IN ({placeholders})'
+                ' AND (expires IS NULL OR expires > ?)',
+                (*chunk, now),
+            ).fetchall()
+            for db_key, value, expires in rows:
+                found[db_key] = (pickle.loads(value), expires)
+            if rows:
+                hit_keys = [row[0] for row in rows]
+                conn.execute(
+                    f'UPDATE cache_entries SET accessed = ? WHERE key IN ({",".join("?" * len(hit_keys))})',
+                    (now, *hit_keys),
+                )
+        return {key_map[db_key]: item for db_key, item in found.items()}
+
+    def _write(self, key, value, timeout, version, mode):
+        key = self.make_and_validate_key(key, version=version)
+        blob = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        expires = self.get_backend_timeout(timeout)
+        now = time.time()
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            if mode == 'add':
+                conn.execute('DELETE FROM cache_entries WHERE key = ? AND expires IS NOT NULL AND expires <= ?',
+                             (key, now))
+                cursor = conn.execute(
+                    'INSERT OR IGNORE INTO cache_entries (key, value, expires, accessed, size) VALUES (?, ?, ?, ?, ?)',
+                    (key, blob, expires, now, len(blob)),
+                )
+            elif mode == 'touch':
+                cursor = conn.execute(
+                    'UPDATE cache_entries SET expires = ?, accessed = ? WHERE key = ? AND (expires IS NULL OR expires > ?)',
+                    (expires, now, key, now),
+                )
+            else:
+                cursor = conn.execute(
+                    'INSERT OR REPLACE INTO cache_entries (key, value, expires, accessed, size) VALUES (?, ?, ?, ?, ?)',
+                    (key, blob, expires, now, len(blob)),
+                )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        self._note_writes(1)
+        return cursor.rowcount > 0
+
+    def _note_writes(self, count: int):
+        with _writes_lock:
+            _writes_since_cull[self._path] += count
+            due = _writes_since_cull[self._path] >= self._cull_every
+            if due:
+                _writes_since_cull[self._path] = 0
+        if due:
+            self._cull()
+
+    def _cull(self):
+        """Drop expired rows, then least recently used rows until within the size bounds."""
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute('DELETE FROM cache_entries WHERE expires IS NOT NULL AND expires <= ?', (time.time(),))
+            count = conn.execute('SELECT COUNT(*) FROM cache_entries').fetchone()[0]
+            excess = count - self._max_entries
+            if excess > 0:
+                # Like Django's own backends, cull a fraction of the table so this does not run on every write
+                excess = max(excess, count // self._cull_frequency) if self._cull_frequency else count
+                conn.execute(
+                    'DELETE FROM cache_entries WHERE key IN '
+                    '(SELECT key FROM cache_entries ORDER BY accessed LIMIT ?)',
+                    (excess,),
+                )
+            if self._max_size_bytes:
+                total_size = conn.execute('SELECT COALESCE(SUM(size), 0) FROM cache_entries').fetchone()[0]
+                if total_size > self._max_size_bytes:
+                    rows = conn.execute('SELECT key, size FROM cache_entries ORDER BY accessed').fetchall()
+                    doomed = []
+                    for key, size in rows:
+                        if total_size <= self._max_size_bytes:
+                            break
+                        doomed.append(key)
+                        total_size -= size
+                    for start in range(0, len(doomed), 500):
+                        chunk = doomed[start:start + 500]
+                        conn.execute(f'DELETE FROM cache_entries WHERE key IN ({",".join("?" * len(chunk))})', chunk)
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    # -- BaseCache API -------------------------------------------------------
+
+    def get(self, key, default=None, version=None):
+        found = self.get_many_with_expiry([key], version=version)
+        if key in found:
+            return found[key][0]
+        return default
+
+    def get_many(self, keys, version=None):
+        return {key: value for key, (value, _) in self.get_many_with_expiry(keys, version=version).items()}
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._write(key, value, timeout, version, 'set')
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        return self._write(key, value, timeout, version, 'add')
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self._write(key, None, timeout, version, 'touch')
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        expires = self.get_backend_timeout(timeout)
+        now = time.time()
+        rows = []
+        for key, value in data.items():
+            blob = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+            rows.append((self.make_and_validate_key(key, version=version), blob, expires, now, len(blob)))
+        if not rows:
+            return []
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.executemany(
+                'INSERT OR REPLACE INTO cache_entries (key, value, expires, accessed, size) VALUES (?, ?, ?, ?, ?)',
+                rows,
+            )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        self._note_writes(len(rows))
+        return []
+
+    def incr(self, key, delta=1, version=None):
+        """Atomically add `delta` to a stored number, across every process sharing the file."""
+        db_key = self.make_and_validate_key(key, version=version)
+        now = time.time()
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute(
+                'SELECT value FROM cache_entries WHERE key = ? AND (expires IS NULL OR expires > ?)',
+                (db_key, now),
+            ).fetchone()
+            if row is None:
+                raise ValueError("Key '%s' not found" % key)
+            value = pickle.loads(row[0]) + delta
+            blob = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+            conn.execute('UPDATE cache_entries SET value = ?, accessed = ?, size = ? WHERE key = ?',
+                         (blob, now, len(blob), db_key))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return value
+
+    def delete(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        cursor = self._connection().execute('DELETE FROM cache_entries WHERE key = ?', (key,))
+        return cursor.rowcount > 0
+
+    def has_key(self, key, version=None):
+        return key in self.get_many_with_expiry([key], version=version)
+
+    def clear(self):
+        self._connection().execute('DELETE FROM cache_entries')
+
+
+class TieredCache(BaseCache):
+    """In-process LocMemCache (L1) in front of a shared SQLiteCache (L2).
+
+    Reads try L1, then L2 (promoting hits into L1); writes go to both tiers. L1 entries
+    live at most L1_TIMEOUT seconds so values rewritten by another worker show up quickly.
+
+    OPTIONS:
+        L1_MAX_ENTRIES  -- entries kept in the in-process tier (default 1000)
+        L1_TIMEOUT      -- upper bound on L1 lifetime in seconds (default 300)
+        any SQLiteCache option for the L2 tier
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = dict(params.get('OPTIONS', {}))
+        self._l1_timeout = options.pop('L1_TIMEOUT', 300)
+        l1_max_entries = options.pop('L1_MAX_ENTRIES', 1000)
+        self.l1 = LocMemCache(f'tiered-l1:{location}', {
+            'TIMEOUT': params.get('TIMEOUT', 300),
+            'KEY_PREFIX': params.get('KEY_PREFIX', ''),
+            'VERSION': params.get('VERSION', 1),
+            'OPTIONS': {'MAX_ENTRIES': l1_max_entries},
+        })
+        self.l2 = SQLiteCache(location, {
+            'TIMEOUT': params.get('TIMEOUT', 300),
+            'KEY_PREFIX': params.get('KEY_PREFIX', ''),
+            'VERSION': params.get('VERSION', 1),
+            'OPTIONS': options,
+        })
+
+    def _l1_timeout_for(self, timeout):
+        if timeout is None:
+            return self._l1_timeout
+        return min(timeout, self._l1_timeout)
+
+    def get(self, key, default=None, version=None):
+        return self.get_many([key], version=version).get(key, default)
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        found = self.l1.get_many(keys, version=version)
+        _count('l1_hits', len(found))
+        missing = [key for key in keys if key not in found]
+        _count('l1_misses', len(missing))
+        if missing:
+            from_l2 = self.l2.get_many_with_expiry(missing, version=version)
+            _count('l2_hits', len(from_l2))
+            _count('l2_misses', len(missing) - len(from_l2))
+            now = time.time()
+            for key, (value, expires) in from_l2.items():
+                remaining = None if expires is None else max(1, int(expires - now))
+                self.l1.set(key, value, timeout=self._l1_timeout_for(remaining), version=version)
+                found[key] = value
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        timeout = self.default_timeout if timeout is DEFAULT_TIMEOUT else timeout
+        self.l2.set(key, value, timeout=timeout, version=version)
+        self.l1.set(key, value, timeout=self._l1_timeout_for(timeout), version=version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        timeout = self.default_timeout if timeout is DEFAULT_TIMEOUT else timeout
+        self.l2.set_many(data, timeout=timeout, version=version)
+        self.l1.set_many(data, timeout=self._l1_timeout_for(timeout), version=version)
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        timeout = self.default_timeout if timeout is DEFAULT_TIMEOUT else timeout
+        added = self.l2.add(key, value, timeout=timeout, version=version)
+        if added:
+            self.l1.set(key, value, timeout=self._l1_timeout_for(timeout), version=version)
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        timeout = self.default_timeout if timeout is DEFAULT_TIMEOUT else timeout
+        self.l1.touch(key, timeout=self._l1_timeout_for(timeout), version=version)
+        return self.l2.touch(key, timeout=timeout, version=version)
+
+    def incr(self, key, delta=1, version=None):
+        # Counters live in L2 only so every worker sees the same value
+        self.l1.delete(key, version=version)
+        return self.l2.incr(key, delta, version=version)
+
+    def delete(self, key, version=None):
+        deleted_l1 = self.l1.delete(key, version=version)
+        deleted_l2 = self.l2.delete(key, version=version)
+        return deleted_l1 or deleted_l2
+
+    def has_key(self, key, version=None):
+        return self.l1.has_key(key, version=version) or self.l2.has_key(key, version=version)
+
+    def clear(self):
+        self.l1.clear()
+        self.l2.clear()
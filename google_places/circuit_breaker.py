@@ -0,0 +1,143 @@
+"""Circuit breaker around the Google Places upstream.
+
+The breaker watches the outcome and latency of recent upstream calls. When too many of
+them fail or are too slow it opens, and calls fail immediately with `CircuitOpen`
+instead of tying up a worker for the full timeout; searches then serve stale cached
+cells or a partial result. After `CIRCUIT_OPEN_SECONDS` it goes half-open and lets a
+few probe calls through: a success closes it again, a failure re-opens it.
+"""
+import threading
+import time
+from collections import deque
+from typing import Dict
+
+import requests
+from django.conf import settings
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpen(requests.RequestException):
+    """The upstream circuit is open; the call was not attempted."""
+
+
+class CircuitBreaker:
+    def __init__(self, window_seconds: float = 30, min_calls: int = 10, error_rate: float = 0.5,
+                 slow_call_seconds: float = 5, slow_call_rate: float = 0.8, open_seconds: float = 30,
+                 half_open_probes: int = 1):
+        self.window_seconds = window_seconds
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate = slow_call_rate
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+        self._lock = threading.Lock()
+        self._calls = deque()
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        self._times_opened = 0
+        self._rejected = 0
+
+    def _trim(self, now: float):
+        while self._calls and self._calls[0][0] < now - self.window_seconds:
+            self._calls.popleft()
+
+    def _open(self, now: float):
+        self._state = OPEN
+        self._opened_at = now
+        self._probes_in_flight = 0
+        self._times_opened += 1
+        self._calls.clear()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+                return HALF_OPEN
+            return self._state
+
+    def is_open(self) -> bool:
+        return self.state == OPEN
+
+    def before_call(self):
+        """Raise CircuitOpen unless a call may be attempted now."""
+        with self._lock:
+            now = time.monotonic()
+            if self._state == OPEN:
+                if now - self._opened_at < self.open_seconds:
+                    self._rejected += 1
+                    raise CircuitOpen(f'Upstream circuit open; retrying in {self.open_seconds - (now - self._opened_at):.0f}s')
+                self._state = HALF_OPEN
+                self._probes_in_flight = 0
+            if self._state == HALF_OPEN:
+                if self._probes_in_flight >= self.half_open_probes:
+                    self._rejected += 1
+                    raise CircuitOpen('Upstream circuit half-open; probe in progress')
+                self._probes_in_flight += 1
+
+    def cancel(self):
+        """Release a slot taken by `before_call` for a call that was never made."""
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._probes_in_flight = max(0, self._probes_in_flight - 1)
+
+    def record(self, success: bool, latency: float):
+        with self._lock:
+            now = time.monotonic()
+            if self._state == HALF_OPEN:
+                self._probes_in_flight = max(0, self._probes_in_flight - 1)
+                if success and latency < self.slow_call_seconds:
+                    self._state = CLOSED
+                    self._calls.clear()
+                else:
+                    self._open(now)
+                return
+            if self._state == OPEN:
+                return
+            self._calls.append((now, success, latency))
+            self._trim(now)
+            total = len(self._calls)
+            if total < self.min_calls:
+                return
+            failures = sum(1 for _, ok, _ in self._calls if not ok)
+            slow = sum(1 for _, _, elapsed in self._calls if elapsed >= self.slow_call_seconds)
+            if failures / total >= self.error_rate or slow / total >= self.slow_call_rate:
+                self._open(now)
+
+    def stats(self) -> Dict:
+        state = self.state
+        with self._lock:
+            self._trim(time.monotonic())
+            total = len(self._calls)
+            failures = sum(1 for _, ok, _ in self._calls if not ok)
+            return {
+                'state': state,
+                'recent_calls': total,
+                'recent_error_rate': round(failures / total, 3) if total else 0,
+                'times_opened': self._times_opened,
+                'rejected_calls': self._rejected,
+            }
+
+
+_breaker = None
+_breaker_lock = threading.Lock()
+
+
+def get_breaker() -> CircuitBreaker:
+    global _breaker
+    if _breaker is None:
+        with _breaker_lock:
+            if _breaker is None:
+                _breaker = CircuitBreaker(
+                    window_seconds=getattr(settings, 'CIRCUIT_WINDOW_SECONDS', 30),
+                    min_calls=getattr(settings, 'CIRCUIT_MIN_CALLS', 10),
+                    error_rate=getattr(settings, 'CIRCUIT_ERROR_RATE', 0.5),
+                    slow_call_seconds=getattr(settings, 'CIRCUIT_SLOW_CALL_SECONDS', 5),
+                    slow_call_rate=getattr(settings, 'CIRCUIT_SLOW_CALL_RATE', 0.8),
+                    open_seconds=getattr(settings, 'CIRCUIT_OPEN_SECONDS', 30),
+                )
+    return _breaker
@@ -0,0 +1,67 @@
+"""Response compression negotiated from Accept-Encoding.
+
+Brotli is preferred when the `brotli` package is installed and the client accepts it,
+gzip otherwise. Streaming responses (NDJSON/SSE search streams, static files) and
+responses that are already encoded are passed through untouched.
+"""
+import gzip
+import re
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+_accepts_br = re.compile(r'\bbr\b')
+_accepts_gzip = re.compile(r'\bgzip\b')
+
+
+def negotiate(accept_encoding: str, available=('br', 'gzip')):
+    """The preferred encoding out of `available` that the client accepts, or None."""
+    if 'br' in available and brotli is not None and _accepts_br.search(accept_encoding):
+        return 'br'
+    if 'gzip' in available and _accepts_gzip.search(accept_encoding):
+        return 'gzip'
+    return None
+
+
+def encode(content: bytes, encoding: str, brotli_quality: int = None, gzip_level: int = None) -> bytes:
+    if encoding == 'br':
+        return brotli.compress(content, quality=brotli_quality or getattr(settings, 'RESPONSE_BROTLI_QUALITY', 5))
+    return gzip.compress(content, compresslevel=gzip_level or getattr(settings, 'RESPONSE_GZIP_LEVEL', 6), mtime=0)
+
+
+def compress(content: bytes, accept_encoding: str):
+    """Return `(encoding, compressed bytes)` for the best encoding the client accepts, or None."""
+    encoding = negotiate(accept_encoding)
+    if encoding is None:
+        return None
+    return encoding, encode(content, encoding)
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    def process_response(self, request, response):
+        if not getattr(settings, 'RESPONSE_COMPRESSION', True):
+            return response
+        if response.streaming or response.has_header('Content-Encoding'):
+            return response
+        if len(response.content) < getattr(settings, 'RESPONSE_COMPRESSION_MIN_BYTES', 512):
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoded = compress(response.content, request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if encoded is None:
+            return response
+        encoding, content = encoded
+        if len(content) >= len(response.content):
+            return response
+        response.content = content
+        response['Content-Length'] = str(len(content))
+        response['Content-Encoding'] = encoding
+        if response.has_header('ETag'):
+            # The representation changed, so a strong validator no longer matches byte for byte
+            response['ETag'] = re.sub(r'^"', 'W/"', response['ETag'])
+        return response
@@ -0,0 +1,208 @@
+"""Sweep a bounding box for places and export them to Parquet or CSV.
+
+The box is tiled into search blocks, each searched exactly like one `/api/search/` call
+(same grid, cache, coalescing and rate limiter, at background priority). Finished
+blocks and the IDs of places already written are checkpointed in a SQLite file in the
+output directory, so an interrupted crawl picks up at the first unfinished block when
+run again with the same arguments. New places are buffered and written out in part
+files of about `--chunk-size` rows; memory use does not grow with the area.
+
+    python manage.py crawl_area --bbox 12.85,77.45,13.10,77.75 --category hotels,mess \\
+        --output crawls/bengaluru --format parquet
+
+Set PLACES_API_BASE_URL to crawl against a local stub instead of Google, and
+UPSTREAM_PROVIDER=record to keep the sweep as a cassette that can later be served
+offline with UPSTREAM_PROVIDER=replay.
+"""
+import json
+import math
+import os
+import sqlite3
+import time
+
+import pandas as pd
+from django.core.management.base import BaseCommand, CommandError
+
+import rate_limiter
+import views
+
+EARTH_RADIUS = 6378137
+
+COLUMNS = [
+    'place_id', 'name', 'formatted_address', 'latitude', 'longitude', 'rating', 'user_ratings_total',
+    'price_level', 'business_status', 'primary_type', 'short_address', 'types', 'matched_categories',
+]
+
+
+def iter_blocks(south: float, west: float, north: float, east: float, block_side: float):
+    """Centres of the square blocks (side `block_side` meters) tiling the box, row by row."""
+    lat_step = math.degrees(block_side / EARTH_RADIUS)
+    rows = max(1, math.ceil((north - south) / lat_step))
+    for row in range(rows):
+        lat = south + (row + 0.5) * lat_step
+        lng_step = math.degrees(block_side / (EARTH_RADIUS * math.cos(math.radians(lat))))
+        for col in range(max(1, math.ceil((east - west) / lng_step))):
+            yield lat, west + (col + 0.5) * lng_step
+
+
+def place_row(place: dict, categories: list) -> dict:
+    location = place.get('location') or {}
+    return {
+        'place_id': place['place_id'],
+        'name': place.get('name'),
+        'formatted_address': place.get('formatted_address'),
+        'latitude': location.get('latitude'),
+        'longitude': location.get('longitude'),
+        'rating': place.get('rating'),
+        'user_ratings_total': place.get('user_ratings_total'),
+        'price_level': place.get('price_level'),
+        'business_status': place.get('business_status'),
+        'primary_type': place.get('primary_type'),
+        'short_address': place.get('short_address'),
+        'types': '|'.join(place.get('types') or []),
+        'matched_categories': '|'.join(categories),
+    }
+
+
+class Command(BaseCommand):
+    help = 'Crawl every place in a bounding box into Parquet/CSV part files, resumably.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bbox', required=True, help='south,west,north,east in degrees')
+        parser.add_argument('--category', default='hotels', help='category or comma-separated categories')
+        parser.add_argument('--output', required=True, help='output directory for part files and the checkpoint')
+        parser.add_argument('--format', choices=['parquet', 'csv'], default='parquet')
+        parser.add_argument('--area-size', type=int, default=5000, help='area_size of each search block (meters)')
+        parser.add_argument('--grid-size', type=int, default=3)
+        parser.add_argument('--overlap', type=float, default=0.4)
+        parser.add_argument('--search-mode', choices=['grid', 'tiles', 'adaptive'], default='grid')
+        parser.add_argument('--max-depth', type=int, default=None)
+        parser.add_argument('--max-pages', type=int, default=None)
+        parser.add_argument('--concurrency', type=int, default=None, help='concurrent cell lookups per block')
+        parser.add_argument('--chunk-size', type=int, default=5000, help='rows per output part file')
+        parser.add_argument('--restart', action='store_true',
+                            help='discard the checkpoint and part files of a previous crawl in --output')
+
+    def handle(self, *args, **options):
+        try:
+            south, west, north, east = (float(value) for value in options['bbox'].split(','))
+        except ValueError:
+            raise CommandError('--bbox must be south,west,north,east')
+        if not (south < north and west < east):
+            raise CommandError('--bbox must have south < north and west < east')
+        if options['format'] == 'parquet':
+            try:
+                pd.io.parquet.get_engine('auto')
+            except ImportError:
+                raise CommandError('Parquet output needs pyarrow or fastparquet; install one or use --format csv')
+
+        output = options['output']
+        os.makedirs(output, exist_ok=True)
+        checkpoint_path = os.path.join(output, '_checkpoint.sqlite3')
+        extension = options['format']
+        if options['restart']:
+            for name in os.listdir(output):
+                if name == '_checkpoint.sqlite3' or (name.startswith('part-') and name.endswith(f'.{extension}')):
+                    os.remove(os.path.join(output, name))
+
+        view = views.GooglePlacesHotelSearchView()
+        categories = view._split_categories(options['category'])
+        signature = json.dumps({
+            'bbox': [south, west, north, east], 'categories': categories, 'format': extension,
+            'area_size': options['area_size'], 'grid_size': options['grid_size'], 'overlap': options['overlap'],
+            'search_mode': options['search_mode'], 'max_depth': options['max_depth'],
+            'max_pages': options['max_pages'],
+        }, sort_keys=True)
+
+        conn = sqlite3.connect(checkpoint_path, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)')
+        conn.execute('CREATE TABLE IF NOT EXISTS blocks (block INTEGER PRIMARY KEY)')
+        conn.execute('CREATE TABLE IF NOT EXISTS places (place_id TEXT PRIMARY KEY)')
+        meta = dict(conn.execute('SELECT key, value FROM meta'))
+        if meta.get('args', signature) != signature:
+            raise CommandError(f'{checkpoint_path} belongs to a crawl with different arguments; '
+                               f'use --restart or another --output')
+        if 'args' not in meta:
+            conn.execute("INSERT INTO meta VALUES ('args', ?), ('parts', '0'), ('rows', '0')", (signature,))
+            meta = dict(conn.execute('SELECT key, value FROM meta'))
+        parts, rows = int(meta['parts']), int(meta['rows'])
+
+        block_side = 2 * options['area_size'] * (1 - options['overlap'])
+        total_blocks = sum(1 for _ in iter_blocks(south, west, north, east, block_side))
+        finished = conn.execute('SELECT COUNT(*) FROM blocks').fetchone()[0]
+        if finished:
+            self.stdout.write(f'Resuming: {finished}/{total_blocks} blocks and {rows} places already written')
+
+        buffer = []
+        stats = {'upstream_calls': 0, 'cache_hits': 0, 'index_hits': 0}
+        started = time.monotonic()
+
+        def flush():
+            # Part file first, then commit the blocks and place IDs it covers: after a crash
+            # the uncommitted blocks are simply searched (mostly from cache) again
+            nonlocal parts, rows, buffer
+            if buffer:
+                path = os.path.join(output, f'part-{parts:05d}.{extension}')
+                frame = pd.DataFrame(buffer, columns=COLUMNS)
+                temp_path = os.path.join(output, f'.part-{parts:05d}.{extension}.tmp')
+                if extension == 'parquet':
+                    frame.to_parquet(temp_path, index=False)
+                else:
+                    frame.to_csv(temp_path, index=False)
+                os.replace(temp_path, path)
+                parts += 1
+                rows += len(buffer)
+                conn.execute("UPDATE meta SET value = ? WHERE key = 'parts'", (str(parts),))
+                conn.execute("UPDATE meta SET value = ? WHERE key = 'rows'", (str(rows),))
+                buffer = []
+            conn.execute('COMMIT')
+            conn.execute('BEGIN')
+
+        conn.execute('BEGIN')
+        try:
+            with rate_limiter.priority(rate_limiter.BACKGROUND):
+                for block, (lat, lng) in enumerate(iter_blocks(south, west, north, east, block_side)):
+                    if conn.execute('SELECT 1 FROM blocks WHERE block = ?', (block,)).fetchone():
+                        continue
+                    plan = view._plan_search(lat, lng, categories, options['area_size'], options['grid_size'],
+                                             options['overlap'], options['search_mode'], None,
+                                             options['max_depth'], options['max_pages'])
+                    found = {}
+                    for cell, cell_places in view._resolve_cells(plan, 20, options['concurrency']):
+                        for place in cell_places:
+                            place_categories = found.setdefault(place['place_id'], (place, []))[1]
+                            if cell['keyword'] not in place_categories:
+                                place_categories.append(cell['keyword'])
+                    if plan['stats']['stale_cells'] or plan['stats']['skipped_cells']:
+                        flush()
+                        raise CommandError(f'Upstream unavailable (circuit {views.circuit_breaker.get_breaker().state}) '
+                                           f'at block {finished + 1}/{total_blocks}; run again later to resume')
+                    new = 0
+                    for place_id, (place, place_categories) in found.items():
+                        if conn.execute('INSERT OR IGNORE INTO places VALUES (?)', (place_id,)).rowcount:
+                            buffer.append(place_row(place, place_categories))
+                            new += 1
+                    conn.execute('INSERT INTO blocks VALUES (?)', (block,))
+                    finished += 1
+                    for key in stats:
+                        stats[key] += plan['stats'][key]
+                    self.stdout.write(f'Block {finished}/{total_blocks} ({lat:.5f},{lng:.5f}): '
+                                      f'{len(found)} places, {new} new')
+                    if len(buffer) >= options['chunk_size']:
+                        flush()
+            flush()
+        except KeyboardInterrupt:
+            flush()
+            conn.execute('COMMIT')
+            self.stdout.write(self.style.WARNING(
+                f'Interrupted after {finished}/{total_blocks} blocks; run the same command again to resume'))
+            return
+        finally:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            conn.close()
+        self.stdout.write(self.style.SUCCESS(
+            f'Crawled {total_blocks} blocks in {time.monotonic() - started:.1f}s: {rows} places in {parts} '
+            f'{extension} part files under {output} ({stats["upstream_calls"]} upstream calls, '
+            f'{stats["cache_hits"]} cache hits, {stats["index_hits"]} index hits)'))
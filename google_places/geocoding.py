@@ -0,0 +1,143 @@
+"""Shared geocoding with a normalised-address cache.
+
+`AddressSearchAPI`, `ConsolidatedPlacesAPI` and `GoogleGeocodingView` all resolve
+addresses through `geocode()`, so `/geocode/` followed by a search for the same address
+costs one upstream call. Addresses are normalised (case, accents, punctuation,
+whitespace, region code) before keying, results are kept for a long time, and an
+optional seed file answers known localities without any upstream call.
+
+Seed file format (`GEOCODE_SEED_FILE`, JSON list)::
+
+    [
+        {"address": "MG Road, Bengaluru", "region": "in",
+         "location": {"latitude": 12.9746905, "longitude": 77.6094613},
+         "formattedAddress": "MG Road, Bengaluru, Karnataka, India",
+         "types": ["route"]}
+    ]
+
+`region` may be omitted to match the address under any region code; `viewport` is
+optional and uses the Places API shape (`{"high": {...}, "low": {...}}`).
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import unicodedata
+from typing import Dict, Optional
+
+import requests
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+
+import providers
+
+logger = logging.getLogger(__name__)
+
+GEOCODE_FIELD_MASK = 'places.formattedAddress,places.location,places.types,places.viewport'
+
+# Cached marker for addresses Google has no match for
+NOT_FOUND = {'not_found': True}
+
+_seed = None
+_seed_lock = threading.Lock()
+
+
+def normalize_address(address: str) -> str:
+    """'  M.G. Road,  Bengaluru ' and 'mg road bengaluru' normalise to the same string."""
+    text = unicodedata.normalize('NFKD', str(address or ''))
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch)).lower()
+    text = re.sub(r"[.'`’]", '', text)
+    text = re.sub(r'[^\w]+', ' ', text)
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+def normalize_region(region_code: Optional[str]) -> str:
+    return str(region_code or '').strip().lower()
+
+
+def cache_key(address: str, region_code: Optional[str] = None) -> str:
+    digest = hashlib.sha1(normalize_address(address).encode('utf-8')).hexdigest()
+    return f'geocode_{normalize_region(region_code) or "any"}_{digest}'
+
+
+def _load_seed() -> Dict:
+    global _seed
+    if _seed is None:
+        with _seed_lock:
+            if _seed is None:
+                seed = {}
+                path = getattr(settings, 'GEOCODE_SEED_FILE', None)
+                if path and os.path.exists(path):
+                    try:
+                        with open(path, 'r', encoding='utf-8') as f:
+                            entries = json.load(f)
+                        for entry in entries:
+                            place = {key: value for key, value in entry.items() if key not in ('address', 'region')}
+                            seed[(normalize_region(entry.get('region')), normalize_address(entry['address']))] = place
+                    except (OSError, ValueError, KeyError, TypeError) as e:
+                        logger.warning('Failed to load geocode seed file %s: %s', path, e)
+                _seed = seed
+    return _seed
+
+
+def seed_lookup(address: str, region_code: Optional[str] = None) -> Optional[Dict]:
+    seed = _load_seed()
+    normalized = normalize_address(address)
+    return seed.get((normalize_region(region_code), normalized)) or seed.get(('', normalized))
+
+
+def _payload(address: str, region_code: Optional[str]) -> Dict:
+    """Body of the upstream text search for `address`."""
+    payload = {'textQuery': address}
+    if normalize_region(region_code):
+        payload['regionCode'] = normalize_region(region_code)
+    return payload
+
+
+def _from_response(key: str, data: Dict) -> Optional[Dict]:
+    """Cache and return the best match of an upstream response (None, cached briefly, when there is none)."""
+    if 'places' not in data or not data['places']:
+        cache.set(key, NOT_FOUND, timeout=getattr(settings, 'GEOCODE_NOT_FOUND_TIMEOUT', 600))
+        return None
+    place = data['places'][0]
+    cache.set(key, place, timeout=getattr(settings, 'GEOCODE_CACHE_TIMEOUT', 30 * 24 * 3600))
+    return place
+
+
+def geocode(address: str, region_code: Optional[str] = None, timeout: float = 15) -> Optional[Dict]:
+    """Return the best Places API match for `address` (location, formattedAddress, types, viewport).
+
+    Returns None when Google has no match. Upstream failures raise `requests.RequestException`
+    and are never cached.
+    """
+    seeded = seed_lookup(address, region_code)
+    if seeded is not None:
+        return seeded
+    key = cache_key(address, region_code)
+    cached = cache.get(key)
+    if cached is not None:
+        return None if cached == NOT_FOUND else cached
+
+    response = providers.get_provider().search_text(_payload(address, region_code), GEOCODE_FIELD_MASK,
+                                                    timeout=timeout)
+    response.raise_for_status()
+    return _from_response(key, response.json())
+
+
+async def ageocode(address: str, region_code: Optional[str] = None, timeout: float = 15) -> Optional[Dict]:
+    """`geocode` for the async views: the upstream call is awaited through the provider's async path."""
+    seeded = seed_lookup(address, region_code)
+    if seeded is not None:
+        return seeded
+    key = cache_key(address, region_code)
+    cached = await cache.aget(key)
+    if cached is not None:
+        return None if cached == NOT_FOUND else cached
+
+    response = await providers.get_provider().asearch_text(_payload(address, region_code), GEOCODE_FIELD_MASK,
+                                                           timeout=timeout)
+    response.raise_for_status()
+    return await sync_to_async(_from_response)(key, response.json())
@@ -0,0 +1,43 @@
+"""Vectorised geometry for search planning and result post-processing.
+
+Cell centres for a whole grid and distances for a whole result list are computed as
+NumPy array operations instead of per-item Python loops; large crawls plan thousands
+of cells and score tens of thousands of places per run.
+"""
+from typing import List, Tuple
+
+import numpy as np
+
+EARTH_RADIUS = 6378137
+
+
+def grid_centres(lat: float, lng: float, grid_size: int, step_meters: float) -> Tuple[List[float], List[float]]:
+    """Latitudes and longitudes of a `grid_size` x `grid_size` grid of cells `step_meters` apart.
+
+    Cells are ordered column by column (i, then j), as `_build_grid_cells` labels them;
+    i steps east and j steps north of the centre cell.
+    """
+    offsets = (np.arange(grid_size) - grid_size // 2) * step_meters
+    offset_x, offset_y = np.meshgrid(offsets, offsets, indexing='ij')
+    lats = lat + (offset_y / EARTH_RADIUS) * (180 / np.pi)
+    lngs = lng + (offset_x / (EARTH_RADIUS * np.cos(np.pi * lat / 180))) * (180 / np.pi)
+    return lats.ravel().tolist(), lngs.ravel().tolist()
+
+
+def haversine_meters(lat: float, lng: float, lats, lngs) -> np.ndarray:
+    """Great-circle distances in meters from one point to arrays of points."""
+    phi1 = np.radians(lat)
+    phi2 = np.radians(np.asarray(lats, dtype=float))
+    d_phi = phi2 - phi1
+    d_lambda = np.radians(np.asarray(lngs, dtype=float) - lng)
+    a = np.sin(d_phi / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS * np.arcsin(np.minimum(1.0, np.sqrt(a)))
+
+
+def place_distances(lat: float, lng: float, places: List[dict]) -> np.ndarray:
+    """Distance in meters from lat/lng to every place; NaN for places without coordinates."""
+    coords = np.array([
+        ((place.get('location') or {}).get('latitude'), (place.get('location') or {}).get('longitude'))
+        for place in places
+    ], dtype=float).reshape(-1, 2)
+    return haversine_meters(lat, lng, coords[:, 0], coords[:, 1])
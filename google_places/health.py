@@ -1,5 +1,10 @@
 import os
-import requests
+import circuit_breaker
+import providers
+import rate_limiter
+import singleflight
+import spatial_index
+import upstream
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
@@ -9,6 +14,7 @@ class HealthCheckView(APIView):
         """Simple health check to test environment variables and basic functionality"""
         try:
             api_key = os.getenv('GOOGLE_PLACES_API_KEY')
+            provider = providers.get_provider()
             
             # Test basic info
             health_data = {
@@ -20,17 +26,17 @@ class HealthCheckView(APIView):
                 },
                 'python_version': os.sys.version,
                 'working_directory': os.getcwd(),
+                'upstream_provider': provider.stats(),
+                'upstream_pool': upstream.pool_stats(),
+                'spatial_index': spatial_index.index_stats(),
+                'coalescing': singleflight.stats(),
+                'upstream_scheduler': rate_limiter.get_scheduler().stats(),
+                'upstream_circuit': circuit_breaker.get_breaker().stats(),
             }
             
             # Test a simple Google API call
-            if api_key:
+            if provider.configured():
                 try:
-                    test_url = 'https://places.googleapis.com/v1/places:searchText'
-                    test_headers = {
-                        'Content-Type': 'application/json',
-                        'X-Goog-Api-Key': api_key,
-                        'X-Goog-FieldMask': 'places.id,places.displayName'
-                    }
                     test_payload = {
                         'textQuery': 'hotel',
                         'locationBias': {
@@ -42,7 +48,8 @@ class HealthCheckView(APIView):
                         'maxResultCount': 1
                     }
                     
-                    response = requests.post(test_url, headers=test_headers, json=test_payload, timeout=10)
+                    with rate_limiter.priority(rate_limiter.PROBE):
+                        response = provider.search_text(test_payload, 'places.id,places.displayName', timeout=10)
                     health_data['api_test'] = {
                         'status_code': response.status_code,
                         'success': response.status_code == 200,
@@ -0,0 +1,265 @@
+"""In-process metrics registry, served at `/metrics` in the Prometheus text format.
+
+Hot-path code records into module-level counters, gauges and histograms; components
+that already keep their own counters (cache tiers, coalescing, upstream scheduler,
+circuit breaker) are read by collectors at scrape time, so they cost nothing per
+request. Values are per process: with several workers, scrape each of them.
+
+Per-request phase timings (geocode, fan-out, merge, serialise) are recorded with
+`phase()` into a context variable that `MetricsMiddleware` sets up, and reported in
+the `Server-Timing` response header.
+"""
+import contextvars
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Tuple
+
+from django.http import HttpResponse
+from django.utils.deprecation import MiddlewareMixin
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+COUNT_BUCKETS = (0, 1, 5, 10, 20, 50, 100, 200, 500, 1000, 2000)
+
+_registry = []
+_collectors = []
+_registry_lock = threading.Lock()
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names: Tuple[str, ...], values: Tuple, extra: Dict = None) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs.extend(f'{name}="{_escape(value)}"' for name, value in (extra or {}).items())
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Metric:
+    kind = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+        with _registry_lock:
+            _registry.append(self)
+
+    def _key(self, labels: Dict) -> Tuple:
+        return tuple(labels.get(name, '') for name in self.labelnames)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f'{self.name}{_labels(self.labelnames, key)} {_number(value)}' for key, value in items]
+
+    def render(self) -> List[str]:
+        return [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}'] + self._samples()
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Counter):
+    kind = 'gauge'
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            # Cumulative bucket counts, then sum
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * len(self.buckets) + [0.0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[index] += 1
+            state[-1] += value
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, list(state)) for key, state in self._values.items())
+        lines = []
+        for key, state in items:
+            for bound, count in zip(self.buckets, state):
+                lines.append(f'{self.name}_bucket{_labels(self.labelnames, key, {"le": _number(bound)})} {count}')
+            lines.append(f'{self.name}_sum{_labels(self.labelnames, key)} {_number(state[-1])}')
+            lines.append(f'{self.name}_count{_labels(self.labelnames, key)} {state[-2]}')
+        return lines
+
+
+def register_collector(collect: Callable[[], Iterable[Tuple[str, str, str, Dict, float]]]):
+    """Add a scrape-time source of `(name, kind, help, labels, value)` samples."""
+    with _registry_lock:
+        _collectors.append(collect)
+
+
+def render() -> str:
+    """Every registered metric and collector sample in the Prometheus text exposition format."""
+    with _registry_lock:
+        metrics, collectors = list(_registry), list(_collectors)
+    lines = []
+    for metric in metrics:
+        lines.extend(metric.render())
+    for collect in collectors:
+        try:
+            samples = list(collect())
+        except Exception:
+            logger.exception('Metrics collector %s failed', getattr(collect, '__name__', collect))
+            continue
+        described = set()
+        for name, kind, documentation, labels, value in samples:
+            if name not in described:
+                described.add(name)
+                lines.extend([f'# HELP {name} {documentation}', f'# TYPE {name} {kind}'])
+            lines.append(f'{name}{_labels(tuple(labels), tuple(labels.values()))} {_number(value)}')
+    return '\n'.join(lines) + '\n'
+
+
+# -- Hot-path metrics ---------------------------------------------------------
+
+upstream_latency = Histogram('places_upstream_request_duration_seconds',
+                             'Upstream Places API call latency.', ('endpoint', 'status'))
+http_latency = Histogram('places_http_request_duration_seconds',
+                         'Time to produce a response (headers for streams), by route.', ('route', 'status'))
+http_in_flight = Gauge('places_http_requests_in_flight', 'Requests being handled by this process.')
+search_cells = Histogram('places_search_cells', 'Grid cells resolved per search.', ('mode',), COUNT_BUCKETS)
+search_results = Histogram('places_search_results', 'Places returned per search response.', ('mode',),
+                           COUNT_BUCKETS)
+
+
+def _collect_components():
+    """Counters kept by the cache, coalescing, scheduler, breaker and client modules themselves."""
+    import cache_backends
+    import circuit_breaker
+    import rate_limiter
+    import singleflight
+    import upstream
+
+    for name, value in sorted(cache_backends.cache_stats().items()):
+        # l1_hits, l1_misses, l2_hits, l2_misses
+        tier, _, result = name.partition('_')
+        yield ('places_cache_requests_total', 'counter', 'Cache lookups per tier (l1 in-process, l2 shared).',
+               {'tier': tier, 'result': {'hits': 'hit', 'misses': 'miss'}.get(result, result)}, value)
+    coalescing = singleflight.stats()
+    for role in ('leaders', 'coalesced_local', 'coalesced_shared', 'cache_hits'):
+        yield ('places_singleflight_calls_total', 'counter', 'Cell fetches by singleflight role.',
+               {'role': role}, coalescing.get(role, 0))
+    scheduler = rate_limiter.get_scheduler().stats()
+    yield ('places_upstream_queue_depth', 'gauge', 'Calls waiting for a rate limiter slot.', {},
+           scheduler['queue_depth'])
+    yield ('places_upstream_tokens', 'gauge', 'Rate limiter tokens available.', {}, scheduler['tokens'])
+    for priority, granted in sorted(scheduler['granted'].items()):
+        yield ('places_upstream_granted_total', 'counter', 'Rate limiter slots granted, by priority.',
+               {'priority': priority}, granted)
+    yield ('places_upstream_rejected_total', 'counter', 'Calls refused by the rate limiter or daily budget.', {},
+           scheduler['rejected'])
+    breaker = circuit_breaker.get_breaker().stats()
+    for state in (circuit_breaker.CLOSED, circuit_breaker.OPEN, circuit_breaker.HALF_OPEN):
+        yield ('places_upstream_circuit_state', 'gauge', 'Upstream circuit breaker state (1 = current).',
+               {'state': state}, 1 if breaker['state'] == state else 0)
+    yield ('places_upstream_in_flight', 'gauge', 'Upstream calls in flight on the sync client.', {},
+           upstream.get_client().stats()['in_flight'])
+
+
+register_collector(_collect_components)
+
+
+def metrics_view(request):
+    """`GET /metrics`: Prometheus text exposition of this process's metrics."""
+    return HttpResponse(render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+# -- Per-request phase timings -------------------------------------------------
+
+_timings = contextvars.ContextVar('request_timings', default=None)
+
+
+def start_timings() -> Tuple[contextvars.Token, Dict[str, float]]:
+    timings = {}
+    return _timings.set(timings), timings
+
+
+def reset_timings(token: contextvars.Token):
+    _timings.reset(token)
+
+
+def current_timings() -> Dict[str, float]:
+    """Phase durations (milliseconds) recorded so far in this request, or {} outside one."""
+    return {name: round(duration, 1) for name, duration in (_timings.get() or {}).items()}
+
+
+@contextmanager
+def phase(name: str):
+    """Time a block as phase `name` of the current request (summed if entered repeatedly)."""
+    timings = _timings.get()
+    if timings is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = timings.get(name, 0.0) + (time.perf_counter() - started) * 1000
+
+
+class MetricsMiddleware(MiddlewareMixin):
+    """Count in-flight requests, time them per route, and add a `Server-Timing` header."""
+
+    def process_request(self, request):
+        request._metrics_started = time.perf_counter()
+        request._metrics_token, request._metrics_timings = start_timings()
+        http_in_flight.inc()
+
+    def process_response(self, request, response):
+        started = getattr(request, '_metrics_started', None)
+        if started is None:
+            return response
+        http_in_flight.dec()
+        match = getattr(request, 'resolver_match', None)
+        route = (match.url_name or match.route) if match else 'unmatched'
+        elapsed = time.perf_counter() - started
+        http_latency.observe(elapsed, route=route, status=f'{response.status_code // 100}xx')
+        timings = request._metrics_timings
+        entries = [f'{name};dur={duration:.1f}' for name, duration in timings.items()]
+        entries.append(f'total;dur={elapsed * 1000:.1f}')
+        response['Server-Timing'] = ', '.join(entries)
+        try:
+            reset_timings(request._metrics_token)
+        except ValueError:
+            # Set in a different context (async request adapted through a thread)
+            pass
+        return response
@@ -0,0 +1,32 @@
+"""Place-level entity store.
+
+Every formatted place is cached once under its `place_id`; grid cells and tiles only
+cache the ordered list of IDs they returned. Responses are assembled with a single
+multi-get, so a popular place is stored once no matter how many cells contain it.
+"""
+from typing import Dict, Iterable, List
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+def place_key(place_id: str) -> str:
+    return f'place_{place_id}'
+
+
+def store_places(places: List[Dict], timeout: int = None):
+    """Write canonical `format_place_data` records, keyed by place_id."""
+    if not places:
+        return
+    if timeout is None:
+        timeout = getattr(settings, 'PLACES_RECORD_TIMEOUT', 86400)
+    cache.set_many({place_key(place['place_id']): place for place in places}, timeout=timeout)
+
+
+def load_places(place_ids: Iterable[str]) -> Dict[str, Dict]:
+    """Bulk-fetch place records; IDs that are no longer cached are simply absent."""
+    keys = {place_key(place_id): place_id for place_id in dict.fromkeys(place_ids)}
+    if not keys:
+        return {}
+    found = cache.get_many(list(keys))
+    return {keys[key]: record for key, record in found.items()}
@@ -0,0 +1,311 @@
+"""Upstream providers: where answers to Places API requests come from.
+
+Grid searches, geocoding, place details and the health probe all ask `get_provider()`
+instead of building Google URLs and headers themselves. UPSTREAM_PROVIDER selects:
+
+- `google` (default): live calls to the Places API (New) at PLACES_API_BASE_URL,
+  through the shared upstream client (circuit breaker, rate limiter, connection pool);
+- `record`: the same live calls, and every answer that is not a server error is also
+  saved to the cassette at UPSTREAM_CASSETTE;
+- `replay`: answers only from the cassette, with no network and no API key needed.
+  A request that was never recorded gets a 404, so the search treats that cell as
+  unavailable, exactly as it would for a failed upstream call.
+
+A cassette is one SQLite file with zlib-compressed bodies, keyed by the request
+(method, endpoint, field mask, body) without the API key. Record a city by running
+the searches or a `crawl_area` sweep with UPSTREAM_PROVIDER=record, then serve it
+offline, or replay it in load tests, with UPSTREAM_PROVIDER=replay and the same
+search parameters.
+"""
+import abc
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Dict, Optional
+
+import requests
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+import upstream
+
+logger = logging.getLogger(__name__)
+
+SEARCH_TEXT_PATH = '/v1/places:searchText'
+
+
+class CassetteResponse:
+    """A recorded answer, through the subset of the requests API the callers use."""
+
+    def __init__(self, status_code: int, body: bytes, path: str):
+        self.status_code = status_code
+        self.content = body
+        self.headers = {'Content-Type': 'application/json', 'X-Upstream-Provider': 'replay'}
+        self._path = path
+
+    @property
+    def text(self):
+        return self.content.decode('utf-8')
+
+    def json(self):
+        return json.loads(self.content)
+
+    def raise_for_status(self):
+        if 400 <= self.status_code < 600:
+            raise requests.HTTPError(f"{self.status_code} Error for replayed {self._path}", response=self)
+
+
+def _key_payload(path: str, payload: Optional[Dict]) -> Optional[Dict]:
+    """The request body a cassette key is built from.
+
+    Address lookups (text searches without a location) are keyed by the address as the
+    geocode cache normalises it, so spellings that share a cache entry also share a
+    recording. The query sent upstream is left as the caller wrote it.
+    """
+    if (path != SEARCH_TEXT_PATH or not payload or 'textQuery' not in payload
+            or 'locationBias' in payload or 'locationRestriction' in payload):
+        return payload
+    # geocoding imports this module, so it is only imported once both are loaded
+    import geocoding
+    return dict(payload, textQuery=geocoding.normalize_address(payload['textQuery']))
+
+
+class Cassette:
+    """Recorded upstream answers in one SQLite file, shared by every worker on the host."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._init_lock = threading.Lock()
+        self._initialised = False
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            with self._init_lock:
+                if not self._initialised:
+                    conn.execute(
+                        'CREATE TABLE IF NOT EXISTS interactions ('
+                        ' key TEXT PRIMARY KEY,'
+                        ' endpoint TEXT NOT NULL,'
+                        ' request BLOB NOT NULL,'
+                        ' status INTEGER NOT NULL,'
+                        ' body BLOB NOT NULL,'
+                        ' recorded REAL NOT NULL)'
+                    )
+                    self._initialised = True
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def key(method: str, path: str, field_mask: str, payload: Optional[Dict]) -> str:
+        request = json.dumps([method.upper(), path, field_mask, _key_payload(path, payload)], sort_keys=True,
+                             separators=(',', ':'))
+        return hashlib.sha1(request.encode('utf-8')).hexdigest()
+
+    def get(self, key: str):
+        """(status, body) recorded under `key`, or None."""
+        row = self._connection().execute('SELECT status, body FROM interactions WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+        return row[0], zlib.decompress(row[1])
+
+    def put(self, key: str, method: str, path: str, field_mask: str, payload: Optional[Dict], status: int,
+            body: bytes):
+        request = json.dumps({'method': method.upper(), 'path': path, 'field_mask': field_mask, 'body': payload},
+                             separators=(',', ':'))
+        self._connection().execute(
+            'INSERT OR REPLACE INTO interactions (key, endpoint, request, status, body, recorded)'
+            ' VALUES (?, ?, ?, ?, ?, ?)',
+            (key, upstream.endpoint_name(path), zlib.compress(request.encode('utf-8'), 9), status,
+             zlib.compress(body, 9), time.time()),
+        )
+
+    def stats(self) -> Dict:
+        try:
+            rows = self._connection().execute(
+                'SELECT endpoint, COUNT(*), SUM(LENGTH(body)) FROM interactions GROUP BY endpoint').fetchall()
+        except sqlite3.Error as e:
+            return {'path': self.path, 'error': str(e)}
+        return {
+            'path': self.path,
+            'interactions': {endpoint: count for endpoint, count, _ in rows},
+            'compressed_bytes': sum(size or 0 for _, _, size in rows),
+        }
+
+
+class Provider(abc.ABC):
+    """The upstream requests this service makes; subclasses decide how they are answered.
+
+    Every method returns a response with `status_code`, `json()`, `text` and
+    `raise_for_status()`, as `requests` does; transport failures raise
+    `requests.RequestException` (or `circuit_breaker.CircuitOpen`).
+    """
+
+    name = None
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = {}
+
+    def _count(self, name: str):
+        with self._lock:
+            self._counts[name] = self._counts.get(name, 0) + 1
+
+    def configured(self) -> bool:
+        """Whether requests can be answered at all."""
+        return True
+
+    @abc.abstractmethod
+    def _call(self, method: str, path: str, field_mask: str, payload: Optional[Dict], timeout: float):
+        """Answer one request; `path` is relative to the API root, e.g. '/v1/places:searchText'."""
+
+    @abc.abstractmethod
+    async def _acall(self, method: str, path: str, field_mask: str, payload: Optional[Dict], timeout: float):
+        """`_call` for the async views."""
+
+    def search_text(self, payload: Dict, field_mask: str, timeout: float = 8):
+        """`places:searchText`: grid cell searches (with `locationBias`) and address lookups."""
+        return self._call('post', SEARCH_TEXT_PATH, field_mask, payload, timeout)
+
+    async def asearch_text(self, payload: Dict, field_mask: str, timeout: float = 8):
+        return await self._acall('post', SEARCH_TEXT_PATH, field_mask, payload, timeout)
+
+    def place_details(self, place_id: str, field_mask: str, timeout: float = 8):
+        return self._call('get', f'/v1/places/{place_id}', field_mask, None, timeout)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            counts = dict(self._counts)
+        return {'provider': self.name, 'calls': counts}
+
+
+class GoogleProvider(Provider):
+    """Live Places API (New) calls through the shared upstream clients."""
+
+    name = 'google'
+
+    def configured(self) -> bool:
+        # Live calls need an API key
+        return bool(os.getenv('GOOGLE_PLACES_API_KEY'))
+
+    def _headers(self, field_mask: str) -> Dict:
+        return {
+            'Content-Type': 'application/json',
+            'X-Goog-Api-Key': os.getenv('GOOGLE_PLACES_API_KEY'),
+            'X-Goog-FieldMask': field_mask,
+        }
+
+    def _call(self, method: str, path: str, field_mask: str, payload: Optional[Dict], timeout: float):
+        self._count('live')
+        return upstream.get_client().request(method, upstream.api_url(path), headers=self._headers(field_mask),
+                                             json=payload, timeout=timeout)
+
+    async def _acall(self, method: str, path: str, field_mask: str, payload: Optional[Dict], timeout: float):
+        self._count('live')
+        return await upstream.get_async_client().request(method, upstream.api_url(path),
+                                                         headers=self._headers(field_mask), json=payload,
+                                                         timeout=timeout)
+
+
+class RecordingProvider(GoogleProvider):
+    """Live calls whose answers are also written to a cassette."""
+
+    name = 'record'
+
+    def __init__(self, cassette: Cassette):
+        super().__init__()
+        self.cassette = cassette
+
+    def _record(self, method: str, path: str, field_mask: str, payload: Optional[Dict], response):
+        # Server errors and throttling say nothing about the place data; don't replay them
+        if response.status_code >= 500 or response.status_code == 429:
+            return
+        try:
+            self.cassette.put(Cassette.key(method, path, field_mask, payload), method, path, field_mask, payload,
+                              response.status_code, response.content)
+            self._count('recorded')
+        except sqlite3.Error as e:
+            logger.warning('Recording %s to %s failed: %s', path, self.cassette.path, e)
+
+    def _call(self, method: str, path: str, field_mask: str, payload: Optional[Dict], timeout: float):
+        response = super()._call(method, path, field_mask, payload, timeout)
+        self._record(method, path, field_mask, payload, response)
+        return response
+
+    async def _acall(self, method: str, path: str, field_mask: str, payload: Optional[Dict], timeout: float):
+        response = await super()._acall(method, path, field_mask, payload, timeout)
+        await asyncio.to_thread(self._record, method, path, field_mask, payload, response)
+        return response
+
+    def stats(self) -> Dict:
+        return dict(super().stats(), cassette=self.cassette.stats())
+
+
+class ReplayProvider(Provider):
+    """Answers from a cassette only; never touches the network."""
+
+    name = 'replay'
+
+    def __init__(self, cassette: Cassette):
+        super().__init__()
+        self.cassette = cassette
+
+    def _call(self, method: str, path: str, field_mask: str, payload: Optional[Dict], timeout: float):
+        recorded = self.cassette.get(Cassette.key(method, path, field_mask, payload))
+        if recorded is None:
+            self._count('misses')
+            body = json.dumps({'error': {'code': 404, 'status': 'NOT_FOUND',
+                                         'message': f'No recorded response in {self.cassette.path}'}})
+            return CassetteResponse(404, body.encode('utf-8'), path)
+        self._count('hits')
+        return CassetteResponse(recorded[0], recorded[1], path)
+
+    async def _acall(self, method: str, path: str, field_mask: str, payload: Optional[Dict], timeout: float):
+        # A primary-key read from a local file: cheaper than a hop to a worker thread
+        return self._call(method, path, field_mask, payload, timeout)
+
+    def stats(self) -> Dict:
+        return dict(super().stats(), cassette=self.cassette.stats())
+
+
+PROVIDERS = {
+    'google': lambda cassette: GoogleProvider(),
+    'record': RecordingProvider,
+    'replay': ReplayProvider,
+}
+
+_provider = None
+_provider_lock = threading.Lock()
+
+
+def get_provider() -> Provider:
+    """Return the process-wide provider chosen by UPSTREAM_PROVIDER, creating it on first use.
+
+    Raises ImproperlyConfigured for 'record' or 'replay' without an UPSTREAM_CASSETTE path.
+    """
+    global _provider
+    if _provider is None:
+        with _provider_lock:
+            if _provider is None:
+                name = getattr(settings, 'UPSTREAM_PROVIDER', 'google')
+                if name not in PROVIDERS:
+                    logger.warning("Unknown UPSTREAM_PROVIDER %r; using 'google'", name)
+                    name = 'google'
+                cassette_path = getattr(settings, 'UPSTREAM_CASSETTE', None)
+                if name != 'google' and not cassette_path:
+                    raise ImproperlyConfigured(f'UPSTREAM_PROVIDER={name!r} needs an UPSTREAM_CASSETTE path')
+                _provider = PROVIDERS[name](Cassette(cassette_path) if cassette_path else None)
+    return _provider
@@ -0,0 +1,173 @@
+"""Token-bucket scheduler and daily quota budget for upstream Google Places calls.
+
+Every call made through `upstream.get_client()` first takes a token here. Tokens refill
+at `UPSTREAM_QPS` per second (bursting up to `UPSTREAM_BURST`), callers wait in priority
+order, so interactive map searches are served before background work such as batch
+jobs, crawls and health probes, and a shared per-day counter stops calls once
+`UPSTREAM_DAILY_BUDGET` is spent.
+
+The priority of the current request is carried in a context variable::
+
+    with rate_limiter.priority(rate_limiter.BACKGROUND):
+        view.perform_search(...)
+"""
+import contextvars
+import heapq
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Dict
+
+import requests
+from django.conf import settings
+from django.core.cache import cache
+
+INTERACTIVE = 0
+BACKGROUND = 10
+PROBE = 20
+
+PRIORITY_NAMES = {INTERACTIVE: 'interactive', BACKGROUND: 'background', PROBE: 'probe'}
+
+_current_priority = contextvars.ContextVar('upstream_priority', default=INTERACTIVE)
+
+
+class RateLimited(requests.RequestException):
+    """Waited longer than UPSTREAM_QUEUE_TIMEOUT for an upstream slot."""
+
+
+class QuotaExceeded(requests.RequestException):
+    """The daily upstream budget is spent."""
+
+
+@contextmanager
+def priority(level: int):
+    token = _current_priority.set(level)
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+
+def current_priority() -> int:
+    return _current_priority.get()
+
+
+class UpstreamScheduler:
+    def __init__(self, qps: float = 10, burst: int = 10, daily_budget: int = 0, queue_timeout: float = 10):
+        self.qps = qps
+        self.burst = max(1, burst)
+        self.daily_budget = daily_budget
+        self.queue_timeout = queue_timeout
+        self._cond = threading.Condition()
+        self._tokens = float(self.burst)
+        self._last_refill = time.monotonic()
+        self._paused_until = 0.0
+        self._waiting = []
+        self._sequence = itertools.count()
+        self._granted = {name: 0 for name in PRIORITY_NAMES.values()}
+        self._rejected = 0
+
+    def _refill(self, now: float):
+        self._tokens = min(self.burst, self._tokens + (now - self._last_refill) * self.qps)
+        self._last_refill = now
+
+    def acquire(self, level: int = None, timeout: float = None):
+        """Block until the caller may make one upstream call; raise RateLimited/QuotaExceeded otherwise."""
+        if level is None:
+            level = current_priority()
+        if timeout is None:
+            timeout = self.queue_timeout
+        if self.qps > 0:
+            deadline = time.monotonic() + timeout
+            with self._cond:
+                ticket = (level, next(self._sequence))
+                heapq.heappush(self._waiting, ticket)
+                try:
+                    while True:
+                        now = time.monotonic()
+                        self._refill(now)
+                        if self._waiting[0] == ticket and self._tokens >= 1 and now >= self._paused_until:
+                            self._tokens -= 1
+                            break
+                        if now >= deadline:
+                            self._rejected += 1
+                            raise RateLimited(f'Upstream queue wait exceeded {timeout}s')
+                        wait = deadline - now
+                        if self._waiting[0] == ticket:
+                            wait = min(wait, max((1 - self._tokens) / self.qps, self._paused_until - now, 0.001))
+                        self._cond.wait(wait)
+                finally:
+                    self._waiting.remove(ticket)
+                    heapq.heapify(self._waiting)
+                    self._cond.notify_all()
+        self._spend_budget()
+        with self._cond:
+            name = PRIORITY_NAMES.get(level, str(level))
+            self._granted[name] = self._granted.get(name, 0) + 1
+
+    def throttle(self, seconds: float = 1.0):
+        """Pause all grants after the upstream answered 429."""
+        with self._cond:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._tokens = 0
+
+    def _budget_key(self) -> str:
+        return f"upstream_budget_{datetime.now(timezone.utc).strftime('%Y%m%d')}"
+
+    def _spend_budget(self):
+        if not self.daily_budget:
+            return
+        key = self._budget_key()
+        cache.add(key, 0, timeout=2 * 24 * 3600)
+        used = cache.incr(key)
+        if used > self.daily_budget:
+            with self._cond:
+                self._rejected += 1
+            raise QuotaExceeded(f'Daily upstream budget of {self.daily_budget} calls is spent')
+
+    def budget_used(self) -> int:
+        if not self.daily_budget:
+            return 0
+        key = self._budget_key()
+        cache.add(key, 0, timeout=2 * 24 * 3600)
+        return cache.incr(key, 0)
+
+    def stats(self) -> Dict:
+        used = self.budget_used()
+        with self._cond:
+            self._refill(time.monotonic())
+            return {
+                'qps': self.qps,
+                'burst': self.burst,
+                'tokens': round(self._tokens, 2),
+                'queue_depth': len(self._waiting),
+                'queued_by_priority': {
+                    PRIORITY_NAMES.get(level, str(level)): sum(1 for waiting, _ in self._waiting if waiting == level)
+                    for level in sorted({level for level, _ in self._waiting})
+                },
+                'granted': dict(self._granted),
+                'rejected': self._rejected,
+                'daily_budget': self.daily_budget or None,
+                'budget_used_today': used if self.daily_budget else None,
+                'budget_remaining': max(self.daily_budget - used, 0) if self.daily_budget else None,
+            }
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> UpstreamScheduler:
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = UpstreamScheduler(
+                    qps=getattr(settings, 'UPSTREAM_QPS', 10),
+                    burst=getattr(settings, 'UPSTREAM_BURST', 10),
+                    daily_budget=getattr(settings, 'UPSTREAM_DAILY_BUDGET', 0),
+                    queue_timeout=getattr(settings, 'UPSTREAM_QUEUE_TIMEOUT', 10),
+                )
+    return _scheduler
@@ -0,0 +1,45 @@
+"""Fast JSON encoding for the search endpoints.
+
+orjson is used when installed; it encodes the large place lists these views return
+several times faster than the standard library. Without it the stock DRF renderer and
+`json` are used, so the output is the same either way.
+"""
+import json
+
+from rest_framework.renderers import JSONRenderer
+
+import metrics
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def dumps(data) -> str:
+    """Compact JSON text, used for streamed events."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(data).decode('utf-8')
+        except TypeError:
+            pass
+    return json.dumps(data, separators=(',', ':'), ensure_ascii=False)
+
+
+class FastJSONRenderer(JSONRenderer):
+    """DRF JSON renderer that encodes with orjson unless the client asked for indented output."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        with metrics.phase('serialise'):
+            return self._render(data, accepted_media_type, renderer_context)
+
+    def _render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is not None and not self.get_indent(accepted_media_type, renderer_context or {}):
+            try:
+                return orjson.dumps(data)
+            except TypeError:
+                # Types orjson does not know (e.g. lazy translation strings): fall back
+                pass
+        return super().render(data, accepted_media_type, renderer_context)
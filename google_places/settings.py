@@ -31,10 +31,14 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
     'rest_framework',
     'corsheaders',
+    'crawl',
 ]
 
 MIDDLEWARE = [
+    # Outermost, so /metrics latencies and Server-Timing cover the whole stack
+    'metrics.MetricsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
+    'compression.CompressionMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -100,6 +104,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'wsgi.application'
+ASGI_APPLICATION = 'asgi.application'
 
 LANGUAGE_CODE = 'en-us'
 TIME_ZONE = 'UTC'
@@ -115,3 +120,146 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Application logging (module loggers such as views.py's); LOG_LEVEL=DEBUG also logs raw upstream responses
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'plain': {'format': '%(asctime)s %(levelname)s %(name)s: %(message)s'},
+    },
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler', 'formatter': 'plain'},
+    },
+    'root': {'handlers': ['console'], 'level': LOG_LEVEL},
+    'loggers': {
+        'django': {'handlers': ['console'], 'level': 'INFO', 'propagate': False},
+    },
+}
+
+# Two-level cache: per-process LocMemCache (L1) in front of a SQLite file (L2) shared by
+# every worker on the host and kept across restarts. See cache_backends.py.
+CACHES = {
+    'default': {
+        'BACKEND': 'cache_backends.TieredCache',
+        'LOCATION': os.getenv('PLACES_CACHE_PATH', str(BASE_DIR / 'cache' / 'places_cache.sqlite3')),
+        'TIMEOUT': 3600,
+        'OPTIONS': {
+            'L1_MAX_ENTRIES': int(os.getenv('PLACES_CACHE_L1_MAX_ENTRIES', '1000')),
+            'L1_TIMEOUT': int(os.getenv('PLACES_CACHE_L1_TIMEOUT', '300')),
+            'MAX_ENTRIES': int(os.getenv('PLACES_CACHE_MAX_ENTRIES', '200000')),
+            'MAX_SIZE_BYTES': int(os.getenv('PLACES_CACHE_MAX_SIZE_MB', '256')) * 1024 * 1024,
+        },
+    }
+}
+
+# Places API host; point it at a local stub to test or crawl without calling Google
+PLACES_API_BASE_URL = os.getenv('PLACES_API_BASE_URL', 'https://places.googleapis.com')
+# Where upstream answers come from (see providers.py): 'google' (live), 'record' (live, saved to
+# UPSTREAM_CASSETTE) or 'replay' (from UPSTREAM_CASSETTE only, no network)
+UPSTREAM_PROVIDER = os.getenv('UPSTREAM_PROVIDER', 'google').strip().lower()
+UPSTREAM_CASSETTE = os.getenv('UPSTREAM_CASSETTE', str(BASE_DIR / 'cassettes' / 'places.sqlite3'))
+
+# Google Places search tuning
+# Maximum number of grid cells fetched concurrently for a single search request
+PLACES_SEARCH_CONCURRENCY = int(os.getenv('PLACES_SEARCH_CONCURRENCY', '8'))
+# Lifetime of cached place records; keep it at least as long as the stale cell copies that reference them
+PLACES_RECORD_TIMEOUT = int(os.getenv('PLACES_RECORD_TIMEOUT', '86400'))
+# How long the last known results of a cell are kept for serving while the upstream circuit is open
+PLACES_STALE_TIMEOUT = int(os.getenv('PLACES_STALE_TIMEOUT', '86400'))
+# Cell result freshness: PLACES_CELL_TTL by default, overridden per category with
+# PLACES_CATEGORY_TTLS="hotels=86400,atm=604800". Expired results are still served for
+# PLACES_SWR_TIMEOUT more seconds while a background refresh runs (PLACES_REVALIDATE_WORKERS threads).
+PLACES_CELL_TTL = int(os.getenv('PLACES_CELL_TTL', '3600'))
+PLACES_CATEGORY_TTLS = {
+    ' '.join(name.split()).lower(): int(ttl)
+    for name, ttl in (item.split('=', 1) for item in os.getenv('PLACES_CATEGORY_TTLS', '').split(',') if '=' in item)
+}
+PLACES_SWR_TIMEOUT = int(os.getenv('PLACES_SWR_TIMEOUT', '43200'))
+PLACES_REVALIDATE_WORKERS = int(os.getenv('PLACES_REVALIDATE_WORKERS', '4'))
+# Short TTLs for cells that came back empty and for failed lookups (served from the stale copy meanwhile)
+PLACES_EMPTY_TTL = int(os.getenv('PLACES_EMPTY_TTL', '300'))
+PLACES_ERROR_TTL = int(os.getenv('PLACES_ERROR_TTL', '60'))
+# Coalescing of identical concurrent cell fetches (see singleflight.py). With SINGLEFLIGHT_SHARED
+# workers also wait for each other through a lock entry in the shared cache.
+SINGLEFLIGHT_SHARED = os.getenv('SINGLEFLIGHT_SHARED', 'True').lower() == 'true'
+SINGLEFLIGHT_LOCK_TIMEOUT = int(os.getenv('SINGLEFLIGHT_LOCK_TIMEOUT', '30'))
+# In-memory spatial index answering cells inside already-searched area (see spatial_index.py)
+PLACES_SPATIAL_INDEX = os.getenv('PLACES_SPATIAL_INDEX', 'True').lower() == 'true'
+PLACES_INDEX_TTL = int(os.getenv('PLACES_INDEX_TTL', '3600'))
+PLACES_INDEX_MAX_PLACES = int(os.getenv('PLACES_INDEX_MAX_PLACES', '100000'))
+# Upstream field mask for grid searches: 'list' (pin/list fields only) or 'full' (also phone, website,
+# opening hours). Place details come from /api/place/<id>/ and are cached for PLACES_DETAILS_TIMEOUT.
+PLACES_SEARCH_FIELD_MASK = os.getenv('PLACES_SEARCH_FIELD_MASK', 'list').strip().lower()
+PLACES_DETAILS_TIMEOUT = int(os.getenv('PLACES_DETAILS_TIMEOUT', '86400'))
+PLACES_DETAILS_BATCH_MAX = int(os.getenv('PLACES_DETAILS_BATCH_MAX', '50'))
+# Most categories one search may combine (?category=hotels,restaurants)
+PLACES_MAX_CATEGORIES = int(os.getenv('PLACES_MAX_CATEGORIES', '5'))
+# Default for ?within_area=: drop places farther than area_size meters from the search centre
+PLACES_WITHIN_AREA = os.getenv('PLACES_WITHIN_AREA', 'False').lower() == 'true'
+# Upstream pages followed per cell through nextPageToken (1-3; Google serves at most 60 places per search)
+PLACES_MAX_PAGES = int(os.getenv('PLACES_MAX_PAGES', '1'))
+# ?limit=/?cursor= pagination: largest page size and how long a search's result set stays pageable
+PLACES_PAGE_MAX_LIMIT = int(os.getenv('PLACES_PAGE_MAX_LIMIT', '500'))
+PLACES_RESULT_SET_TIMEOUT = int(os.getenv('PLACES_RESULT_SET_TIMEOUT', '900'))
+# search_mode=adaptive: how many times a saturated grid cell may be split into quadrants
+PLACES_ADAPTIVE_MAX_DEPTH = int(os.getenv('PLACES_ADAPTIVE_MAX_DEPTH', '2'))
+# Most upstream cell lookups one search may make before adaptive subdivision stops (0 = unlimited)
+PLACES_MAX_UPSTREAM_CALLS = int(os.getenv('PLACES_MAX_UPSTREAM_CALLS', '100'))
+# search_mode=tiles: slippy-map zoom level of the shared tile grid, the range ?tile_zoom= is clamped to,
+# and the cap on tiles per search
+PLACES_TILE_ZOOM = int(os.getenv('PLACES_TILE_ZOOM', '14'))
+PLACES_TILE_MIN_ZOOM = int(os.getenv('PLACES_TILE_MIN_ZOOM', '10'))
+PLACES_TILE_MAX_ZOOM = int(os.getenv('PLACES_TILE_MAX_ZOOM', '18'))
+PLACES_MAX_TILES = int(os.getenv('PLACES_MAX_TILES', '64'))
+
+# Background batch searches (see batch_jobs.py): worker threads per process, cell concurrency per
+# search, jobs per batch, how long job results are kept and how long a waiting download tolerates no progress
+BATCH_WORKERS = int(os.getenv('BATCH_WORKERS', '2'))
+BATCH_SEARCH_CONCURRENCY = int(os.getenv('BATCH_SEARCH_CONCURRENCY', '4'))
+BATCH_MAX_JOBS = int(os.getenv('BATCH_MAX_JOBS', '1000'))
+BATCH_JOB_TIMEOUT = int(os.getenv('BATCH_JOB_TIMEOUT', '86400'))
+BATCH_STALL_TIMEOUT = int(os.getenv('BATCH_STALL_TIMEOUT', '300'))
+
+# Response compression (see compression.py): brotli when installed and accepted, else gzip
+RESPONSE_COMPRESSION = os.getenv('RESPONSE_COMPRESSION', 'True').lower() == 'true'
+RESPONSE_COMPRESSION_MIN_BYTES = int(os.getenv('RESPONSE_COMPRESSION_MIN_BYTES', '512'))
+RESPONSE_GZIP_LEVEL = int(os.getenv('RESPONSE_GZIP_LEVEL', '6'))
+RESPONSE_BROTLI_QUALITY = int(os.getenv('RESPONSE_BROTLI_QUALITY', '5'))
+# Cache-Control max-age (seconds) of the map page; 0 makes browsers revalidate, which costs a 304
+PAGE_CACHE_MAX_AGE = int(os.getenv('PAGE_CACHE_MAX_AGE', '0'))
+
+# Async serving (asgi.py sets ASYNC_VIEWS=True; wsgi.py keeps the sync views)
+ASYNC_VIEWS = os.getenv('ASYNC_VIEWS', 'False').lower() == 'true'
+# Worker threads running searches for the async views, and the async upstream connection pool size
+ASYNC_VIEW_THREADS = int(os.getenv('ASYNC_VIEW_THREADS', '64'))
+UPSTREAM_ASYNC_POOL_MAXSIZE = int(os.getenv('UPSTREAM_ASYNC_POOL_MAXSIZE', '100'))
+
+# Shared upstream HTTP client (see upstream.py)
+# Number of per-host connection pools and keep-alive connections kept per host
+UPSTREAM_POOL_CONNECTIONS = int(os.getenv('UPSTREAM_POOL_CONNECTIONS', '4'))
+UPSTREAM_POOL_MAXSIZE = int(os.getenv('UPSTREAM_POOL_MAXSIZE', '16'))
+# Use HTTP/2 when httpx[http2] is installed
+UPSTREAM_HTTP2 = os.getenv('UPSTREAM_HTTP2', 'False').lower() == 'true'
+# Upstream rate limiting (see rate_limiter.py): sustained calls per second (0 disables), burst size,
+# calls allowed per UTC day across all workers (0 = unlimited) and how long a call may queue
+UPSTREAM_QPS = float(os.getenv('UPSTREAM_QPS', '10'))
+UPSTREAM_BURST = int(os.getenv('UPSTREAM_BURST', '10'))
+UPSTREAM_DAILY_BUDGET = int(os.getenv('UPSTREAM_DAILY_BUDGET', '0'))
+UPSTREAM_QUEUE_TIMEOUT = float(os.getenv('UPSTREAM_QUEUE_TIMEOUT', '10'))
+# Upstream circuit breaker (see circuit_breaker.py): opens when, over the last CIRCUIT_WINDOW_SECONDS
+# and at least CIRCUIT_MIN_CALLS calls, the error rate or the share of slow calls reaches its threshold
+CIRCUIT_WINDOW_SECONDS = float(os.getenv('CIRCUIT_WINDOW_SECONDS', '30'))
+CIRCUIT_MIN_CALLS = int(os.getenv('CIRCUIT_MIN_CALLS', '10'))
+CIRCUIT_ERROR_RATE = float(os.getenv('CIRCUIT_ERROR_RATE', '0.5'))
+CIRCUIT_SLOW_CALL_SECONDS = float(os.getenv('CIRCUIT_SLOW_CALL_SECONDS', '5'))
+CIRCUIT_SLOW_CALL_RATE = float(os.getenv('CIRCUIT_SLOW_CALL_RATE', '0.8'))
+CIRCUIT_OPEN_SECONDS = float(os.getenv('CIRCUIT_OPEN_SECONDS', '30'))
+
+# Geocode cache (see geocoding.py)
+GEOCODE_DEFAULT_REGION = os.getenv('GEOCODE_DEFAULT_REGION', 'in')
+GEOCODE_CACHE_TIMEOUT = int(os.getenv('GEOCODE_CACHE_TIMEOUT', str(30 * 24 * 3600)))
+GEOCODE_NOT_FOUND_TIMEOUT = int(os.getenv('GEOCODE_NOT_FOUND_TIMEOUT', '600'))
+# Optional JSON list of known localities answered without any upstream call
+GEOCODE_SEED_FILE = os.getenv('GEOCODE_SEED_FILE', str(BASE_DIR / 'geocode_seed.json'))
@@ -0,0 +1,101 @@
+"""Coalesce identical in-flight upstream calls.
+
+When several requests miss the cache for the same cell at once, only the first caller
+(the leader) runs the upstream call; the others wait for its result. Within a process
+followers block on the leader's future. Across workers the leader holds a short lock
+entry in the shared cache, and followers in other workers poll the cache for the
+result the leader writes instead of calling upstream themselves.
+"""
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+
+_lock = threading.Lock()
+_in_flight = {}
+_stats = {'leaders': 0, 'coalesced_local': 0, 'coalesced_shared': 0, 'cache_hits': 0}
+
+
+def _count(name: str):
+    with _lock:
+        _stats[name] += 1
+
+
+def stats() -> dict:
+    with _lock:
+        data = dict(_stats)
+        data['in_flight'] = len(_in_flight)
+    data['coalesced'] = data['coalesced_local'] + data['coalesced_shared']
+    return data
+
+
+def _wait_for_shared(key: str, lock_key: str, read_result: Callable, timeout: float):
+    """Poll the shared cache while another worker holds the lock for `key`."""
+    deadline = time.monotonic() + timeout
+    interval = 0.05
+    while time.monotonic() < deadline:
+        time.sleep(interval)
+        result = read_result()
+        if result is not None:
+            return result
+        if cache.get(lock_key) is None:
+            # Leader finished (or died) without leaving a usable result
+            return None
+        interval = min(interval * 2, 0.5)
+    return None
+
+
+def do(key: str, fn: Callable, read_result: Optional[Callable] = None):
+    """Run `fn()` once for concurrent callers sharing `key` and return its result.
+
+    `read_result` is an optional cache probe returning the leader's result (or None);
+    when given, callers in other workers wait for it instead of calling `fn` themselves.
+    """
+    with _lock:
+        future = _in_flight.get(key)
+        leader = future is None
+        if leader:
+            future = Future()
+            _in_flight[key] = future
+    if not leader:
+        _count('coalesced_local')
+        return future.result()
+
+    try:
+        if read_result is not None:
+            # The previous leader may have finished between our cache miss and now; that is a
+            # plain cache hit, not a wait on someone else's call
+            result = read_result()
+            if result is not None:
+                _count('cache_hits')
+                future.set_result(result)
+                return result
+        lock_key = f'singleflight_{key}'
+        lock_timeout = getattr(settings, 'SINGLEFLIGHT_LOCK_TIMEOUT', 30)
+        owns_shared_lock = True
+        if read_result is not None and getattr(settings, 'SINGLEFLIGHT_SHARED', True):
+            owns_shared_lock = cache.add(lock_key, 1, timeout=lock_timeout)
+            if not owns_shared_lock:
+                result = _wait_for_shared(key, lock_key, read_result, lock_timeout)
+                if result is not None:
+                    _count('coalesced_shared')
+                    future.set_result(result)
+                    return result
+        # Every caller is counted once: as a leader only when it really calls upstream
+        _count('leaders')
+        try:
+            result = fn()
+        finally:
+            if read_result is not None and owns_shared_lock:
+                cache.delete(lock_key)
+        future.set_result(result)
+        return result
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    finally:
+        with _lock:
+            _in_flight.pop(key, None)
@@ -0,0 +1,176 @@
+"""In-memory spatial index over places already fetched in this process.
+
+One index per canonical category holds every cached place's coordinates in a uniform
+bucket grid, plus a coverage raster recording which areas have been searched
+completely (cells that came back below the result cap). A cell that lies entirely inside
+covered area can be answered with a local radius query instead of an upstream call.
+Place records themselves stay in the place store; the index only keeps IDs and points.
+"""
+import math
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+
+EARTH_RADIUS = 6378137
+
+
+def haversine_meters(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lng2 - lng1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS * math.asin(min(1.0, math.sqrt(a)))
+
+
+def _circle_bbox(lat: float, lng: float, radius_m: float) -> Tuple[float, float, float, float]:
+    d_lat = math.degrees(radius_m / EARTH_RADIUS)
+    d_lng = math.degrees(radius_m / (EARTH_RADIUS * max(math.cos(math.radians(lat)), 1e-6)))
+    return lat - d_lat, lng - d_lng, lat + d_lat, lng + d_lng
+
+
+class SpatialIndex:
+    """Uniform bucket grid of place points plus a raster of fully searched area."""
+
+    def __init__(self, bucket_degrees: float = 0.01, coverage_degrees: float = 0.0025, max_places: int = 100000):
+        self.bucket_degrees = bucket_degrees
+        self.coverage_degrees = coverage_degrees
+        self.max_places = max_places
+        self._lock = threading.Lock()
+        self._points = {}
+        self._buckets = defaultdict(set)
+        self._covered = {}
+        self._cells = {}
+
+    def _bucket(self, lat: float, lng: float) -> Tuple[int, int]:
+        return int(math.floor(lat / self.bucket_degrees)), int(math.floor(lng / self.bucket_degrees))
+
+    def _coverage_cells(self, lat: float, lng: float, radius_m: float, inside: bool) -> Iterable[Tuple[int, int]]:
+        """Raster cells fully inside the circle (`inside`) or merely touching it."""
+        size = self.coverage_degrees
+        south, west, north, east = _circle_bbox(lat, lng, radius_m)
+        for cy in range(int(math.floor(south / size)), int(math.floor(north / size)) + 1):
+            for cx in range(int(math.floor(west / size)), int(math.floor(east / size)) + 1):
+                lat0, lng0, lat1, lng1 = cy * size, cx * size, (cy + 1) * size, (cx + 1) * size
+                if inside:
+                    # Farthest corner must be inside the circle
+                    far_lat = lat0 if abs(lat - lat0) > abs(lat - lat1) else lat1
+                    far_lng = lng0 if abs(lng - lng0) > abs(lng - lng1) else lng1
+                    if haversine_meters(lat, lng, far_lat, far_lng) <= radius_m:
+                        yield cy, cx
+                else:
+                    near_lat = min(max(lat, lat0), lat1)
+                    near_lng = min(max(lng, lng0), lng1)
+                    if haversine_meters(lat, lng, near_lat, near_lng) <= radius_m:
+                        yield cy, cx
+
+    def add_places(self, places: List[Dict]):
+        with self._lock:
+            if len(self._points) + len(places) > self.max_places:
+                # Crude but bounded: start over rather than track per-entry recency
+                self._points.clear()
+                self._buckets.clear()
+                self._covered.clear()
+                self._cells.clear()
+            for place in places:
+                location = place.get('location') or {}
+                lat, lng = location.get('latitude'), location.get('longitude')
+                if lat is None or lng is None:
+                    continue
+                place_id = place['place_id']
+                previous = self._points.get(place_id)
+                if previous is not None:
+                    self._buckets[self._bucket(*previous)].discard(place_id)
+                self._points[place_id] = (lat, lng)
+                self._buckets[self._bucket(lat, lng)].add(place_id)
+
+    def mark_covered(self, lat: float, lng: float, radius_m: float, ttl: float):
+        expires = time.time() + ttl
+        with self._lock:
+            for key in self._coverage_cells(lat, lng, radius_m, inside=True):
+                self._covered[key] = max(expires, self._covered.get(key, 0))
+
+    def is_covered(self, lat: float, lng: float, radius_m: float) -> bool:
+        now = time.time()
+        with self._lock:
+            for key in self._coverage_cells(lat, lng, radius_m, inside=False):
+                if self._covered.get(key, 0) <= now:
+                    return False
+        return True
+
+    def has_cell(self, key: str, version=None) -> bool:
+        """Whether this version of the cached cell `key` was already fed in and has not expired."""
+        with self._lock:
+            fed = self._cells.get(key)
+            return fed is not None and fed[0] == version and fed[1] > time.time()
+
+    def add_cell(self, key: str, version=None, ttl: float = 3600):
+        """Record that the cached cell `key` was fed in, so cache hits can skip it until `ttl` passes."""
+        with self._lock:
+            self._cells[key] = (version, time.time() + ttl)
+
+    def query_bbox(self, south: float, west: float, north: float, east: float) -> List[str]:
+        """IDs of indexed places inside the box, ordered by latitude then longitude."""
+        found = []
+        with self._lock:
+            min_y, min_x = self._bucket(south, west)
+            max_y, max_x = self._bucket(north, east)
+            for by in range(min_y, max_y + 1):
+                for bx in range(min_x, max_x + 1):
+                    for place_id in self._buckets.get((by, bx), ()):
+                        lat, lng = self._points[place_id]
+                        if south <= lat <= north and west <= lng <= east:
+                            found.append((lat, lng, place_id))
+        return [place_id for _, _, place_id in sorted(found)]
+
+    def query_radius(self, lat: float, lng: float, radius_m: float, limit: int = None) -> List[str]:
+        """IDs of indexed places within `radius_m`, nearest first."""
+        south, west, north, east = _circle_bbox(lat, lng, radius_m)
+        found = []
+        with self._lock:
+            min_y, min_x = self._bucket(south, west)
+            max_y, max_x = self._bucket(north, east)
+            for by in range(min_y, max_y + 1):
+                for bx in range(min_x, max_x + 1):
+                    for place_id in self._buckets.get((by, bx), ()):
+                        distance = haversine_meters(lat, lng, *self._points[place_id])
+                        if distance <= radius_m:
+                            found.append((distance, place_id))
+        found.sort()
+        if limit is not None:
+            found = found[:limit]
+        return [place_id for _, place_id in found]
+
+    def answer_circle(self, lat: float, lng: float, radius_m: float, limit: int = None) -> Optional[List[str]]:
+        """Place IDs for a circle that lies entirely in covered area, or None if it does not."""
+        if not self.is_covered(lat, lng, radius_m):
+            return None
+        return self.query_radius(lat, lng, radius_m, limit)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {'places': len(self._points), 'covered_cells': len(self._covered), 'indexed_cells': len(self._cells)}
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_index(category: str) -> SpatialIndex:
+    """Index for a canonical category, created on first use."""
+    index = _indexes.get(category)
+    if index is None:
+        with _indexes_lock:
+            index = _indexes.get(category)
+            if index is None:
+                index = SpatialIndex(max_places=getattr(settings, 'PLACES_INDEX_MAX_PLACES', 100000))
+                _indexes[category] = index
+    return index
+
+
+def index_stats() -> Dict:
+    with _indexes_lock:
+        indexes = dict(_indexes)
+    return {category: index.stats() for category, index in indexes.items()}
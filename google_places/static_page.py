@@ -0,0 +1,73 @@
+"""In-memory, precompressed serving of single HTML pages such as hotel_map.html.
+
+The file is read and compressed (brotli when installed, and gzip) once, then served
+from memory. Each request costs one `os.stat`: when the file's modification time or
+size changes it is loaded again, so edits show up without a restart. Responses carry
+an ETag and Last-Modified, and clients revalidating an unchanged page get a bodyless
+`304 Not Modified`.
+"""
+import hashlib
+import logging
+import os
+import threading
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+
+import compression
+
+logger = logging.getLogger(__name__)
+
+
+class CachedPage:
+    def __init__(self, path: str, content_type: str = 'text/html; charset=utf-8'):
+        self.path = path
+        self.content_type = content_type
+        self._lock = threading.Lock()
+        self._stat = None
+        # (bodies by encoding, ETag, Last-Modified), swapped as one so readers never mix versions
+        self._current = None
+
+    def _load(self):
+        """(Re)load the file if it changed since it was last read; raises FileNotFoundError."""
+        stat = os.stat(self.path)
+        signature = (stat.st_mtime_ns, stat.st_size)
+        if signature == self._stat:
+            return
+        with self._lock:
+            if signature == self._stat:
+                return
+            with open(self.path, 'rb') as f:
+                content = f.read()
+            # Highest compression levels: the page is compressed once per change, not per request
+            bodies = {None: content, 'gzip': compression.encode(content, 'gzip', gzip_level=9)}
+            if compression.brotli is not None:
+                bodies['br'] = compression.encode(content, 'br', brotli_quality=11)
+            # Weak ETag: one validator covers the identity, gzip and brotli representations
+            self._current = (bodies, f'W/"{hashlib.sha1(content).hexdigest()}"', int(stat.st_mtime))
+            self._stat = signature
+
+    def serve(self, request) -> HttpResponse:
+        self._load()
+        bodies, etag, last_modified = self._current
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            encoding = compression.negotiate(request.META.get('HTTP_ACCEPT_ENCODING', ''),
+                                             available=[key for key in bodies if key])
+            response = HttpResponse(bodies[encoding], content_type=self.content_type)
+            if encoding:
+                response['Content-Encoding'] = encoding
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        patch_vary_headers(response, ('Accept-Encoding',))
+        patch_cache_control(response, public=True, max_age=getattr(settings, 'PAGE_CACHE_MAX_AGE', 0))
+        return response
+
+    def preload(self):
+        """Load the page now (e.g. at startup) so the first request is served from memory."""
+        try:
+            self._load()
+        except OSError as e:
+            logger.warning('Could not preload %s: %s', self.path, e)
@@ -0,0 +1,174 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from cache_backends import SQLiteCache, TieredCache
+
+
+class CacheFileMixin:
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp(prefix='places-cache-test-')
+        self.path = os.path.join(self.tmpdir, 'cache.sqlite3')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def sqlite_cache(self, **options):
+        return SQLiteCache(self.path, {'TIMEOUT': 300, 'OPTIONS': options})
+
+    def tiered_cache(self, **options):
+        return TieredCache(self.path, {'TIMEOUT': 300, 'OPTIONS': options})
+
+
+class SQLiteCacheTests(CacheFileMixin, SimpleTestCase):
+    def test_evicts_least_recently_used(self):
+        cache = self.sqlite_cache(MAX_ENTRIES=3, CULL_EVERY=1)
+        now = time.time()
+        with mock.patch('time.time') as clock:
+            for offset, key in enumerate(['a', 'b', 'c']):
+                clock.return_value = now + offset
+                cache.set(key, key)
+            # Reading 'a' makes 'b' the least recently used entry
+            clock.return_value = now + 3
+            self.assertEqual(cache.get('a'), 'a')
+            clock.return_value = now + 4
+            cache.set('d', 'd')
+        self.assertEqual(cache.get_many(['a', 'b', 'c', 'd']), {'a': 'a', 'c': 'c', 'd': 'd'})
+
+    def test_evicts_above_max_size_bytes(self):
+        cache = self.sqlite_cache(MAX_ENTRIES=1000, MAX_SIZE_BYTES=2500, CULL_EVERY=1)
+        now = time.time()
+        with mock.patch('time.time') as clock:
+            for offset, key in enumerate(['a', 'b', 'c']):
+                clock.return_value = now + offset
+                cache.set(key, b'x' * 1000)
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(set(cache.get_many(['a', 'b', 'c'])), {'b', 'c'})
+
+    def test_expired_entries_are_misses(self):
+        cache = self.sqlite_cache()
+        now = time.time()
+        with mock.patch('time.time', return_value=now):
+            cache.set('short', 1, timeout=10)
+            cache.set('forever', 2, timeout=None)
+        with mock.patch('time.time', return_value=now + 11):
+            self.assertIsNone(cache.get('short'))
+            self.assertFalse(cache.has_key('short'))
+            self.assertEqual(cache.get('forever'), 2)
+            with self.assertRaises(ValueError):
+                cache.incr('short')
+            # An expired key can be added again
+            self.assertTrue(cache.add('short', 3, timeout=10))
+            self.assertEqual(cache.get('short'), 3)
+
+    def test_touch_extends_expiry(self):
+        cache = self.sqlite_cache()
+        now = time.time()
+        with mock.patch('time.time', return_value=now):
+            cache.set('key', 'value', timeout=10)
+            self.assertTrue(cache.touch('key', timeout=100))
+        with mock.patch('time.time', return_value=now + 50):
+            self.assertEqual(cache.get('key'), 'value')
+            self.assertFalse(cache.touch('missing', timeout=100))
+
+    def test_add_is_atomic_across_threads_and_instances(self):
+        caches = [self.sqlite_cache(), self.sqlite_cache()]
+        results = []
+        barrier = threading.Barrier(8)
+
+        def add(index):
+            barrier.wait()
+            results.append(caches[index % 2].add('lock', index))
+
+        threads = [threading.Thread(target=add, args=(i,)) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results.count(True), 1)
+        self.assertEqual(results.count(False), 7)
+
+    def test_incr_is_atomic_across_threads_and_instances(self):
+        caches = [self.sqlite_cache(), self.sqlite_cache()]
+        caches[0].set('counter', 0)
+
+        def bump(index):
+            for _ in range(50):
+                caches[index % 2].incr('counter')
+
+        threads = [threading.Thread(target=bump, args=(i,)) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(caches[1].get('counter'), 400)
+
+    def test_incr_missing_key_raises(self):
+        with self.assertRaises(ValueError):
+            self.sqlite_cache().incr('missing')
+
+
+class TieredCacheTests(CacheFileMixin, SimpleTestCase):
+    # LocMemCache instances with the same name share storage, so within one process the
+    # tests stand in for another worker by writing to L2 directly or clearing L1
+
+    def test_l2_hit_is_promoted_to_l1(self):
+        cache = self.tiered_cache()
+        cache.l2.set('key', 'value')
+        self.assertIsNone(cache.l1.get('key'))
+        self.assertEqual(cache.get('key'), 'value')
+        self.assertEqual(cache.l1.get('key'), 'value')
+
+    def test_writes_reach_both_tiers(self):
+        cache = self.tiered_cache()
+        cache.set_many({'a': 1, 'b': 2})
+        self.assertEqual(cache.l1.get_many(['a', 'b']), {'a': 1, 'b': 2})
+        self.assertEqual(cache.l2.get_many(['a', 'b']), {'a': 1, 'b': 2})
+
+    def test_delete_clears_both_tiers(self):
+        cache = self.tiered_cache()
+        cache.set('key', 'value')
+        self.assertTrue(cache.delete('key'))
+        self.assertIsNone(cache.l1.get('key'))
+        self.assertIsNone(cache.l2.get('key'))
+        self.assertIsNone(cache.get('key'))
+
+    def test_l1_lifetime_is_bounded(self):
+        cache = self.tiered_cache(L1_TIMEOUT=5)
+        now = time.time()
+        with mock.patch('time.time', return_value=now):
+            cache.set('key', 'old', timeout=3600)
+            cache.l2.set('key', 'new', timeout=3600)
+            # Within L1_TIMEOUT the first worker may still answer from its own L1
+            self.assertEqual(cache.get('key'), 'old')
+        with mock.patch('time.time', return_value=now + 6):
+            self.assertEqual(cache.get('key'), 'new')
+
+    def test_l1_never_outlives_the_entry(self):
+        cache = self.tiered_cache(L1_TIMEOUT=300)
+        now = time.time()
+        with mock.patch('time.time', return_value=now):
+            cache.set('key', 'value', timeout=10)
+        with mock.patch('time.time', return_value=now + 11):
+            self.assertIsNone(cache.get('key'))
+
+    def test_add_only_fills_l1_when_added(self):
+        cache = self.tiered_cache()
+        self.assertTrue(cache.l2.add('key', 'first'))
+        self.assertFalse(cache.add('key', 'second'))
+        self.assertIsNone(cache.l1.get('key'))
+        self.assertEqual(cache.get('key'), 'first')
+
+    def test_incr_is_shared_between_workers(self):
+        cache = self.tiered_cache()
+        cache.set('counter', 1)
+        self.assertEqual(cache.get('counter'), 1)
+        self.assertEqual(cache.l2.incr('counter', 5), 6)
+        self.assertEqual(cache.incr('counter'), 7)
+        # incr drops the L1 copy, so the next read sees the shared value
+        self.assertEqual(cache.get('counter'), 7)
@@ -0,0 +1,79 @@
+import time
+
+from django.test import SimpleTestCase
+
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpen
+
+
+class CircuitBreakerTests(SimpleTestCase):
+    def breaker(self, **kwargs):
+        options = dict(window_seconds=30, min_calls=4, error_rate=0.5, slow_call_seconds=1, slow_call_rate=0.8,
+                       open_seconds=0.05)
+        options.update(kwargs)
+        return CircuitBreaker(**options)
+
+    def test_stays_closed_below_min_calls(self):
+        breaker = self.breaker()
+        for _ in range(3):
+            breaker.record(False, 0.1)
+        self.assertEqual(breaker.state, CLOSED)
+        breaker.before_call()
+
+    def test_opens_on_error_rate(self):
+        breaker = self.breaker()
+        for success in (True, False, True, False):
+            breaker.record(success, 0.1)
+        self.assertEqual(breaker.state, OPEN)
+        with self.assertRaises(CircuitOpen):
+            breaker.before_call()
+        stats = breaker.stats()
+        self.assertEqual(stats['times_opened'], 1)
+        self.assertEqual(stats['rejected_calls'], 1)
+
+    def test_opens_on_slow_calls(self):
+        breaker = self.breaker()
+        for _ in range(4):
+            breaker.record(True, 2)
+        self.assertTrue(breaker.is_open())
+
+    def test_old_calls_leave_the_window(self):
+        breaker = self.breaker(window_seconds=0.05)
+        for _ in range(3):
+            breaker.record(False, 0.1)
+        time.sleep(0.06)
+        breaker.record(False, 0.1)
+        self.assertEqual(breaker.state, CLOSED)
+
+    def test_half_open_probe_success_closes(self):
+        breaker = self.breaker()
+        for _ in range(4):
+            breaker.record(False, 0.1)
+        time.sleep(0.06)
+        self.assertEqual(breaker.state, HALF_OPEN)
+        breaker.before_call()
+        # Only one probe at a time
+        with self.assertRaises(CircuitOpen):
+            breaker.before_call()
+        breaker.record(True, 0.1)
+        self.assertEqual(breaker.state, CLOSED)
+        breaker.before_call()
+
+    def test_half_open_probe_failure_reopens(self):
+        breaker = self.breaker()
+        for _ in range(4):
+            breaker.record(False, 0.1)
+        time.sleep(0.06)
+        breaker.before_call()
+        breaker.record(False, 0.1)
+        self.assertEqual(breaker.state, OPEN)
+        self.assertEqual(breaker.stats()['times_opened'], 2)
+
+    def test_cancel_releases_probe_slot(self):
+        breaker = self.breaker()
+        for _ in range(4):
+            breaker.record(False, 0.1)
+        time.sleep(0.06)
+        breaker.before_call()
+        breaker.cancel()
+        breaker.before_call()
+        self.assertEqual(breaker.state, HALF_OPEN)
@@ -0,0 +1,84 @@
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.core.exceptions import ImproperlyConfigured
+from django.test import SimpleTestCase, override_settings
+
+import providers
+from providers import Cassette, CassetteResponse, GoogleProvider, Provider, RecordingProvider, ReplayProvider
+
+GEOCODE_MASK = 'places.formattedAddress,places.location'
+
+
+class CassetteKeyTests(SimpleTestCase):
+    def test_address_lookups_share_a_key_across_spellings(self):
+        first = Cassette.key('post', providers.SEARCH_TEXT_PATH, GEOCODE_MASK,
+                             {'textQuery': '  M.G. Road,  Bengaluru ', 'regionCode': 'in'})
+        second = Cassette.key('POST', providers.SEARCH_TEXT_PATH, GEOCODE_MASK,
+                              {'textQuery': 'mg road bengaluru', 'regionCode': 'in'})
+        self.assertEqual(first, second)
+
+    def test_region_and_field_mask_stay_in_the_key(self):
+        base = Cassette.key('post', providers.SEARCH_TEXT_PATH, GEOCODE_MASK, {'textQuery': 'erode', 'regionCode': 'in'})
+        self.assertNotEqual(base, Cassette.key('post', providers.SEARCH_TEXT_PATH, GEOCODE_MASK,
+                                               {'textQuery': 'erode', 'regionCode': 'us'}))
+        self.assertNotEqual(base, Cassette.key('post', providers.SEARCH_TEXT_PATH, 'places.id',
+                                               {'textQuery': 'erode', 'regionCode': 'in'}))
+
+    def test_area_searches_keep_their_exact_query(self):
+        bias = {'circle': {'center': {'latitude': 11.0, 'longitude': 77.0}, 'radius': 500}}
+        self.assertNotEqual(
+            Cassette.key('post', providers.SEARCH_TEXT_PATH, 'places.id', {'textQuery': 'Hotels', 'locationBias': bias}),
+            Cassette.key('post', providers.SEARCH_TEXT_PATH, 'places.id', {'textQuery': 'hotels', 'locationBias': bias}),
+        )
+
+
+class ProviderTests(SimpleTestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp(prefix='places-cassette-test-')
+        self.cassette = Cassette(os.path.join(self.tmpdir, 'cassette.sqlite3'))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def test_provider_is_abstract(self):
+        with self.assertRaises(TypeError):
+            Provider()
+
+    def test_recorded_geocode_replays_for_another_spelling(self):
+        live = CassetteResponse(200, b'{"places": [{"formattedAddress": "MG Road"}]}', providers.SEARCH_TEXT_PATH)
+        with mock.patch.object(GoogleProvider, '_call', return_value=live) as call:
+            RecordingProvider(self.cassette).search_text({'textQuery': 'M.G. Road, Bengaluru'}, GEOCODE_MASK)
+        # The live request keeps the address as written
+        self.assertEqual(call.call_args.args[3], {'textQuery': 'M.G. Road, Bengaluru'})
+
+        replay = ReplayProvider(self.cassette)
+        response = replay.search_text({'textQuery': 'mg road bengaluru'}, GEOCODE_MASK)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['places'][0]['formattedAddress'], 'MG Road')
+        self.assertEqual(replay.search_text({'textQuery': 'Brigade Road'}, GEOCODE_MASK).status_code, 404)
+        self.assertEqual(replay.stats()['calls'], {'hits': 1, 'misses': 1})
+
+    def test_server_errors_are_not_recorded(self):
+        failed = CassetteResponse(503, b'{}', providers.SEARCH_TEXT_PATH)
+        with mock.patch.object(GoogleProvider, '_call', return_value=failed):
+            RecordingProvider(self.cassette).search_text({'textQuery': 'erode'}, GEOCODE_MASK)
+        self.assertEqual(ReplayProvider(self.cassette).search_text({'textQuery': 'erode'}, GEOCODE_MASK).status_code,
+                         404)
+
+
+class GetProviderTests(SimpleTestCase):
+    def test_record_and_replay_need_a_cassette(self):
+        for name in ('record', 'replay'):
+            with self.subTest(name=name), override_settings(UPSTREAM_PROVIDER=name, UPSTREAM_CASSETTE=''), \
+                    mock.patch.object(providers, '_provider', None):
+                with self.assertRaises(ImproperlyConfigured):
+                    providers.get_provider()
+                self.assertIsNone(providers._provider)
+
+    @override_settings(UPSTREAM_PROVIDER='google', UPSTREAM_CASSETTE='')
+    def test_google_needs_no_cassette(self):
+        with mock.patch.object(providers, '_provider', None):
+            self.assertIsInstance(providers.get_provider(), GoogleProvider)
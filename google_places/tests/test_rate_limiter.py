@@ -0,0 +1,86 @@
+import threading
+import time
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+
+import rate_limiter
+from rate_limiter import BACKGROUND, INTERACTIVE, QuotaExceeded, RateLimited, UpstreamScheduler
+
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'rate-limiter'}}
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class UpstreamSchedulerTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_burst_then_refill_rate(self):
+        scheduler = UpstreamScheduler(qps=20, burst=2)
+        started = time.monotonic()
+        scheduler.acquire()
+        scheduler.acquire()
+        self.assertLess(time.monotonic() - started, 0.03)
+        scheduler.acquire()
+        # The third call waits for one token at 20 per second
+        self.assertGreaterEqual(time.monotonic() - started, 0.04)
+        self.assertEqual(scheduler.stats()['granted']['interactive'], 3)
+
+    def test_queue_timeout_raises(self):
+        scheduler = UpstreamScheduler(qps=0.1, burst=1)
+        scheduler.acquire()
+        with self.assertRaises(RateLimited):
+            scheduler.acquire(timeout=0.05)
+        stats = scheduler.stats()
+        self.assertEqual(stats['rejected'], 1)
+        self.assertEqual(stats['queue_depth'], 0)
+
+    def test_interactive_callers_go_first(self):
+        scheduler = UpstreamScheduler(qps=10, burst=1)
+        scheduler.acquire()
+        order = []
+
+        def call(level, name):
+            scheduler.acquire(level=level, timeout=2)
+            order.append(name)
+
+        background = threading.Thread(target=call, args=(BACKGROUND, 'background'))
+        background.start()
+        time.sleep(0.02)
+        interactive = threading.Thread(target=call, args=(INTERACTIVE, 'interactive'))
+        interactive.start()
+        background.join()
+        interactive.join()
+        self.assertEqual(order, ['interactive', 'background'])
+
+    def test_priority_context_applies_to_acquire(self):
+        scheduler = UpstreamScheduler(qps=100, burst=5)
+        with rate_limiter.priority(BACKGROUND):
+            self.assertEqual(rate_limiter.current_priority(), BACKGROUND)
+            scheduler.acquire()
+        self.assertEqual(rate_limiter.current_priority(), INTERACTIVE)
+        self.assertEqual(scheduler.stats()['granted']['background'], 1)
+
+    def test_throttle_pauses_grants(self):
+        scheduler = UpstreamScheduler(qps=1000, burst=5)
+        scheduler.throttle(0.1)
+        started = time.monotonic()
+        scheduler.acquire()
+        self.assertGreaterEqual(time.monotonic() - started, 0.09)
+
+    def test_daily_budget(self):
+        scheduler = UpstreamScheduler(qps=0, daily_budget=2)
+        scheduler.acquire()
+        scheduler.acquire()
+        with self.assertRaises(QuotaExceeded):
+            scheduler.acquire()
+        stats = scheduler.stats()
+        self.assertEqual(stats['budget_remaining'], 0)
+        self.assertEqual(stats['rejected'], 1)
+
+    def test_zero_qps_disables_the_bucket(self):
+        scheduler = UpstreamScheduler(qps=0, burst=1)
+        started = time.monotonic()
+        for _ in range(50):
+            scheduler.acquire(timeout=0)
+        self.assertLess(time.monotonic() - started, 0.1)
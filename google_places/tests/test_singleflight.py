@@ -0,0 +1,115 @@
+import threading
+import time
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+
+import singleflight
+
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'singleflight'}}
+
+
+def _delta(before: dict, after: dict) -> dict:
+    return {name: after[name] - before[name] for name in ('leaders', 'coalesced_local', 'coalesced_shared',
+                                                          'cache_hits')}
+
+
+@override_settings(CACHES=LOCMEM_CACHES, SINGLEFLIGHT_LOCK_TIMEOUT=2)
+class SingleflightTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def _wait_until_in_flight(self, key: str):
+        deadline = time.monotonic() + 2
+        while key not in singleflight._in_flight:
+            if time.monotonic() > deadline:
+                self.fail(f'{key} never went in flight')
+            time.sleep(0.001)
+
+    def test_concurrent_callers_share_one_call(self):
+        release = threading.Event()
+        calls = []
+
+        def fetch():
+            calls.append(1)
+            release.wait(2)
+            return ['place']
+
+        before = singleflight.stats()
+        results = []
+        leader = threading.Thread(target=lambda: results.append(singleflight.do('cell-a', fetch)))
+        leader.start()
+        self._wait_until_in_flight('cell-a')
+        followers = [threading.Thread(target=lambda: results.append(singleflight.do('cell-a', fetch)))
+                     for _ in range(4)]
+        for thread in followers:
+            thread.start()
+        time.sleep(0.05)
+        release.set()
+        for thread in [leader] + followers:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [['place']] * 5)
+        self.assertEqual(_delta(before, singleflight.stats()),
+                         {'leaders': 1, 'coalesced_local': 4, 'coalesced_shared': 0, 'cache_hits': 0})
+        self.assertNotIn('cell-a', singleflight._in_flight)
+
+    def test_cached_result_counts_as_cache_hit_not_coalesced(self):
+        before = singleflight.stats()
+        result = singleflight.do('cell-b', lambda: self.fail('fn must not run'), read_result=lambda: ['cached'])
+        self.assertEqual(result, ['cached'])
+        self.assertEqual(_delta(before, singleflight.stats()),
+                         {'leaders': 0, 'coalesced_local': 0, 'coalesced_shared': 0, 'cache_hits': 1})
+
+    def test_leader_error_reaches_followers(self):
+        release = threading.Event()
+        errors = []
+
+        def fetch():
+            release.wait(2)
+            raise RuntimeError('upstream down')
+
+        def call():
+            try:
+                singleflight.do('cell-c', fetch)
+            except RuntimeError as e:
+                errors.append(str(e))
+
+        threads = [threading.Thread(target=call)]
+        threads[0].start()
+        self._wait_until_in_flight('cell-c')
+        threads += [threading.Thread(target=call) for _ in range(2)]
+        for thread in threads[1:]:
+            thread.start()
+        time.sleep(0.05)
+        release.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, ['upstream down'] * 3)
+        self.assertNotIn('cell-c', singleflight._in_flight)
+
+    def test_waits_for_leader_in_another_worker(self):
+        # Another worker holds the shared lock and writes its result a little later
+        cache.add('singleflight_cell-d', 1)
+        threading.Timer(0.1, lambda: cache.set('result_cell-d', ['shared'])).start()
+        before = singleflight.stats()
+        result = singleflight.do('cell-d', lambda: self.fail('fn must not run'),
+                                 read_result=lambda: cache.get('result_cell-d'))
+        self.assertEqual(result, ['shared'])
+        self.assertEqual(_delta(before, singleflight.stats()),
+                         {'leaders': 0, 'coalesced_local': 0, 'coalesced_shared': 1, 'cache_hits': 0})
+
+    def test_calls_upstream_when_other_worker_gives_up(self):
+        # The other worker releases its lock without leaving a result
+        cache.add('singleflight_cell-e', 1)
+        threading.Timer(0.1, lambda: cache.delete('singleflight_cell-e')).start()
+        result = singleflight.do('cell-e', lambda: ['fetched'], read_result=lambda: None)
+        self.assertEqual(result, ['fetched'])
+        self.assertIsNone(cache.get('singleflight_cell-e'))
+
+    @override_settings(SINGLEFLIGHT_SHARED=False)
+    def test_shared_lock_can_be_disabled(self):
+        cache.add('singleflight_cell-f', 1)
+        result = singleflight.do('cell-f', lambda: ['fetched'], read_result=lambda: None)
+        self.assertEqual(result, ['fetched'])
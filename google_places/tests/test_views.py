@@ -0,0 +1,253 @@
+import json
+import threading
+import time
+from unittest import mock
+
+import requests
+from django.core.cache import cache
+from django.test import Client, SimpleTestCase, override_settings
+
+import providers
+import spatial_index
+import views
+from providers import CassetteResponse, Provider
+
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'views',
+                             'OPTIONS': {'MAX_ENTRIES': 10000}}}
+
+SEARCH = '/api/search/?latitude=11.27&longitude=77.58&category=hotels&grid_size=2&area_size=1000'
+
+
+class FakeProvider(Provider):
+    """Three places around every searched centre (one shared by all cells), details by ID."""
+
+    name = 'fake'
+
+    def __init__(self):
+        super().__init__()
+        self.calls = []
+        self.calls_lock = threading.Lock()
+        self.generation = 0
+        self.details_error = None
+
+    def count(self, path: str) -> int:
+        with self.calls_lock:
+            return sum(1 for called in self.calls if called == path)
+
+    def _call(self, method, path, field_mask, payload, timeout):
+        with self.calls_lock:
+            self.calls.append(path)
+        if path == providers.SEARCH_TEXT_PATH:
+            return self._respond(path, {'places': self._search(payload)})
+        place_id = path.rsplit('/', 1)[-1]
+        if self.details_error is not None:
+            raise self.details_error
+        if place_id == 'unknown':
+            return CassetteResponse(404, b'{}', path)
+        return self._respond(path, dict(self._place(place_id, 11.27, 77.58), nationalPhoneNumber='0424 000000',
+                                        websiteUri='https://example.com'))
+
+    async def _acall(self, method, path, field_mask, payload, timeout):
+        return self._call(method, path, field_mask, payload, timeout)
+
+    def _respond(self, path, data):
+        return CassetteResponse(200, json.dumps(data).encode('utf-8'), path)
+
+    def _place(self, place_id, lat, lng):
+        return {'id': place_id, 'displayName': {'text': place_id}, 'formattedAddress': 'Erode',
+                'location': {'latitude': lat, 'longitude': lng}, 'types': ['lodging']}
+
+    def _search(self, payload):
+        if 'locationBias' not in payload:
+            return [self._place('geocoded', 11.27, 77.58)]
+        center = payload['locationBias']['circle']['center']
+        lat, lng = center['latitude'], center['longitude']
+        prefix = f"p{round(lat * 10000)}_{round(lng * 10000)}"
+        places = [self._place(f'{prefix}_{k}', lat + k / 10000, lng) for k in range(2)]
+        places.append(self._place('shared', 11.27, 77.58))
+        if self.generation:
+            places.append(self._place(f'{prefix}_new', lat, lng + 0.0001))
+        return places
+
+
+@override_settings(CACHES=LOCMEM_CACHES, PLACES_SPATIAL_INDEX=False)
+class ViewTestCase(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        spatial_index._indexes.clear()
+        self.provider = FakeProvider()
+        patcher = mock.patch.object(providers, '_provider', self.provider)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = Client(HTTP_HOST='localhost')
+
+    def wait_for(self, condition, timeout=5):
+        deadline = time.monotonic() + timeout
+        while not condition():
+            if time.monotonic() > deadline:
+                self.fail('condition not met in time')
+            time.sleep(0.01)
+
+
+class SearchViewTests(ViewTestCase):
+    def test_search_merges_cells_and_caches_them(self):
+        response = self.client.get(SEARCH)
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        ids = [place['place_id'] for place in data['results']]
+        # Two places per cell plus the one every cell returns
+        self.assertEqual(len(ids), 9)
+        self.assertEqual(len(set(ids)), 9)
+        self.assertEqual(data['metadata']['total_results'], 9)
+        self.assertEqual(data['metadata']['search_stats']['upstream_calls'], 4)
+        self.assertEqual(data['results'][0]['matched_categories'], ['hotels'])
+
+        again = self.client.get(SEARCH).json()
+        self.assertEqual([place['place_id'] for place in again['results']], ids)
+        self.assertEqual(again['metadata']['search_stats']['cache_hits'], 4)
+        self.assertEqual(self.provider.count(providers.SEARCH_TEXT_PATH), 4)
+
+    def test_address_search_geocodes_first(self):
+        response = self.client.get('/api/search/?address=Erode&category=hotels&grid_size=2&area_size=1000')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['results']), 9)
+
+    def test_invalid_options_are_rejected_before_any_upstream_call(self):
+        for query in ('&limit=ten', '&category=a,b,c,d,e,f'):
+            with self.subTest(query=query):
+                self.assertEqual(self.client.get(SEARCH + query).status_code, 400)
+        self.assertEqual(self.provider.calls, [])
+
+    def test_unknown_fields_are_rejected(self):
+        self.assertEqual(self.client.get(SEARCH + '&fields=nope').status_code, 400)
+
+    def test_geocoding_outage_is_a_503(self):
+        with mock.patch.object(self.provider, 'search_text', side_effect=requests.ConnectionError('down')):
+            response = self.client.get('/api/search/?address=Erode&category=hotels')
+        self.assertEqual(response.status_code, 503)
+
+    def test_limit_and_cursor_page_through_the_result_set(self):
+        full = [place['place_id'] for place in self.client.get(SEARCH).json()['results']]
+        page = self.client.get(SEARCH + '&limit=4').json()
+        self.assertEqual(page['metadata']['total_results'], 9)
+        self.assertEqual(page['metadata']['pagination']['returned'], 4)
+        seen = [place['place_id'] for place in page['results']]
+        cursor = page['metadata']['pagination']['next_cursor']
+        while cursor:
+            page = self.client.get(f'/api/search/?cursor={cursor}').json()
+            seen += [place['place_id'] for place in page['results']]
+            cursor = page['metadata']['pagination']['next_cursor']
+        self.assertEqual(seen, full)
+        self.assertEqual(self.provider.count(providers.SEARCH_TEXT_PATH), 4)
+
+    def test_expired_cursor_is_gone(self):
+        self.assertEqual(self.client.get('/api/search/?cursor=0123456789abcdef0123456789abcdef.4').status_code, 410)
+
+    def test_expired_cells_are_served_then_refreshed(self):
+        with override_settings(PLACES_CELL_TTL=0):
+            first = self.client.get(SEARCH).json()
+        self.provider.generation = 1
+        refreshed = []
+        revalidate_cell = views.GooglePlacesHotelSearchView._revalidate_cell
+
+        def revalidate(view, *args):
+            revalidate_cell(view, *args)
+            refreshed.append(args[0]['label'])
+
+        with mock.patch.object(views.GooglePlacesHotelSearchView, '_revalidate_cell', autospec=True,
+                               side_effect=revalidate):
+            second = self.client.get(SEARCH).json()
+            # The expired cells answer immediately; the refresh runs in the background
+            self.assertEqual(second['metadata']['search_stats']['cache_hits'], 4)
+            self.assertEqual(second['metadata']['search_stats']['revalidated_cells'], 4)
+            self.assertEqual(len(second['results']), len(first['results']))
+            self.wait_for(lambda: len(refreshed) == 4)
+        third = self.client.get(SEARCH).json()
+        self.assertEqual(len(third['results']), 13)
+        self.assertEqual(third['metadata']['search_stats']['revalidated_cells'], 0)
+        self.assertEqual(self.provider.count(providers.SEARCH_TEXT_PATH), 8)
+
+    def test_ndjson_stream_carries_the_same_places(self):
+        expected = {place['place_id'] for place in self.client.get(SEARCH).json()['results']}
+        response = self.client.get(SEARCH + '&stream=ndjson')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        events = [json.loads(line) for line in b''.join(response.streaming_content).decode('utf-8').splitlines()]
+        self.assertEqual(events[-1]['type'], 'metadata')
+        self.assertEqual(events[-1]['metadata']['total_results'], 9)
+        streamed = [place['place_id'] for event in events if event['type'] == 'places' for place in event['results']]
+        self.assertEqual(len(streamed), len(set(streamed)))
+        self.assertEqual(set(streamed), expected)
+
+
+class PlaceDetailsViewTests(ViewTestCase):
+    def test_details_are_fetched_once(self):
+        response = self.client.get('/api/place/p1_2_0/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['result']['phone_number'], '0424 000000')
+        self.client.get('/api/place/p1_2_0/')
+        self.assertEqual(self.provider.count('/v1/places/p1_2_0'), 1)
+
+    def test_unknown_place_is_a_404(self):
+        self.assertEqual(self.client.get('/api/place/unknown/').status_code, 404)
+
+    def test_upstream_failure_is_a_503_and_not_cached(self):
+        self.provider.details_error = requests.ConnectionError('down')
+        self.assertEqual(self.client.get('/api/place/p1_2_0/').status_code, 503)
+        self.provider.details_error = None
+        self.assertEqual(self.client.get('/api/place/p1_2_0/').status_code, 200)
+
+    def test_batch_lists_missing_and_unavailable_ids(self):
+        response = self.client.get('/api/places/?ids=p1_2_0,unknown')
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual([place['place_id'] for place in data['results']], ['p1_2_0'])
+        self.assertEqual(data['missing'], ['unknown'])
+        self.assertEqual(data['unavailable'], [])
+
+
+class BatchSearchViewTests(ViewTestCase):
+    def submit(self, jobs):
+        response = self.client.post('/api/search/batch/', {'jobs': jobs}, content_type='application/json')
+        self.assertEqual(response.status_code, 202)
+        return response.json()['job_id']
+
+    def wait_until_done(self, job_id):
+        self.wait_for(lambda: self.client.get(f'/api/search/batch/{job_id}/').json()['status'] == 'done')
+
+    def test_jobs_run_in_the_background(self):
+        job_id = self.submit([
+            {'latitude': 11.27, 'longitude': 77.58, 'grid_size': 2, 'area_size': 1000},
+            {'address': 'Erode', 'grid_size': 2, 'area_size': 1000},
+        ])
+        self.wait_until_done(job_id)
+        status = self.client.get(f'/api/search/batch/{job_id}/').json()
+        self.assertEqual((status['total'], status['completed'], status['failed']), (2, 2, 0))
+
+        items = self.client.get(f'/api/search/batch/{job_id}/results/?fields=name').json()['items']
+        self.assertEqual([item['index'] for item in items], [0, 1])
+        self.assertEqual([item['status'] for item in items], ['ok', 'ok'])
+        self.assertEqual(len(items[0]['results']), 9)
+        self.assertEqual(sorted(items[0]['results'][0]), ['name', 'place_id'])
+
+    def test_results_stream_waits_for_the_job(self):
+        job_id = self.submit([{'latitude': 11.27, 'longitude': 77.58, 'grid_size': 2, 'area_size': 1000}])
+        response = self.client.get(f'/api/search/batch/{job_id}/results/?stream=ndjson&wait=true')
+        events = [json.loads(line) for line in b''.join(response.streaming_content).decode('utf-8').splitlines()]
+        self.assertEqual([event['type'] for event in events], ['search', 'status'])
+        self.assertEqual(events[-1]['job']['status'], 'done')
+
+    def test_invalid_jobs_are_rejected(self):
+        response = self.client.post('/api/search/batch/', {'jobs': [{'category': 'hotels'}]},
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.post('/api/search/batch/', {'jobs': []},
+                                          content_type='application/json').status_code, 400)
+
+    def test_batch_url_is_not_a_search(self):
+        self.assertEqual(self.client.get('/api/search/batch/?latitude=11.27&longitude=77.58').status_code, 405)
+        self.assertEqual(self.provider.calls, [])
+
+    def test_unknown_job_is_a_404(self):
+        self.assertEqual(self.client.get('/api/search/batch/missing/').status_code, 404)
+        self.assertEqual(self.client.get('/api/search/batch/missing/results/').status_code, 404)
@@ -0,0 +1,77 @@
+"""World-aligned slippy-map (z/x/y) tiling used to build shareable search cells.
+
+Unlike the centre-relative grid in `perform_search`, tile boundaries are fixed for the
+whole world, so any two searches that touch the same tile reuse the same cache entry.
+"""
+import math
+import re
+from typing import List, Tuple
+
+EARTH_RADIUS = 6378137
+MAX_LATITUDE = 85.05112878
+
+
+def canonical_category(category: str) -> str:
+    """Normalise a category for cache keys and queries: 'Hotels ' and 'hotels' are the same."""
+    return re.sub(r'\s+', ' ', str(category or '')).strip().lower() or 'hotels'
+
+
+def lat_lng_to_tile(lat: float, lng: float, zoom: int) -> Tuple[int, int]:
+    lat = max(min(lat, MAX_LATITUDE), -MAX_LATITUDE)
+    n = 2 ** zoom
+    x = int((lng + 180.0) / 360.0 * n)
+    lat_rad = math.radians(lat)
+    y = int((1.0 - math.asinh(math.tan(lat_rad)) / math.pi) / 2.0 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def tile_bounds(zoom: int, x: int, y: int) -> Tuple[float, float, float, float]:
+    """Return (south, west, north, east) of a tile in degrees."""
+    n = 2 ** zoom
+    west = x / n * 360.0 - 180.0
+    east = (x + 1) / n * 360.0 - 180.0
+    north = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y / n))))
+    south = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * (y + 1) / n))))
+    return south, west, north, east
+
+
+def tile_center(zoom: int, x: int, y: int) -> Tuple[float, float]:
+    south, west, north, east = tile_bounds(zoom, x, y)
+    return (south + north) / 2, (west + east) / 2
+
+
+def tile_radius_meters(zoom: int, x: int, y: int) -> int:
+    """Radius of the circle centred on the tile that covers its corners."""
+    south, west, north, east = tile_bounds(zoom, x, y)
+    center_lat = (south + north) / 2
+    height = math.radians(north - south) * EARTH_RADIUS
+    width = math.radians(east - west) * EARTH_RADIUS * math.cos(math.radians(center_lat))
+    return int(math.ceil(math.hypot(width, height) / 2))
+
+
+def tile_extent(lat: float, lng: float, radius_meters: float, zoom: int) -> Tuple[int, int, int, int]:
+    """(min_x, min_y, max_x, max_y) of the tiles at `zoom` intersecting the square of half-width `radius_meters`."""
+    d_lat = math.degrees(radius_meters / EARTH_RADIUS)
+    d_lng = math.degrees(radius_meters / (EARTH_RADIUS * max(math.cos(math.radians(lat)), 1e-6)))
+    min_x, min_y = lat_lng_to_tile(lat + d_lat, lng - d_lng, zoom)
+    max_x, max_y = lat_lng_to_tile(lat - d_lat, lng + d_lng, zoom)
+    return min_x, min_y, max_x, max_y
+
+
+def tiles_for_area(lat: float, lng: float, radius_meters: float, zoom: int) -> List[Tuple[int, int, int]]:
+    """Every tile at `zoom` intersecting the square of half-width `radius_meters` around lat/lng."""
+    min_x, min_y, max_x, max_y = tile_extent(lat, lng, radius_meters, zoom)
+    return [(zoom, x, y) for x in range(min_x, max_x + 1) for y in range(min_y, max_y + 1)]
+
+
+def choose_tiles(lat: float, lng: float, radius_meters: float, zoom: int, max_tiles: int) -> List[Tuple[int, int, int]]:
+    """Tiles covering the area at `zoom`, stepping to coarser zoom levels until at most `max_tiles` remain.
+
+    Tile counts come from the x/y extents, so no list is built until the zoom level fits.
+    """
+    while zoom > 1:
+        min_x, min_y, max_x, max_y = tile_extent(lat, lng, radius_meters, zoom)
+        if (max_x - min_x + 1) * (max_y - min_y + 1) <= max_tiles:
+            break
+        zoom -= 1
+    return tiles_for_area(lat, lng, radius_meters, zoom)
@@ -0,0 +1,311 @@
+"""Process-wide HTTP client shared by every upstream Google Places call.
+
+Live calls made by the upstream provider (providers.py) go through `get_client()`, so
+TCP/TLS connections to places.googleapis.com are kept alive and reused instead of being re-established for every request. Each
+call passes the circuit breaker (circuit_breaker.py) and then waits for a slot from the
+rate limiter (rate_limiter.py).
+
+The ASGI views (async_views.py) use `get_async_client()` instead: the same breaker and
+rate limiter in front of an `httpx.AsyncClient`, so upstream calls wait on the event
+loop rather than holding a thread.
+"""
+import asyncio
+import threading
+import time
+import weakref
+from typing import Dict
+
+import requests
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+
+import circuit_breaker
+import metrics
+import rate_limiter
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+try:
+    import h2  # noqa: F401  (httpx needs the h2 package for HTTP/2)
+except ImportError:
+    h2 = None
+
+
+class _HTTPXResponse:
+    """Expose an httpx response through the subset of the requests API the views use."""
+
+    def __init__(self, response):
+        self._response = response
+        self.status_code = response.status_code
+        self.headers = response.headers
+
+    @property
+    def text(self):
+        return self._response.text
+
+    @property
+    def content(self):
+        return self._response.content
+
+    def json(self):
+        return self._response.json()
+
+    def raise_for_status(self):
+        if 400 <= self.status_code < 600:
+            raise requests.HTTPError(f"{self.status_code} Error for url: {self._response.url}", response=self)
+
+
+def endpoint_name(url: str) -> str:
+    """Metric label for an upstream URL: 'places:searchText', 'places/details', ..."""
+    path = url.split('://', 1)[-1].split('?', 1)[0]
+    path = path.split('/v1/', 1)[-1] if '/v1/' in path else path.split('/', 1)[-1]
+    if path.startswith('places/'):
+        return 'places/details'
+    return path or 'unknown'
+
+
+def _record(breaker, url: str, status_code, latency: float):
+    """Report a finished call (status None for a transport error) to the breaker and the metrics."""
+    breaker.record(status_code is not None and status_code < 500 and status_code != 429, latency)
+    metrics.upstream_latency.observe(latency, endpoint=endpoint_name(url),
+                                     status=str(status_code) if status_code is not None else 'error')
+
+
+class UpstreamClient:
+    """Keep-alive connection pool with basic utilisation counters."""
+
+    def __init__(self, pool_connections: int = 4, pool_maxsize: int = 16, http2: bool = False):
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.http2 = bool(http2 and httpx is not None and h2 is not None)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._peak_in_flight = 0
+        self._total_requests = 0
+        self._failed_requests = 0
+        if self.http2:
+            self._httpx = httpx.Client(
+                http2=True,
+                limits=httpx.Limits(max_connections=pool_maxsize, max_keepalive_connections=pool_maxsize),
+            )
+            self._session = None
+        else:
+            self._httpx = None
+            self._session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+            self._session.mount('https://', adapter)
+            self._session.mount('http://', adapter)
+
+    def request(self, method: str, url: str, headers: Dict = None, json: Dict = None, timeout: float = 8, **kwargs):
+        breaker = circuit_breaker.get_breaker()
+        breaker.before_call()
+        scheduler = rate_limiter.get_scheduler()
+        try:
+            scheduler.acquire()
+        except Exception:
+            breaker.cancel()
+            raise
+        started = time.monotonic()
+        try:
+            response = self._send(method, url, headers=headers, json=json, timeout=timeout, **kwargs)
+        except Exception:
+            _record(breaker, url, None, time.monotonic() - started)
+            raise
+        _record(breaker, url, response.status_code, time.monotonic() - started)
+        if response.status_code == 429:
+            scheduler.throttle()
+        return response
+
+    def _send(self, method: str, url: str, headers: Dict = None, json: Dict = None, timeout: float = 8, **kwargs):
+        with self._lock:
+            self._in_flight += 1
+            self._total_requests += 1
+            self._peak_in_flight = max(self._peak_in_flight, self._in_flight)
+        try:
+            if self._httpx is not None:
+                kwargs.pop('verify', None)
+                try:
+                    response = self._httpx.request(method.upper(), url, headers=headers, json=json,
+                                                   timeout=timeout, **kwargs)
+                except httpx.TimeoutException as e:
+                    raise requests.Timeout(str(e))
+                except httpx.HTTPError as e:
+                    raise requests.ConnectionError(str(e))
+                return _HTTPXResponse(response)
+            return self._session.request(method.upper(), url, headers=headers, json=json, timeout=timeout, **kwargs)
+        except Exception:
+            with self._lock:
+                self._failed_requests += 1
+            raise
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    def post(self, url: str, headers: Dict = None, json: Dict = None, timeout: float = 8, **kwargs):
+        return self.request('post', url, headers=headers, json=json, timeout=timeout, **kwargs)
+
+    def get(self, url: str, headers: Dict = None, timeout: float = 8, **kwargs):
+        return self.request('get', url, headers=headers, timeout=timeout, **kwargs)
+
+    def stats(self) -> Dict:
+        """Report pool utilisation so the pool size can be tuned under load."""
+        with self._lock:
+            data = {
+                'transport': 'httpx/http2' if self._httpx is not None else 'requests/http1.1',
+                'pool_connections': self.pool_connections,
+                'pool_maxsize': self.pool_maxsize,
+                'in_flight': self._in_flight,
+                'peak_in_flight': self._peak_in_flight,
+                'utilisation': round(self._in_flight / self.pool_maxsize, 3) if self.pool_maxsize else 0,
+                'total_requests': self._total_requests,
+                'failed_requests': self._failed_requests,
+            }
+        if self._session is not None:
+            hosts = {}
+            adapter = self._session.get_adapter('https://')
+            for key in list(adapter.poolmanager.pools.keys()):
+                pool = adapter.poolmanager.pools.get(key)
+                if pool is None:
+                    continue
+                idle = pool.pool.qsize() if pool.pool is not None else 0
+                hosts[f"{key.key_scheme}://{key.key_host}:{key.key_port}"] = {
+                    'connections_opened': pool.num_connections,
+                    'requests': pool.num_requests,
+                    'idle_connections': idle,
+                }
+            data['hosts'] = hosts
+        return data
+
+
+class AsyncUpstreamClient:
+    """Event-loop counterpart of `UpstreamClient` built on `httpx.AsyncClient`.
+
+    Without httpx installed, calls are handed to the sync client on a worker thread, so
+    the async views still work, just without the async connection pool.
+    """
+
+    def __init__(self, pool_maxsize: int = 100, http2: bool = False):
+        self.pool_maxsize = pool_maxsize
+        self.http2 = bool(http2 and httpx is not None and h2 is not None)
+        self._in_flight = 0
+        self._peak_in_flight = 0
+        self._total_requests = 0
+        self._failed_requests = 0
+        self._httpx = None
+        if httpx is not None:
+            self._httpx = httpx.AsyncClient(
+                http2=self.http2,
+                limits=httpx.Limits(max_connections=pool_maxsize, max_keepalive_connections=pool_maxsize),
+            )
+
+    async def request(self, method: str, url: str, headers: Dict = None, json: Dict = None, timeout: float = 8,
+                      **kwargs):
+        if self._httpx is None:
+            return await asyncio.to_thread(get_client().request, method, url, headers=headers, json=json,
+                                           timeout=timeout, **kwargs)
+        breaker = circuit_breaker.get_breaker()
+        breaker.before_call()
+        scheduler = rate_limiter.get_scheduler()
+        try:
+            # The scheduler waits on a threading.Condition; keep that wait off the event loop
+            await asyncio.to_thread(scheduler.acquire)
+        except Exception:
+            breaker.cancel()
+            raise
+        started = time.monotonic()
+        try:
+            response = await self._send(method, url, headers=headers, json=json, timeout=timeout, **kwargs)
+        except Exception:
+            _record(breaker, url, None, time.monotonic() - started)
+            raise
+        _record(breaker, url, response.status_code, time.monotonic() - started)
+        if response.status_code == 429:
+            scheduler.throttle()
+        return response
+
+    async def _send(self, method: str, url: str, headers: Dict = None, json: Dict = None, timeout: float = 8,
+                    **kwargs):
+        # Counters are only touched from the event loop thread, so they need no lock
+        self._in_flight += 1
+        self._total_requests += 1
+        self._peak_in_flight = max(self._peak_in_flight, self._in_flight)
+        kwargs.pop('verify', None)
+        try:
+            try:
+                response = await self._httpx.request(method.upper(), url, headers=headers, json=json,
+                                                     timeout=timeout, **kwargs)
+            except httpx.TimeoutException as e:
+                raise requests.Timeout(str(e))
+            except httpx.HTTPError as e:
+                raise requests.ConnectionError(str(e))
+            return _HTTPXResponse(response)
+        except Exception:
+            self._failed_requests += 1
+            raise
+        finally:
+            self._in_flight -= 1
+
+    async def post(self, url: str, headers: Dict = None, json: Dict = None, timeout: float = 8, **kwargs):
+        return await self.request('post', url, headers=headers, json=json, timeout=timeout, **kwargs)
+
+    async def get(self, url: str, headers: Dict = None, timeout: float = 8, **kwargs):
+        return await self.request('get', url, headers=headers, timeout=timeout, **kwargs)
+
+    def stats(self) -> Dict:
+        if self._httpx is None:
+            return {'transport': 'sync client in worker threads (httpx not installed)'}
+        return {
+            'transport': 'httpx-async/http2' if self.http2 else 'httpx-async/http1.1',
+            'pool_maxsize': self.pool_maxsize,
+            'in_flight': self._in_flight,
+            'peak_in_flight': self._peak_in_flight,
+            'total_requests': self._total_requests,
+            'failed_requests': self._failed_requests,
+        }
+
+
+_client = None
+_client_lock = threading.Lock()
+# One async client per event loop: httpx connections cannot be shared between loops
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def get_client() -> UpstreamClient:
+    """Return the process-wide upstream client, creating it on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = UpstreamClient(
+                    pool_connections=getattr(settings, 'UPSTREAM_POOL_CONNECTIONS', 4),
+                    pool_maxsize=getattr(settings, 'UPSTREAM_POOL_MAXSIZE', 16),
+                    http2=getattr(settings, 'UPSTREAM_HTTP2', False),
+                )
+    return _client
+
+
+def get_async_client() -> AsyncUpstreamClient:
+    """Return the async upstream client of the running event loop, creating it on first use."""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = _async_clients[loop] = AsyncUpstreamClient(
+            pool_maxsize=getattr(settings, 'UPSTREAM_ASYNC_POOL_MAXSIZE', 100),
+            http2=getattr(settings, 'UPSTREAM_HTTP2', False),
+        )
+    return client
+
+
+def pool_stats() -> Dict:
+    stats = get_client().stats()
+    if _async_clients:
+        stats['async_pools'] = [client.stats() for client in list(_async_clients.values())]
+    return stats
+
+
+def api_url(path: str) -> str:
+    """Absolute Places API URL for `path`, under PLACES_API_BASE_URL (a local stub in tests and crawls)."""
+    return getattr(settings, 'PLACES_API_BASE_URL', 'https://places.googleapis.com').rstrip('/') + path
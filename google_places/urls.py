@@ -1,44 +1,50 @@
+from django.conf import settings
 from django.urls import path
 from django.http import HttpResponse
 import views
+import async_views
 import health
+import logging
+import metrics
 import os
+import static_page
+
+logger = logging.getLogger(__name__)
+
+# Search, geocoding and details endpoints: coroutine views under ASGI (asgi.py), sync views under WSGI
+api_views = async_views if getattr(settings, 'ASYNC_VIEWS', False) else views
+
+hotel_map_page = static_page.CachedPage(os.path.join(os.path.dirname(__file__), 'hotel_map.html'))
+hotel_map_page.preload()
+
 
 def hotel_map_home(request):
-    """Serve the hotel map as the only page"""
+    """Serve the hotel map as the only page, from memory (see static_page.py)"""
     try:
-        print(f"DEBUG: Attempting to serve hotel_map.html")
-        print(f"DEBUG: Current working directory: {os.getcwd()}")
-        print(f"DEBUG: __file__ directory: {os.path.dirname(__file__)}")
-        
-        # Read the hotel_map.html file
-        file_path = os.path.join(os.path.dirname(__file__), 'hotel_map.html')
-        print(f"DEBUG: Trying to read file at: {file_path}")
-        print(f"DEBUG: File exists: {os.path.exists(file_path)}")
-        
-        with open(file_path, 'r', encoding='utf-8') as f:
-            html_content = f.read()
-        
-        print(f"DEBUG: Successfully read {len(html_content)} characters")
-        return HttpResponse(html_content, content_type='text/html')
-    except FileNotFoundError as e:
-        print(f"ERROR: FileNotFoundError: {e}")
-        return HttpResponse(f"Hotel map not found at {file_path}", status=404)
+        return hotel_map_page.serve(request)
+    except FileNotFoundError:
+        logger.error('hotel_map.html not found at %s', hotel_map_page.path)
+        return HttpResponse(f"Hotel map not found at {hotel_map_page.path}", status=404)
     except Exception as e:
-        print(f"ERROR: Unexpected error in hotel_map_home: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception('Unexpected error in hotel_map_home')
         return HttpResponse(f"Error loading hotel map: {str(e)}", status=500)
 
 urlpatterns = [
     path('', hotel_map_home, name='home'),  # ONLY hotel map - nothing else
-    path('search/', views.GooglePlacesHotelSearchView.as_view(), name='places-search'),
-    path('api/search/', views.ConsolidatedPlacesAPI.as_view(), name='api-places-search'),
-    path('api/search/address/', views.AddressSearchAPI.as_view(), name='api-search-address'),
-    path('api/search/location/', views.LocationSearchAPI.as_view(), name='api-search-location'),
-    path('api/search/permission/', views.LocationPermissionAPI.as_view(), name='api-search-permission'),
-    path('geocode/', views.GoogleGeocodingView.as_view(), name='geocode'),
+    path('search/', api_views.GooglePlacesHotelSearchView.as_view(), name='places-search'),
+    path('api/search/', api_views.ConsolidatedPlacesAPI.as_view(), name='api-places-search'),
+    path('api/search/batch/', api_views.BatchSearchAPI.as_view(), name='api-search-batch'),
+    path('api/search/batch/<str:job_id>/', api_views.BatchSearchStatusAPI.as_view(), name='api-search-batch-status'),
+    path('api/search/batch/<str:job_id>/results/', api_views.BatchSearchResultsAPI.as_view(),
+         name='api-search-batch-results'),
+    path('api/search/address/', api_views.AddressSearchAPI.as_view(), name='api-search-address'),
+    path('api/search/location/', api_views.LocationSearchAPI.as_view(), name='api-search-location'),
+    path('api/search/permission/', api_views.LocationPermissionAPI.as_view(), name='api-search-permission'),
+    path('api/place/<str:place_id>/', api_views.PlaceDetailsAPI.as_view(), name='api-place-details'),
+    path('api/places/', api_views.PlaceDetailsBatchAPI.as_view(), name='api-place-details-batch'),
+    path('geocode/', api_views.GoogleGeocodingView.as_view(), name='geocode'),
     path('health/', health.HealthCheckView.as_view(), name='health-check'),
+    path('metrics', metrics.metrics_view, name='metrics'),
         path('api/location/', views.location_api, name='location_api'),
         path('api/latlng/', views.latlng_api, name='latlng_api'),
         path('api/address/', views.address_api, name='address_api'),
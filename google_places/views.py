@@ -1,16 +1,38 @@
 
-import os
+import hashlib
+import logging
+import re
 import requests
 import math
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
-from typing import Dict
+from typing import Callable, Dict, List
+from django.conf import settings
+from django.urls import reverse
 from django.core.cache import cache
+from django.utils.cache import get_conditional_response, patch_cache_control
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from django.http import JsonResponse
+from rest_framework.renderers import BrowsableAPIRenderer
+from django.http import JsonResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
 import json
+import batch_jobs
+import circuit_breaker
+import geocoding
+import geometry
+import metrics
+import place_store
+import providers
+import rate_limiter
+import renderers
+import singleflight
+import spatial_index
+import tiles
 
 # ...existing code...
 
@@ -47,9 +69,68 @@ def address_api(request):
     return JsonResponse({'error': 'Invalid method'}, status=405)
 
 
+# Keys of a formatted place record, selectable with ?fields=
+PLACE_FIELDS = (
+    'place_id', 'name', 'formatted_address', 'location', 'rating', 'user_ratings_total', 'types',
+    'phone_number', 'website', 'price_level', 'business_status', 'opening_hours', 'current_status',
+    'is_open', 'primary_type', 'short_address', 'has_phone', 'matched_categories', 'distance_m',
+)
+
+
+# Upstream field masks. Grid searches only ask for what a map pin and list row need;
+# contact details and opening hours (the expensive SKU fields) come from the details
+# endpoint, for the few places a user actually opens.
+LIST_FIELD_MASK = ('places.id,places.displayName,places.formattedAddress,places.location,places.rating,'
+                   'places.userRatingCount,places.types,places.priceLevel,places.businessStatus,'
+                   'places.shortFormattedAddress')
+FULL_FIELD_MASK = ('places.id,places.displayName,places.formattedAddress,places.location,'
+                   'places.rating,places.userRatingCount,places.types,places.nationalPhoneNumber,'
+                   'places.websiteUri,places.priceLevel,places.businessStatus,places.shortFormattedAddress,'
+                   'places.currentOpeningHours')
+DETAILS_FIELD_MASK = ('id,displayName,formattedAddress,location,rating,userRatingCount,types,nationalPhoneNumber,'
+                      'internationalPhoneNumber,websiteUri,priceLevel,businessStatus,shortFormattedAddress,'
+                      'currentOpeningHours')
+PLACE_ID_RE = re.compile(r'^[A-Za-z0-9_-]{1,256}$')
+
+logger = logging.getLogger(__name__)
+
+
+class CellUnavailable(requests.RequestException):
+    """The upstream lookup for a grid cell failed (or failed recently and is negatively cached)."""
+
+
+class DetailsUnavailable(requests.RequestException):
+    """The upstream details lookup for a place failed; unlike a 404 it is worth retrying."""
+
+
+# Calls refused before reaching upstream: the circuit is open, or the rate limiter
+# timed out or ran out of daily budget. Nothing is known about the resource, so
+# callers fall back to stale results instead of caching a failure.
+UPSTREAM_REFUSED = (circuit_breaker.CircuitOpen, rate_limiter.RateLimited, rate_limiter.QuotaExceeded)
+
+
+# Background refreshes of cells served stale (stale-while-revalidate)
+_revalidate_executor = None
+_revalidate_lock = threading.Lock()
+
+
+def _get_revalidate_executor() -> ThreadPoolExecutor:
+    global _revalidate_executor
+    if _revalidate_executor is None:
+        with _revalidate_lock:
+            if _revalidate_executor is None:
+                _revalidate_executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'PLACES_REVALIDATE_WORKERS', 4), thread_name_prefix='revalidate')
+    return _revalidate_executor
+
+
 class GooglePlacesHotelSearchView(APIView):
+    renderer_classes = [renderers.FastJSONRenderer, BrowsableAPIRenderer]
+
     def get(self, request):
         """Support GET requests for /search/ endpoint (lat/lng required)."""
+        if request.query_params.get('cursor'):
+            return self._cursor_response(request)
         lat = request.query_params.get('latitude')
         lng = request.query_params.get('longitude')
         category = self._get_category_from_request(request)
@@ -60,39 +141,58 @@ class GooglePlacesHotelSearchView(APIView):
             lng = float(lng)
         except ValueError:
             return Response({'error': 'Invalid latitude or longitude.'}, status=status.HTTP_400_BAD_REQUEST)
-        area_size_param = request.query_params.get('area_size')
-        area_size_meters = int(area_size_param) if area_size_param else 5000
-        grid_size = int(request.query_params.get('grid_size', 3))
-        overlap = float(request.query_params.get('overlap', 0.4))
-        response_data = self.perform_search(lat=lat, lng=lng, category=category,
-                                           area_size_meters=area_size_meters, grid_size=grid_size, overlap=overlap)
-        return Response(response_data)
+        try:
+            search_options = self._get_search_options(request)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        response_data = self.perform_search(lat=lat, lng=lng, category=category, **search_options)
+        return self._search_response(request, response_data)
 
-    def _make_request_with_retry(self, url: str, headers: Dict, json: Dict = None, method: str = 'get', max_retries: int = 1) -> Dict:
-        """Make a request with minimal retry for faster response on Render"""
+    def _make_request_with_retry(self, send: Callable, description: str, max_retries: int = 1,
+                                 not_found: Dict = None) -> Dict:
+        """Make an upstream provider call (`send()`) with minimal retry for faster response on Render.
+
+        Returns the decoded JSON body, or None when the call failed. With `not_found` given,
+        an upstream 404 returns it instead, so callers can tell a missing resource from an outage.
+        Calls refused locally (`UPSTREAM_REFUSED`) raise instead of returning None.
+        """
         for attempt in range(max_retries):
             try:
-                if method.lower() == 'post':
-                    response = requests.post(url, headers=headers, json=json, timeout=8)
-                else:
-                    response = requests.get(url, headers=headers, timeout=8)
+                response = send()
+                if response.status_code == 404 and not_found is not None:
+                    return not_found
                 if response.status_code == 400:
-                    error_msg = f"Bad request for {url}"
-                    if hasattr(response, 'text'):
-                        error_msg += f"\nResponse: {response.text}"
-                    print(error_msg)
-                    return {}
+                    # The body can echo the request back; keep it out of the default log level
+                    logger.warning('Bad request for %s', description)
+                    logger.debug('Upstream response for %s: %s', description, getattr(response, 'text', ''))
+                    return None
                 response.raise_for_status()
                 return response.json()
+            except UPSTREAM_REFUSED:
+                # Let the caller fall back to stale results instead of caching an empty cell
+                raise
             except requests.RequestException as e:
                 if attempt == max_retries - 1:
-                    error_msg = f"Request failed after {max_retries} attempts for {url}: {str(e)}"
-                    print(error_msg)
-                    return {}
+                    logger.warning('Request failed after %s attempts for %s: %s', max_retries, description, e)
+                    return None
                 if not hasattr(e, 'response') or (500 <= e.response.status_code < 600):
                     continue
-                return {}
-        return {}
+                return None
+        return None
+
+    def _geocode_address(self, address: str, region_code: str = None) -> Dict:
+        """Resolve an address through the shared geocode cache; returns {} when it cannot be located.
+
+        Upstream failures (`CircuitOpen`, `RateLimited`, timeouts, server errors) raise
+        `requests.RequestException` so callers can answer 503 instead of "not found".
+        """
+        with metrics.phase('geocode'):
+            return geocoding.geocode(address, region_code, timeout=8) or {}
+
+    def _geocode_unavailable(self, address: str, e: requests.RequestException) -> Response:
+        logger.warning('Geocoding failed for %s: %s', address, e)
+        return Response({'error': f'Geocoding temporarily unavailable: {e}'},
+                        status=status.HTTP_503_SERVICE_UNAVAILABLE)
 
     def format_place_data(self, place, details):
         full_address = place.get('formattedAddress', '')
@@ -132,7 +232,14 @@ class GooglePlacesHotelSearchView(APIView):
         return cat or 'hotels'
 
     def _get_category_from_request(self, request) -> str:
-        """Robustly extract category from query params. Handles malformed keys like 'category;'."""
+        """Robustly extract category from query params. Handles malformed keys like 'category;'.
+
+        Several categories may be given comma-separated or as repeated `category` params;
+        they are returned as one comma-separated string.
+        """
+        categories = [value for value in request.query_params.getlist('category') if value]
+        if len(categories) > 1:
+            return ','.join(self._sanitize_category(value) for value in categories)
         category = request.query_params.get('category')
         if category:
             return self._sanitize_category(category)
@@ -146,140 +253,921 @@ class GooglePlacesHotelSearchView(APIView):
                     return self._sanitize_category(val)
         return 'hotels'
 
+    def _split_categories(self, category) -> List[str]:
+        """Canonical keywords for a category string ('hotels, Restaurants') or list, deduplicated."""
+        names = category if isinstance(category, (list, tuple)) else str(category or '').split(',')
+        keywords = []
+        for name in names:
+            if str(name).strip(' ;='):
+                keyword = tiles.canonical_category(str(name).strip(' ;='))
+                if keyword not in keywords:
+                    keywords.append(keyword)
+        keywords = keywords or ['hotels']
+        max_categories = getattr(settings, 'PLACES_MAX_CATEGORIES', 5)
+        if len(keywords) > max_categories:
+            raise ValueError(f'At most {max_categories} categories per search')
+        return keywords
+
+    def _search_cell(self, cell: Dict, field_mask: str, max_results_per_cell: int,
+                     revalidating: bool = False) -> List[Dict]:
+        """Fetch every formatted place for a single grid cell from upstream and cache it.
+
+        Follows `nextPageToken` for up to `cell['max_pages']` pages. Place records go to
+        the place store; the cell entry itself only holds their IDs. A failed lookup
+        raises `CellUnavailable` and, unless it was a background refresh of an entry
+        that is still being served, is cached for PLACES_ERROR_TTL seconds. A first page
+        refused by the circuit breaker or rate limiter raises without caching anything.
+        """
+        cache_key = cell['cache_key']
+        payload = {
+            'textQuery': cell['keyword'],
+            'locationBias': {
+                'circle': {
+                    'center': {
+                        'latitude': cell['latitude'],
+                        'longitude': cell['longitude']
+                    },
+                    'radius': cell['radius']
+                }
+            },
+            'maxResultCount': max_results_per_cell
+        }
+        provider = providers.get_provider()
+        description = f"searchText for grid cell {cell['label']} ({cell['keyword']})"
+        data = self._make_request_with_retry(lambda: provider.search_text(payload, field_mask, timeout=8), description)
+        logger.debug('Raw Google Places API response for cell %s (%s): %s', cell['label'], cell['keyword'], data)
+        if data is None:
+            if not revalidating:
+                self._store_cell(cell, [], getattr(settings, 'PLACES_ERROR_TTL', 60), error=True)
+            raise CellUnavailable(f"Upstream lookup failed for grid cell {cell['label']} ({cell['keyword']})")
+        raw_places = list(data.get('places', []))
+        for _ in range(cell.get('max_pages', 1) - 1):
+            if not data or not data.get('nextPageToken'):
+                break
+            page_payload = dict(payload, pageToken=data['nextPageToken'])
+            try:
+                data = self._make_request_with_retry(
+                    lambda: provider.search_text(page_payload, field_mask, timeout=8), description)
+            except UPSTREAM_REFUSED:
+                data = None
+            # A failed follow-up page still leaves the earlier pages usable
+            raw_places.extend(data.get('places', []) if data else [])
+        cell_places = []
+        seen = set()
+        for place in raw_places:
+            place_id = place.get('id')
+            if place_id and place_id not in seen:
+                seen.add(place_id)
+                cell_places.append(self.format_place_data(place, None))
+        place_store.store_places(cell_places)
+        ids = [place['place_id'] for place in cell_places]
+        if ids:
+            version = self._store_cell(cell, ids, self._cell_ttl(cell['keyword']))
+            # Longer-lived copy served while the upstream circuit is open
+            cache.set(f'stale_{cache_key}', ids, timeout=getattr(settings, 'PLACES_STALE_TIMEOUT', 86400))
+        else:
+            version = self._store_cell(cell, ids, getattr(settings, 'PLACES_EMPTY_TTL', 300))
+        self._index_cell(cell, cell_places, max_results_per_cell, version=version)
+        return cell_places
+
+    def _cell_ttl(self, keyword: str) -> int:
+        """How long a category's cell results stay fresh (PLACES_CATEGORY_TTLS, else PLACES_CELL_TTL)."""
+        ttls = getattr(settings, 'PLACES_CATEGORY_TTLS', {})
+        return ttls.get(keyword, getattr(settings, 'PLACES_CELL_TTL', 3600))
+
+    def _store_cell(self, cell: Dict, ids: List[str], ttl: int, error: bool = False) -> float:
+        """Cache a cell's place IDs as `{'ids', 'fresh_until'[, 'error']}` and return `fresh_until`.
+
+        Results stay in the cache for PLACES_SWR_TIMEOUT seconds past `fresh_until`, during
+        which they are still served while a background refresh runs; failures are not.
+        """
+        entry = {'ids': ids, 'fresh_until': time.time() + ttl}
+        if error:
+            entry['error'] = True
+        window = 0 if error else getattr(settings, 'PLACES_SWR_TIMEOUT', 43200)
+        cache.set(cell['cache_key'], entry, timeout=ttl + window)
+        return entry['fresh_until']
+
+    def _cell_entry(self, value):
+        """Normalise a cached cell value; bare ID lists written before entries had a TTL count as fresh."""
+        if isinstance(value, list):
+            return {'ids': value, 'fresh_until': float('inf')}
+        return value
+
+    def _read_cached_cell(self, cell: Dict):
+        """Places for a cell if it is fully cached (ID list and every record), else None.
+
+        A negatively cached failure answers with the cell's stale copy, or no places.
+        """
+        entry = self._cell_entry(cache.get(cell['cache_key']))
+        if entry is None:
+            return None
+        if entry.get('error'):
+            return self._read_stale_cells([cell]).get(cell['cache_key'], [])
+        ids = entry['ids']
+        records = place_store.load_places(ids)
+        if not all(place_id in records for place_id in ids):
+            return None
+        return [records[place_id] for place_id in ids]
+
+    def _read_stale_cells(self, cells: List[Dict]) -> Dict[str, List[Dict]]:
+        """Last known results for cells whose fresh cache entry has expired, by cache key."""
+        stale_ids = cache.get_many([f"stale_{cell['cache_key']}" for cell in cells])
+        records = place_store.load_places(place_id for ids in stale_ids.values() for place_id in ids)
+        found = {}
+        for cell in cells:
+            ids = stale_ids.get(f"stale_{cell['cache_key']}")
+            if ids:
+                found[cell['cache_key']] = [records[place_id] for place_id in ids if place_id in records]
+        return found
+
+    def _cell_cap(self, cell: Dict, max_results_per_cell: int) -> int:
+        """Most places one cell can return: one page of results per followed page."""
+        return max_results_per_cell * cell.get('max_pages', 1)
+
+    def _index_cell(self, cell: Dict, cell_places: List[Dict], max_results_per_cell: int, version=None,
+                    cached: bool = False):
+        """Feed a resolved cell into the spatial index.
+
+        Only cells that returned some places but fewer than the cap count as completely
+        searched; saturated or empty (possibly failed) cells add points but no coverage.
+        A `cached` hit is skipped when the index already holds this `version` of the cell
+        (its `fresh_until`), so each fetched entry is rasterised once per process.
+        """
+        if not getattr(settings, 'PLACES_SPATIAL_INDEX', True) or not cell_places:
+            return
+        index = spatial_index.get_index(cell['keyword'])
+        if cached and index.has_cell(cell['cache_key'], version):
+            return
+        ttl = getattr(settings, 'PLACES_INDEX_TTL', 3600)
+        index.add_places(cell_places)
+        if len(cell_places) < self._cell_cap(cell, max_results_per_cell):
+            index.mark_covered(cell['latitude'], cell['longitude'], cell['radius'], ttl=ttl)
+        index.add_cell(cell['cache_key'], version, ttl=ttl)
+
+    def _answer_from_index(self, cells: List[Dict], indexes: List[int], max_results_per_cell: int) -> Dict[int, List[Dict]]:
+        """Answer cells lying entirely inside already-searched area from the spatial index.
+
+        Returns {cell index: places} for the cells that could be answered locally.
+        """
+        if not getattr(settings, 'PLACES_SPATIAL_INDEX', True):
+            return {}
+        local_ids = {}
+        for index in indexes:
+            cell = cells[index]
+            ids = spatial_index.get_index(cell['keyword']).answer_circle(
+                cell['latitude'], cell['longitude'], cell['radius'], limit=self._cell_cap(cell, max_results_per_cell))
+            if ids:
+                local_ids[index] = ids
+        if not local_ids:
+            return {}
+        records = place_store.load_places(place_id for ids in local_ids.values() for place_id in ids)
+        return {
+            index: [records[place_id] for place_id in ids]
+            for index, ids in local_ids.items()
+            if all(place_id in records for place_id in ids)
+        }
+
+    def _iter_cells(self, cells: List[Dict], field_mask: str, max_results_per_cell: int,
+                    concurrency: int = None, stats: Dict = None):
+        """Yield `(index, places)` for every cell as soon as it is resolved.
+
+        Cached cells are answered first with two multi-gets (cell ID lists, then place
+        records), then cells lying inside already-searched area from the spatial index;
+        the rest are fetched upstream on a bounded thread pool and yielded in completion
+        order. Cached cells past their freshness TTL are still served, and refreshed in the
+        background; cells whose last lookup failed get their stale copy.
+        """
+        if concurrency is None:
+            concurrency = getattr(settings, 'PLACES_SEARCH_CONCURRENCY', 8)
+
+        entries = {key: self._cell_entry(value)
+                   for key, value in cache.get_many([cell['cache_key'] for cell in cells]).items()}
+        records = place_store.load_places(
+            place_id for entry in entries.values() if not entry.get('error') for place_id in entry['ids']
+        )
+        hits, missed, failed, expired = [], [], [], []
+        now = time.time()
+        for index, cell in enumerate(cells):
+            entry = entries.get(cell['cache_key'])
+            if entry is None:
+                missed.append(index)
+            elif entry.get('error'):
+                failed.append(index)
+            elif all(place_id in records for place_id in entry['ids']):
+                hits.append((index, [records[place_id] for place_id in entry['ids']], entry['fresh_until']))
+                if entry['fresh_until'] <= now:
+                    expired.append(cell)
+            else:
+                missed.append(index)
+        if expired:
+            self._revalidate(expired, field_mask, max_results_per_cell, stats)
+        for index, cell_places, version in hits:
+            # Entries another worker fetched reach this process's index once; repeats are skipped
+            self._index_cell(cells[index], cell_places, max_results_per_cell, version=version, cached=True)
+            yield index, cell_places
+        if failed:
+            stale = self._read_stale_cells([cells[index] for index in failed])
+            for index in failed:
+                cell_places = stale.get(cells[index]['cache_key'])
+                if stats is not None:
+                    stats['stale_cells' if cell_places is not None else 'skipped_cells'] += 1
+                yield index, cell_places or []
+        answered = self._answer_from_index(cells, missed, max_results_per_cell)
+        for index in missed:
+            if index in answered:
+                yield index, answered[index]
+        pending = [index for index in missed if index not in answered]
+        if stats is not None:
+            stats['cache_hits'] += len(hits)
+            stats['index_hits'] += len(answered)
+            stats['upstream_calls'] += len(pending)
+
+        if pending and circuit_breaker.get_breaker().is_open():
+            # Upstream is failing: serve what we have instead of queueing doomed calls
+            stale = self._read_stale_cells([cells[index] for index in pending])
+            for index in pending:
+                cell_places = stale.get(cells[index]['cache_key'])
+                if stats is not None:
+                    stats['upstream_calls'] -= 1
+                    stats['stale_cells' if cell_places is not None else 'skipped_cells'] += 1
+                yield index, cell_places or []
+            return
+
+        def run(index):
+            cell = cells[index]
+            try:
+                return singleflight.do(
+                    cell['cache_key'],
+                    lambda: self._search_cell(cell, field_mask, max_results_per_cell),
+                    read_result=lambda: self._read_cached_cell(cell),
+                )
+            except UPSTREAM_REFUSED + (CellUnavailable,):
+                cell_places = self._read_stale_cells([cell]).get(cell['cache_key'])
+                if stats is not None:
+                    stats['stale_cells' if cell_places is not None else 'skipped_cells'] += 1
+                return cell_places or []
+            except Exception:
+                logger.exception('Error in grid cell %s for keyword %s', cell['label'], cell['keyword'])
+                return []
+
+        concurrency = max(1, min(int(concurrency), len(pending) or 1))
+        if concurrency == 1:
+            for index in pending:
+                yield index, run(index)
+            return
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            # Copy the request context so worker threads keep its upstream priority
+            futures = {executor.submit(contextvars.copy_context().run, run, index): index for index in pending}
+            for future in as_completed(futures):
+                yield futures[future], future.result()
+
+    def _revalidate(self, cells: List[Dict], field_mask: str, max_results_per_cell: int, stats: Dict = None):
+        """Queue background refreshes for expired cells that were just served (stale-while-revalidate).
+
+        A short lock entry in the shared cache keeps concurrent requests and workers from
+        refreshing the same cell twice. Nothing is queued while the upstream circuit is open.
+        """
+        if circuit_breaker.get_breaker().is_open():
+            return
+        lock_timeout = getattr(settings, 'SINGLEFLIGHT_LOCK_TIMEOUT', 30)
+        for cell in cells:
+            lock_key = f"revalidate_{cell['cache_key']}"
+            if not cache.add(lock_key, 1, timeout=lock_timeout):
+                continue
+            if stats is not None:
+                stats['revalidated_cells'] += 1
+            _get_revalidate_executor().submit(self._revalidate_cell, cell, field_mask, max_results_per_cell, lock_key)
+
+    def _revalidate_cell(self, cell: Dict, field_mask: str, max_results_per_cell: int, lock_key: str):
+        try:
+            with rate_limiter.priority(rate_limiter.BACKGROUND):
+                self._search_cell(cell, field_mask, max_results_per_cell, revalidating=True)
+        except Exception as e:
+            logger.warning('Refreshing grid cell %s for keyword %s failed: %s', cell['label'], cell['keyword'], e)
+        finally:
+            cache.delete(lock_key)
+
+    def _fetch_cells(self, cells: List[Dict], field_mask: str, max_results_per_cell: int,
+                     concurrency: int = None, stats: Dict = None) -> List[List[Dict]]:
+        """Resolve every cell to its list of place records, in the same order as `cells`.
+
+        Callers can merge the lists exactly as a serial walk would, whichever request
+        finished first.
+        """
+        results = [None] * len(cells)
+        for index, cell_places in self._iter_cells(cells, field_mask, max_results_per_cell, concurrency, stats):
+            results[index] = cell_places
+        return results
+
+    def _subdivide_cell(self, cell: Dict) -> List[Dict]:
+        """Split a square grid cell into its four quadrants, one level deeper."""
+        earth_radius = 6378137
+        quarter = cell['side'] / 4
+        children = []
+        for quadrant, (dx, dy) in enumerate(((-1, -1), (-1, 1), (1, -1), (1, 1))):
+            children.append({
+                'keyword': cell['keyword'],
+                'label': f"{cell['label']}/q{quadrant}",
+                'cache_key': f"{cell['cache_key']}_q{quadrant}",
+                'latitude': cell['latitude'] + (dy * quarter / earth_radius) * (180 / math.pi),
+                'longitude': cell['longitude'] + (dx * quarter / (earth_radius * math.cos(math.pi * cell['latitude'] / 180))) * (180 / math.pi),
+                'radius': int(cell['side'] / 2 * 0.7),
+                'side': cell['side'] / 2,
+                'depth': cell['depth'] + 1,
+                'max_pages': cell.get('max_pages', 1),
+            })
+        return children
+
+    def _resolve_cells(self, plan: Dict, max_results_per_cell: int, concurrency: int = None, ordered: bool = True):
+        """Yield `(cell, places)` for every cell the search visits.
+
+        In adaptive mode each level is fetched concurrently, and only cells that came
+        back saturated (`max_results_per_cell` places) are split into quadrants for the
+        next level, up to `max_depth`; sparse cells are not explored further. A level that
+        could take the search past `max_upstream_calls` cell lookups is not started for
+        the saturated cells that do not fit, and those are counted as `unexplored_cells`.
+        With `ordered` every level is yielded in cell order, otherwise in completion order.
+        """
+        stats = plan['stats']
+        level = plan['cells']
+        while level:
+            if ordered:
+                results = self._fetch_cells(level, plan['field_mask'], max_results_per_cell,
+                                            concurrency, stats)
+                pairs = zip(level, results)
+            else:
+                pairs = ((level[index], cell_places) for index, cell_places in
+                         self._iter_cells(level, plan['field_mask'], max_results_per_cell,
+                                          concurrency, stats))
+            saturated = []
+            for cell, cell_places in pairs:
+                stats['cells_searched'] += 1
+                stats['tree_depth'] = max(stats['tree_depth'], cell.get('depth', 0))
+                yield cell, cell_places
+                if (plan['max_depth'] and len(cell_places) >= self._cell_cap(cell, max_results_per_cell)
+                        and cell.get('depth', 0) < plan['max_depth']):
+                    saturated.append(cell)
+            # Decided once the level is done, when `upstream_calls` counts all of its lookups
+            next_level = []
+            for cell in saturated:
+                children = self._subdivide_cell(cell)
+                if (plan['max_upstream_calls']
+                        and stats['upstream_calls'] + len(next_level) + len(children) > plan['max_upstream_calls']):
+                    stats['unexplored_cells'] += 1
+                    continue
+                next_level.extend(children)
+            level = next_level
+
+    def _get_search_options(self, request) -> Dict:
+        """Parse the optional grid/search parameters shared by every search endpoint.
+
+        Raises ValueError for malformed values, `?limit=` and too many categories included,
+        before any upstream call is made.
+        """
+        self._get_page_limit(request)
+        self._split_categories(self._get_category_from_request(request))
+        return self._parse_search_options(request.query_params)
+
+    def _parse_search_options(self, params) -> Dict:
+        """Search options from query params or any other mapping (e.g. a batch job item)."""
+        area_size_param = params.get('area_size')
+        options = {
+            'area_size_meters': int(area_size_param) if area_size_param else 5000,
+            'grid_size': int(params.get('grid_size', 3)),
+            'overlap': float(params.get('overlap', 0.4)),
+            'search_mode': str(params.get('search_mode', 'grid')).strip().lower(),
+        }
+        tile_zoom = params.get('tile_zoom')
+        if tile_zoom:
+            options['tile_zoom'] = int(tile_zoom)
+        max_depth = params.get('max_depth')
+        if max_depth:
+            options['max_depth'] = int(max_depth)
+        max_pages = params.get('max_pages')
+        if max_pages:
+            options['max_pages'] = int(max_pages)
+        within_area = params.get('within_area')
+        if within_area is not None and within_area != '':
+            options['within_area'] = str(within_area).strip().lower() in ('1', 'true', 'yes')
+        sort = params.get('sort')
+        if sort:
+            options['sort'] = str(sort).strip().lower()
+        return options
+
+    def _build_grid_cells(self, lat: float, lng: float, keywords: List[str], area_size_meters: int,
+                          grid_size: int, overlap: float) -> List[Dict]:
+        """Cells of the classic grid centred on lat/lng."""
+        step_meters = area_size_meters * (1 - overlap) * 2 / grid_size
+        lats, lngs = geometry.grid_centres(lat, lng, grid_size, step_meters)
+        cells = []
+        for keyword in keywords:
+            for n, (cell_lat, cell_lng) in enumerate(zip(lats, lngs)):
+                i, j = divmod(n, grid_size)
+                cells.append({
+                    'keyword': keyword,
+                    'label': f'{i},{j}',
+                    'cache_key': f'places_search_{lat}_{lng}_{area_size_meters}_{grid_size}_{overlap}_{keyword}_{i}_{j}',
+                    'latitude': cell_lat,
+                    'longitude': cell_lng,
+                    'radius': int(step_meters * 0.7),
+                    'side': step_meters,
+                    'depth': 0,
+                })
+        return cells
+
+    def _build_tile_cells(self, lat: float, lng: float, keywords: List[str], area_size_meters: int,
+                          tile_zoom: int) -> List[Dict]:
+        """Cells snapped to world-aligned z/x/y tiles, so overlapping searches share cache entries."""
+        max_tiles = getattr(settings, 'PLACES_MAX_TILES', 64)
+        cells = []
+        for keyword in keywords:
+            for z, x, y in tiles.choose_tiles(lat, lng, area_size_meters, tile_zoom, max_tiles):
+                center_lat, center_lng = tiles.tile_center(z, x, y)
+                cells.append({
+                    'keyword': keyword,
+                    'label': f'tile {z}/{x}/{y}',
+                    'cache_key': f'places_tile_{z}_{x}_{y}_{keyword}',
+                    'latitude': center_lat,
+                    'longitude': center_lng,
+                    'radius': tiles.tile_radius_meters(z, x, y),
+                    'tile': f'{z}/{x}/{y}',
+                })
+        return cells
+
+    def _plan_search(self, lat: float, lng: float, category: str, area_size_meters: int, grid_size: int,
+                     overlap: float, search_mode: str, tile_zoom: int, max_depth: int = None,
+                     max_pages: int = None) -> Dict:
+        """Work out the cells, upstream request and reported parameters for a search."""
+        keywords = self._split_categories(category)
+        field_mask = FULL_FIELD_MASK if getattr(settings, 'PLACES_SEARCH_FIELD_MASK', 'list') == 'full' \
+            else LIST_FIELD_MASK
+        if search_mode == 'tiles':
+            if tile_zoom is None:
+                tile_zoom = getattr(settings, 'PLACES_TILE_ZOOM', 14)
+            # Request-supplied zoom levels are kept to the supported range
+            tile_zoom = min(max(int(tile_zoom), getattr(settings, 'PLACES_TILE_MIN_ZOOM', 10)),
+                            getattr(settings, 'PLACES_TILE_MAX_ZOOM', 18))
+            cells = self._build_tile_cells(lat, lng, keywords, area_size_meters, tile_zoom)
+            cell_radius_m = max((cell['radius'] for cell in cells), default=0)
+        else:
+            if search_mode != 'adaptive':
+                search_mode = 'grid'
+            cells = self._build_grid_cells(lat, lng, keywords, area_size_meters, grid_size, overlap)
+            cell_radius_m = int(area_size_meters * (1 - overlap) * 2 / grid_size / 2)
+        if len(keywords) > 1:
+            for cell in cells:
+                cell['label'] = f"{cell['keyword']} {cell['label']}"
+        if max_pages is None:
+            max_pages = getattr(settings, 'PLACES_MAX_PAGES', 1)
+        # Google serves at most three pages (60 places) per text search
+        max_pages = max(1, min(int(max_pages), 3))
+        if max_pages > 1:
+            field_mask += ',nextPageToken'
+            for cell in cells:
+                cell['max_pages'] = max_pages
+                cell['cache_key'] += f'_p{max_pages}'
+        if search_mode == 'adaptive':
+            # Every level can quadruple the cells searched, so a requested depth is capped by the setting
+            max_adaptive_depth = getattr(settings, 'PLACES_ADAPTIVE_MAX_DEPTH', 2)
+            if max_depth is None:
+                max_depth = max_adaptive_depth
+            max_depth = max(0, min(int(max_depth), max_adaptive_depth))
+        else:
+            max_depth = 0
+        search_parameters = {
+            'latitude': lat,
+            'longitude': lng,
+            'area_size_km': area_size_meters / 1000,
+            'cell_radius_m': cell_radius_m,
+            'keywords': keywords,
+            'grid_size': grid_size,
+            'overlap': overlap,
+            'search_mode': search_mode,
+            'cells': len(cells),
+        }
+        if search_mode == 'tiles':
+            search_parameters['tiles'] = sorted({cell['tile'] for cell in cells})
+            search_parameters['tile_zoom'] = int(search_parameters['tiles'][0].split('/')[0]) if cells else tile_zoom
+        if search_mode == 'adaptive':
+            search_parameters['max_depth'] = max_depth
+        if max_pages > 1:
+            search_parameters['max_pages'] = max_pages
+        return {
+            'cells': cells,
+            'field_mask': field_mask,
+            'search_parameters': search_parameters,
+            'max_depth': max_depth,
+            'max_upstream_calls': getattr(settings, 'PLACES_MAX_UPSTREAM_CALLS', 100),
+            'stats': {'cells_searched': 0, 'upstream_calls': 0, 'cache_hits': 0, 'index_hits': 0, 'tree_depth': 0,
+                      'stale_cells': 0, 'skipped_cells': 0, 'revalidated_cells': 0, 'out_of_area': 0,
+                      'unexplored_cells': 0},
+        }
+
+    def _max_distance(self, area_size_meters: int, within_area: bool = None):
+        """Distance cut-off for `within_area` searches (None keeps every place)."""
+        if within_area is None:
+            within_area = getattr(settings, 'PLACES_WITHIN_AREA', False)
+        return area_size_meters if within_area else None
+
+    def _apply_distances(self, lat: float, lng: float, places: List[Dict], max_distance: float = None) -> List[Dict]:
+        """Attach `distance_m` from the search centre to every place, dropping those beyond `max_distance`.
+
+        `locationBias` only biases Google's ranking, so cells routinely return places far
+        outside the searched area. Places without coordinates are kept.
+        """
+        if not places:
+            return places
+        kept = []
+        for place, distance in zip(places, geometry.place_distances(lat, lng, places).tolist()):
+            if max_distance is not None and distance > max_distance:
+                continue
+            place['distance_m'] = None if math.isnan(distance) else round(distance)
+            kept.append(place)
+        return kept
+
+    def _build_metadata(self, plan: Dict, places: Dict) -> Dict:
+        keywords = plan['search_parameters']['keywords']
+        return {
+            'total_results': len(places),
+            'category_counts': {
+                keyword: sum(1 for place in places.values() if keyword in place['matched_categories'])
+                for keyword in keywords
+            },
+            'search_parameters': plan['search_parameters'],
+            'search_stats': dict(plan['stats']),
+            # Some cells were served from stale cache or left empty because the upstream is failing
+            'degraded': bool(plan['stats']['stale_cells'] or plan['stats']['skipped_cells']),
+            # Adaptive subdivision stopped at the per-search upstream call cap; dense areas may be incomplete
+            'partial': bool(plan['stats']['unexplored_cells']),
+            'upstream_circuit': circuit_breaker.get_breaker().state,
+            'timestamp': datetime.now().isoformat()
+        }
+
     def perform_search(self, lat: float, lng: float, category: str = 'hotels', area_size_meters: int = 5000,
-                       grid_size: int = 3, overlap: float = 0.4, max_results_per_cell: int = 20) -> Dict:
+                       grid_size: int = 3, overlap: float = 0.4, max_results_per_cell: int = 20,
+                       concurrency: int = None, search_mode: str = 'grid', tile_zoom: int = None,
+                       max_depth: int = None, max_pages: int = None, within_area: bool = None,
+                       sort: str = None) -> Dict:
         try:
-            keywords = [category]
-            earth_radius = 6378137
-            step_meters = area_size_meters * (1 - overlap) * 2 / grid_size
-            def offset_lat(d):
-                return (d / earth_radius) * (180 / math.pi)
-            def offset_lng(d, lat0):
-                return (d / (earth_radius * math.cos(math.pi * lat0 / 180))) * (180 / math.pi)
+            plan = self._plan_search(lat, lng, category, area_size_meters, grid_size, overlap, search_mode, tile_zoom,
+                                     max_depth, max_pages)
             places = {}
-            url = 'https://places.googleapis.com/v1/places:searchText'
-            api_key = os.getenv('GOOGLE_PLACES_API_KEY')
-            search_headers = {
-                'Content-Type': 'application/json',
-                'X-Goog-Api-Key': api_key,
-                'X-Goog-FieldMask': 'places.id,places.displayName,places.formattedAddress,places.location,'
-                                  'places.rating,places.userRatingCount,places.types,places.nationalPhoneNumber,'
-                                  'places.websiteUri,places.priceLevel,places.businessStatus,places.shortFormattedAddress,'
-                                  'places.currentOpeningHours'
-            }
-            for keyword in keywords:
-                for i in range(grid_size):
-                    for j in range(grid_size):
-                        try:
-                            cache_key = f'places_search_{lat}_{lng}_{area_size_meters}_{category}_{keyword}_{i}_{j}'
-                            cached_results = cache.get(cache_key)
-                            if cached_results:
-                                for place in cached_results:
-                                    if place['place_id'] not in places:
-                                        places[place['place_id']] = place
-                                continue
-                            offset_x = step_meters * (i - grid_size // 2)
-                            offset_y = step_meters * (j - grid_size // 2)
-                            lat_offset = offset_lat(offset_y)
-                            lng_offset = offset_lng(offset_x, lat)
-                            search_lat = lat + lat_offset
-                            search_lng = lng + lng_offset
-                            search_radius = int(step_meters * 0.7)
-                            payload = {
-                                'textQuery': keyword,
-                                'locationBias': {
-                                    'circle': {
-                                        'center': {
-                                            'latitude': search_lat,
-                                            'longitude': search_lng
-                                        },
-                                        'radius': search_radius
-                                    }
-                                },
-                                'maxResultCount': max_results_per_cell
-                            }
-                            data = self._make_request_with_retry(
-                                url=url,
-                                headers=search_headers,
-                                json=payload,
-                                method='post'
-                            )
-                            print('DEBUG: Raw Google Places API response:', data)
-                            if not data or 'places' not in data:
-                                cache.set(cache_key, [], timeout=3600)
-                                continue
-                            cell_places = []
-                            for place in data['places']:
-                                place_id = place.get('id')
-                                if place_id and place_id not in places:
-                                    formatted_place = self.format_place_data(place, None)
-                                    places[place_id] = formatted_place
-                                    cell_places.append(formatted_place)
-                            cache.set(cache_key, cell_places, timeout=3600)
-                        except Exception as e:
-                            print(f"Error in grid cell {i},{j} for keyword {keyword}: {str(e)}")
-                            continue
-            response_data = {
-                'results': list(places.values()),
-                'metadata': {
-                    'total_results': len(places),
-                    'search_parameters': {
-                        'latitude': lat,
-                        'longitude': lng,
-                        'area_size_km': area_size_meters / 1000,
-                        'cell_radius_m': int(step_meters / 2),
-                        'keywords': keywords,
-                        'grid_size': grid_size,
-                        'overlap': overlap
-                    },
-                    'timestamp': datetime.now().isoformat()
+            # Merge in grid order so the first cell to report a place wins, exactly as in a serial walk;
+            # a place found under several categories is returned once, listing all of them
+            with metrics.phase('fanout'):
+                for cell, cell_places in self._resolve_cells(plan, max_results_per_cell, concurrency):
+                    for place in cell_places:
+                        merged = places.get(place['place_id'])
+                        if merged is None:
+                            places[place['place_id']] = dict(place, matched_categories=[cell['keyword']])
+                        elif cell['keyword'] not in merged['matched_categories']:
+                            merged['matched_categories'].append(cell['keyword'])
+            with metrics.phase('merge'):
+                max_distance = self._max_distance(area_size_meters, within_area)
+                results = self._apply_distances(lat, lng, list(places.values()), max_distance)
+                plan['stats']['out_of_area'] = len(places) - len(results)
+                if sort == 'distance':
+                    results.sort(key=lambda place: (place['distance_m'] is None, place['distance_m'] or 0))
+                places = {place['place_id']: place for place in results}
+                response_data = {
+                    'results': results,
+                    'metadata': self._build_metadata(plan, places)
                 }
-            }
+            metrics.search_cells.observe(plan['stats']['cells_searched'], mode=search_mode)
+            metrics.search_results.observe(len(results), mode=search_mode)
             return response_data
         except Exception as e:
-            print(f"perform_search error: {str(e)}")
+            logger.exception('perform_search error')
             return {"error": str(e)}
 
+    def stream_search(self, lat: float, lng: float, category: str = 'hotels', area_size_meters: int = 5000,
+                      grid_size: int = 3, overlap: float = 0.4, max_results_per_cell: int = 20,
+                      concurrency: int = None, search_mode: str = 'grid', tile_zoom: int = None,
+                      max_depth: int = None, max_pages: int = None, within_area: bool = None,
+                      sort: str = None):
+        """Incremental variant of `perform_search`.
+
+        Yields a `places` event with each cell's not-yet-seen places as soon as that cell
+        finishes, then a final `metadata` event. The union of all `places` events equals
+        `perform_search`'s results; only their order follows cell completion. Places that
+        turn up under further categories after they were sent are listed, with all their
+        categories, in one `categories` event before the metadata. `sort` does not apply:
+        places are sent as they are found.
+        """
+        try:
+            plan = self._plan_search(lat, lng, category, area_size_meters, grid_size, overlap, search_mode, tile_zoom,
+                                     max_depth, max_pages)
+            places = {}
+            updated = []
+            out_of_area = set()
+            max_distance = self._max_distance(area_size_meters, within_area)
+            for cell, cell_places in self._resolve_cells(plan, max_results_per_cell, concurrency, ordered=False):
+                new_places = []
+                for place in cell_places:
+                    merged = places.get(place['place_id'])
+                    if merged is None:
+                        places[place['place_id']] = dict(place, matched_categories=[cell['keyword']])
+                        new_places.append(dict(place, matched_categories=[cell['keyword']]))
+                    elif cell['keyword'] not in merged['matched_categories']:
+                        merged['matched_categories'].append(cell['keyword'])
+                        if place['place_id'] not in updated:
+                            updated.append(place['place_id'])
+                kept = self._apply_distances(lat, lng, new_places, max_distance)
+                if len(kept) < len(new_places):
+                    # Dropped places stay in `places` so later cells do not send them either
+                    kept_ids = {place['place_id'] for place in kept}
+                    out_of_area.update(place['place_id'] for place in new_places if place['place_id'] not in kept_ids)
+                if kept:
+                    yield {'type': 'places', 'cell': cell['label'], 'results': kept}
+            updated = [place_id for place_id in updated if place_id not in out_of_area]
+            if updated:
+                yield {'type': 'categories', 'matched_categories': {
+                    place_id: places[place_id]['matched_categories'] for place_id in updated
+                }}
+            plan['stats']['out_of_area'] = len(out_of_area)
+            places = {place_id: place for place_id, place in places.items() if place_id not in out_of_area}
+            metrics.search_cells.observe(plan['stats']['cells_searched'], mode=search_mode)
+            metrics.search_results.observe(len(places), mode=search_mode)
+            yield {'type': 'metadata', 'metadata': self._build_metadata(plan, places)}
+        except Exception as e:
+            logger.exception('stream_search error')
+            yield {'type': 'error', 'error': str(e)}
+
+    def _streaming_response(self, stream_format: str, events, fields: List[str] = None) -> StreamingHttpResponse:
+        """Encode `stream_search` events as NDJSON lines or Server-Sent Events.
+
+        `events` may also be an async iterator (from the async views); the body is then async too.
+        """
+        content_type = 'text/event-stream' if stream_format == 'sse' else 'application/x-ndjson'
+        if hasattr(events, '__aiter__'):
+            body = (self._encode_event(stream_format, event, fields) async for event in events)
+        else:
+            body = (self._encode_event(stream_format, event, fields) for event in events)
+        response = StreamingHttpResponse(body, content_type=content_type)
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    def _encode_event(self, stream_format: str, event: Dict, fields: List[str] = None) -> str:
+        if fields and 'results' in event:
+            event = dict(event, results=self._shape_results(event['results'], fields))
+        if stream_format == 'sse':
+            return f"event: {event['type']}\ndata: {renderers.dumps(event)}\n\n"
+        return renderers.dumps(event) + '\n'
+
+    def _get_page_limit(self, request):
+        """`?limit=` clamped to PLACES_PAGE_MAX_LIMIT, or None when the client wants everything.
+
+        Raises ValueError when the limit is not a whole number.
+        """
+        limit = request.query_params.get('limit')
+        if not limit:
+            return None
+        try:
+            limit = int(limit)
+        except (TypeError, ValueError):
+            raise ValueError(f'Invalid limit {limit!r}: expected a positive whole number of places per page.') from None
+        return max(1, min(limit, getattr(settings, 'PLACES_PAGE_MAX_LIMIT', 500)))
+
+    def _result_page(self, result_set: str, ids: List[str], metadata: Dict, offset: int, limit: int,
+                     records: Dict = None, matched: Dict = None) -> Dict:
+        """One page of a stored result set.
+
+        Records are loaded from the place store unless given, and get their
+        `matched_categories` back from `matched`.
+        """
+        page_ids = ids[offset:offset + limit]
+        if records is None:
+            records = self._load_result_records(page_ids, matched)
+        next_offset = offset + limit
+        metadata = dict(metadata)
+        metadata['pagination'] = {
+            'offset': offset,
+            'limit': limit,
+            'returned': len(page_ids),
+            'next_cursor': f'{result_set}.{next_offset}' if next_offset < len(ids) else None,
+        }
+        return {
+            'results': [records[place_id] for place_id in page_ids if place_id in records],
+            'metadata': metadata,
+        }
+
+    def _load_result_records(self, ids: List[str], matched: Dict = None) -> Dict[str, Dict]:
+        """Place records for stored search results, with their `matched_categories` restored."""
+        return {
+            place_id: dict(record, matched_categories=(matched or {}).get(place_id, []))
+            for place_id, record in place_store.load_places(ids).items()
+        }
+
+    def _paginate(self, response_data: Dict, limit: int = None) -> Dict:
+        """Cut a search response down to its first `limit` places (see `_get_page_limit`).
+
+        The full list of place IDs is kept in the cache as a result set, so the remaining
+        pages are served from `?cursor=` without searching again.
+        """
+        if limit is None or 'results' not in response_data:
+            return response_data
+        ids = [place['place_id'] for place in response_data['results']]
+        records = {place['place_id']: place for place in response_data['results']}
+        matched = {place['place_id']: place.get('matched_categories', []) for place in response_data['results']}
+        # Named after its content, so repeating a search yields the same cursors (and ETags)
+        result_set = hashlib.sha1(renderers.dumps(
+            [ids, matched, limit, response_data['metadata'].get('search_parameters')]
+        ).encode('utf-8')).hexdigest()[:32]
+        if len(ids) > limit:
+            cache.set(f'result_set_{result_set}', {'ids': ids, 'metadata': response_data['metadata'], 'limit': limit,
+                                                   'matched': matched},
+                      timeout=getattr(settings, 'PLACES_RESULT_SET_TIMEOUT', 900))
+        return self._result_page(result_set, ids, response_data['metadata'], 0, limit, records)
+
+    def _cursor_response(self, request) -> Response:
+        """Serve the page a `?cursor=` from an earlier paginated response points at."""
+        try:
+            result_set, offset = request.query_params['cursor'].split('.')
+            offset = int(offset)
+        except ValueError:
+            return Response({'error': 'Invalid cursor.'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = self._get_page_limit(request)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        stored = cache.get(f'result_set_{result_set}')
+        if stored is None:
+            return Response({'error': 'Cursor has expired; repeat the search.'}, status=status.HTTP_410_GONE)
+        limit = limit or stored['limit']
+        page = self._result_page(result_set, stored['ids'], stored['metadata'], max(offset, 0), limit,
+                                 matched=stored.get('matched'))
+        return self._search_response(request, page, paginate=False)
+
+    def _get_fields(self, request):
+        """`?fields=` as a list of place keys (always starting with place_id), or None for full records."""
+        fields = request.query_params.get('fields')
+        if not fields:
+            return None
+        names = ['place_id']
+        for name in fields.split(','):
+            name = name.strip()
+            if name and name not in names:
+                names.append(name)
+        unknown = [name for name in names if name not in PLACE_FIELDS]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}. Available: {', '.join(PLACE_FIELDS)}")
+        return names
+
+    def _shape_results(self, places: List[Dict], fields: List[str] = None, layout: str = 'rows'):
+        """Project places onto `fields` and, for the columnar layout, turn rows into columns.
+
+        The columnar layout is a single object of equal-length arrays, one per field, with
+        `location` split into `latitude` and `longitude` columns.
+        """
+        if fields:
+            places = [{field: place.get(field) for field in fields} for place in places]
+        if layout != 'columnar':
+            return places
+        columns = {}
+        for field in fields or PLACE_FIELDS:
+            if field == 'location':
+                columns['latitude'] = [(place.get('location') or {}).get('latitude') for place in places]
+                columns['longitude'] = [(place.get('location') or {}).get('longitude') for place in places]
+            else:
+                columns[field] = [place.get(field) for place in places]
+        return columns
+
+    def _search_response(self, request, response_data: Dict, paginate: bool = True) -> Response:
+        """Paginate, project and lay out a search result as the client asked.
+
+        With `?profile=1` the metadata also reports the time spent so far in each phase
+        (`timings_ms`); the full breakdown, serialisation included, is always in the
+        `Server-Timing` header.
+        """
+        with metrics.phase('merge'):
+            return self._shape_search_response(request, response_data, paginate)
+
+    def _shape_search_response(self, request, response_data: Dict, paginate: bool) -> Response:
+        try:
+            fields = self._get_fields(request)
+            limit = self._get_page_limit(request) if paginate else None
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        layout = request.query_params.get('layout', 'rows').strip().lower()
+        if paginate:
+            response_data = self._paginate(response_data, limit)
+        if 'results' in response_data and (fields or layout == 'columnar'):
+            response_data = dict(response_data, results=self._shape_results(response_data['results'], fields, layout))
+            response_data['metadata'] = dict(response_data['metadata'], layout=layout)
+        if 'results' not in response_data:
+            return Response(response_data)
+        etag = self._result_etag(response_data)
+        if request.query_params.get('profile') in ('1', 'true'):
+            response_data = dict(response_data, metadata=dict(response_data['metadata'],
+                                                              timings_ms=metrics.current_timings()))
+        not_modified = get_conditional_response(request, etag=etag)
+        response = Response(response_data) if not_modified is None else not_modified
+        response['ETag'] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    def _result_etag(self, response_data: Dict) -> str:
+        """Weak ETag of a search response's results and the metadata that describes them.
+
+        Per-request details (timestamp, search statistics, circuit state) are left out, so
+        repeating a search whose results have not changed can be answered with `304`.
+        """
+        metadata = {key: value for key, value in response_data.get('metadata', {}).items()
+                    if key not in ('timestamp', 'search_stats', 'upstream_circuit', 'timings_ms')}
+        digest = hashlib.sha1(renderers.dumps([response_data['results'], metadata]).encode('utf-8')).hexdigest()
+        return f'W/"{digest}"'
+
+    def _fetch_place_details(self, place_id: str) -> Dict:
+        """Raw upstream details for one place, cached under `place_details_<id>`; {} if not found.
+
+        Raises `DetailsUnavailable` (or one of `UPSTREAM_REFUSED`) when the upstream call failed; nothing
+        is cached then, so the next request tries again.
+        """
+        key = f'place_details_{place_id}'
+
+        def fetch():
+            provider = providers.get_provider()
+            data = self._make_request_with_retry(
+                lambda: provider.place_details(place_id, DETAILS_FIELD_MASK, timeout=8), f'details of {place_id}',
+                not_found={})
+            if data is None:
+                raise DetailsUnavailable(f'Upstream lookup failed for details of {place_id}')
+            if not data.get('id'):
+                return {}
+            cache.set(key, data, timeout=getattr(settings, 'PLACES_DETAILS_TIMEOUT', 86400))
+            return data
+
+        return singleflight.do(key, fetch, read_result=lambda: cache.get(key))
+
+    def _load_place_details(self, place_ids: List[str], unavailable: List[str] = None) -> Dict[str, Dict]:
+        """Formatted detail records by place ID: cached ones in one multi-get, the rest fetched concurrently.
+
+        Places that are unknown upstream or could not be fetched are left out; the IDs whose
+        lookup failed are also appended to `unavailable` when it is given.
+        """
+        cached = cache.get_many([f'place_details_{place_id}' for place_id in place_ids])
+        details = {place_id: cached[f'place_details_{place_id}'] for place_id in place_ids
+                   if f'place_details_{place_id}' in cached}
+        missing = [place_id for place_id in place_ids if place_id not in details]
+
+        def fetch(place_id):
+            try:
+                return self._fetch_place_details(place_id)
+            except requests.RequestException as e:
+                logger.warning('Error fetching details for %s: %s', place_id, e)
+                return None
+
+        if missing:
+            workers = max(1, min(getattr(settings, 'PLACES_SEARCH_CONCURRENCY', 8), len(missing)))
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = [executor.submit(contextvars.copy_context().run, fetch, place_id) for place_id in missing]
+                for place_id, future in zip(missing, futures):
+                    data = future.result()
+                    if data:
+                        details[place_id] = data
+                    elif data is None and unavailable is not None:
+                        unavailable.append(place_id)
+        return {place_id: self.format_place_data(data, data) for place_id, data in details.items()}
+
 # ...existing code...
 
 # Add new endpoints after all base classes
 class AddressSearchAPI(GooglePlacesHotelSearchView):
     """Endpoint for searching by address and category."""
     def get(self, request):
+        if request.query_params.get('cursor'):
+            return self._cursor_response(request)
         address = request.query_params.get('address')
         category = self._get_category_from_request(request)
         if not address:
             return Response({'error': 'Address is required.'}, status=status.HTTP_400_BAD_REQUEST)
-        api_key = os.getenv('GOOGLE_PLACES_API_KEY')
-        if not api_key:
+        try:
+            search_options = self._get_search_options(request)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        if not providers.get_provider().configured():
             return Response({'error': 'Google API key is not configured'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-        geocode_url = 'https://places.googleapis.com/v1/places:searchText'
-        headers = {
-            'Content-Type': 'application/json',
-            'X-Goog-Api-Key': api_key,
-            'X-Goog-FieldMask': 'places.location,places.formattedAddress'
-        }
-        payload = {'textQuery': address}
-        data = self._make_request_with_retry(url=geocode_url, headers=headers, json=payload, method='post')
-        if not data or 'places' not in data or not data['places']:
+        try:
+            place = self._geocode_address(address, request.query_params.get('region', settings.GEOCODE_DEFAULT_REGION))
+        except requests.RequestException as e:
+            return self._geocode_unavailable(address, e)
+        if not place:
             return Response({'error': 'Address geocoding failed or no location found'}, status=status.HTTP_404_NOT_FOUND)
-        place = data['places'][0]
         location = place.get('location', {})
         lat = location.get('latitude')
         lng = location.get('longitude')
         if lat is None or lng is None:
             return Response({'error': 'Failed to obtain coordinates from address'}, status=status.HTTP_404_NOT_FOUND)
-        area_size_param = request.query_params.get('area_size')
-        area_size_meters = int(area_size_param) if area_size_param else 5000
-        grid_size = int(request.query_params.get('grid_size', 3))
-        overlap = float(request.query_params.get('overlap', 0.4))
-        response_data = self.perform_search(lat=lat, lng=lng, category=category,
-                                           area_size_meters=area_size_meters, grid_size=grid_size, overlap=overlap)
-        return Response(response_data)
+        response_data = self.perform_search(lat=lat, lng=lng, category=category, **search_options)
+        return self._search_response(request, response_data)
 
 class LocationSearchAPI(GooglePlacesHotelSearchView):
     """Endpoint for searching by latitude, longitude, and category."""
     def get(self, request):
+        if request.query_params.get('cursor'):
+            return self._cursor_response(request)
         lat = request.query_params.get('latitude')
         lng = request.query_params.get('longitude')
         category = self._get_category_from_request(request)
@@ -290,17 +1178,18 @@ class LocationSearchAPI(GooglePlacesHotelSearchView):
             lng = float(lng)
         except ValueError:
             return Response({'error': 'Invalid latitude or longitude.'}, status=status.HTTP_400_BAD_REQUEST)
-        area_size_param = request.query_params.get('area_size')
-        area_size_meters = int(area_size_param) if area_size_param else 5000
-        grid_size = int(request.query_params.get('grid_size', 3))
-        overlap = float(request.query_params.get('overlap', 0.4))
-        response_data = self.perform_search(lat=lat, lng=lng, category=category,
-                                           area_size_meters=area_size_meters, grid_size=grid_size, overlap=overlap)
-        return Response(response_data)
+        try:
+            search_options = self._get_search_options(request)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        response_data = self.perform_search(lat=lat, lng=lng, category=category, **search_options)
+        return self._search_response(request, response_data)
 
 class LocationPermissionAPI(GooglePlacesHotelSearchView):
     """Endpoint for frontend location permission flow: accepts lat/lng and category after permission granted."""
     def get(self, request):
+        if request.query_params.get('cursor'):
+            return self._cursor_response(request)
         lat = request.query_params.get('latitude')
         lng = request.query_params.get('longitude')
         category = self._get_category_from_request(request)
@@ -311,13 +1200,12 @@ class LocationPermissionAPI(GooglePlacesHotelSearchView):
             lng = float(lng)
         except ValueError:
             return Response({'error': 'Invalid latitude or longitude.'}, status=status.HTTP_400_BAD_REQUEST)
-        area_size_param = request.query_params.get('area_size')
-        area_size_meters = int(area_size_param) if area_size_param else 5000
-        grid_size = int(request.query_params.get('grid_size', 3))
-        overlap = float(request.query_params.get('overlap', 0.4))
-        response_data = self.perform_search(lat=lat, lng=lng, category=category,
-                                           area_size_meters=area_size_meters, grid_size=grid_size, overlap=overlap)
-        return Response(response_data)
+        try:
+            search_options = self._get_search_options(request)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        response_data = self.perform_search(lat=lat, lng=lng, category=category, **search_options)
+        return self._search_response(request, response_data)
 
 
 class ConsolidatedPlacesAPI(GooglePlacesHotelSearchView):
@@ -327,34 +1215,30 @@ class ConsolidatedPlacesAPI(GooglePlacesHotelSearchView):
     Returns JSON with `results` and `metadata` ready for frontend rendering.
     """
     def get(self, request):
+        if request.query_params.get('cursor'):
+            return self._cursor_response(request)
         try:
             address = request.query_params.get('address')
             lat = request.query_params.get('latitude')
             lng = request.query_params.get('longitude')
             category = self._get_category_from_request(request)
 
-            area_size_param = request.query_params.get('area_size')
-            area_size_meters = int(area_size_param) if area_size_param else 5000
-            grid_size = int(request.query_params.get('grid_size', 3))
-            overlap = float(request.query_params.get('overlap', 0.4))
+            try:
+                search_options = self._get_search_options(request)
+            except ValueError as e:
+                return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
             # Mode 1: address provided, use geocoding
             if address and not (lat and lng):
-                api_key = os.getenv('GOOGLE_PLACES_API_KEY')
-                if not api_key:
+                if not providers.get_provider().configured():
                     return Response({'error': 'Google API key is not configured'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-                geocode_url = 'https://places.googleapis.com/v1/places:searchText'
-                headers = {
-                    'Content-Type': 'application/json',
-                    'X-Goog-Api-Key': api_key,
-                    'X-Goog-FieldMask': 'places.location,places.formattedAddress'
-                }
-                payload = {'textQuery': address}
-                data = self._make_request_with_retry(url=geocode_url, headers=headers, json=payload, method='post')
-                if not data or 'places' not in data or not data['places']:
+                try:
+                    place = self._geocode_address(address, request.query_params.get('region', settings.GEOCODE_DEFAULT_REGION))
+                except requests.RequestException as e:
+                    return self._geocode_unavailable(address, e)
+                if not place:
                     return Response({'error': 'Address geocoding failed or no location found'}, status=status.HTTP_404_NOT_FOUND)
-                place = data['places'][0]
                 location = place.get('location', {})
                 lat = location.get('latitude')
                 lng = location.get('longitude')
@@ -373,114 +1257,325 @@ class ConsolidatedPlacesAPI(GooglePlacesHotelSearchView):
             else:
                 return Response({'error': 'Provide either address or latitude and longitude.'}, status=status.HTTP_400_BAD_REQUEST)
 
-            response_data = self.perform_search(lat=lat, lng=lng, category=category,
-                                                area_size_meters=area_size_meters, grid_size=grid_size, overlap=overlap)
-            return Response(response_data)
+            stream_format = request.query_params.get('stream', '').strip().lower()
+            if stream_format in ('ndjson', 'sse'):
+                try:
+                    fields = self._get_fields(request)
+                except ValueError as e:
+                    return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+                return self._streaming_response(
+                    stream_format, self.stream_search(lat=lat, lng=lng, category=category, **search_options), fields)
+
+            response_data = self.perform_search(lat=lat, lng=lng, category=category, **search_options)
+            return self._search_response(request, response_data)
         except Exception as e:
-            print(f"Consolidated API error: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            logger.exception('Consolidated API error')
             return Response({'error': f'Consolidated search failed: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+class BatchSearchMixin:
+    """Parsing and search helpers for the batch endpoints.
+
+    The batch views only queue searches and report on them, so they are plain `APIView`s
+    (a GET on `/api/search/batch/` is a 405, not a search); each search runs through a
+    `GooglePlacesHotelSearchView` helper instance.
+    """
+
+    def _search_view(self) -> GooglePlacesHotelSearchView:
+        return GooglePlacesHotelSearchView()
+
+    def _parse_batch_item(self, raw) -> Dict:
+        """Validate one batch job entry; raise ValueError describing what is wrong."""
+        if not isinstance(raw, dict):
+            raise ValueError('must be an object')
+        search = self._search_view()
+        item = {'category': ','.join(search._split_categories(raw.get('category') or 'hotels'))}
+        if raw.get('latitude') is not None and raw.get('longitude') is not None:
+            item['latitude'] = float(raw['latitude'])
+            item['longitude'] = float(raw['longitude'])
+        elif raw.get('address'):
+            item['address'] = str(raw['address'])
+            item['region'] = str(raw.get('region') or settings.GEOCODE_DEFAULT_REGION)
+        else:
+            raise ValueError('provide either address or latitude and longitude')
+        for key in ('area_size', 'grid_size', 'overlap', 'search_mode', 'tile_zoom', 'max_depth', 'max_pages'):
+            if raw.get(key) is not None:
+                item[key] = raw[key]
+        search._parse_search_options(item)
+        return item
+
+    def _run_batch_item(self, item: Dict) -> Dict:
+        """Run one batch job entry; the result keeps place IDs only, records stay in the place store."""
+        search = self._search_view()
+        lat, lng = item.get('latitude'), item.get('longitude')
+        if lat is None:
+            try:
+                place = search._geocode_address(item['address'], item['region'])
+            except requests.RequestException as e:
+                logger.warning('Geocoding failed for %s: %s', item['address'], e)
+                return {'error': f'Geocoding temporarily unavailable: {e}'}
+            location = place.get('location', {})
+            lat, lng = location.get('latitude'), location.get('longitude')
+            if lat is None or lng is None:
+                return {'error': 'Address geocoding failed or no location found'}
+        response_data = search.perform_search(lat=lat, lng=lng, category=item['category'],
+                                              concurrency=getattr(settings, 'BATCH_SEARCH_CONCURRENCY', 4),
+                                              **search._parse_search_options(item))
+        if 'error' in response_data:
+            return {'error': response_data['error']}
+        return {
+            'place_ids': [place['place_id'] for place in response_data['results']],
+            'matched': {place['place_id']: place['matched_categories'] for place in response_data['results']},
+            'metadata': response_data['metadata'],
+        }
+
+    def _batch_item_output(self, record: Dict, fields: List[str] = None) -> Dict:
+        """Client view of a finished batch item: its input plus results or error."""
+        output = {'index': record['index'], 'input': record['input'], 'status': record['status']}
+        if record['status'] == 'ok':
+            search = self._search_view()
+            records = search._load_result_records(record['place_ids'], record['matched'])
+            places = [records[place_id] for place_id in record['place_ids'] if place_id in records]
+            output['results'] = search._shape_results(places, fields)
+            output['metadata'] = record['metadata']
+        else:
+            output['error'] = record['error']
+        return output
+
+    def _get_fields(self, request):
+        return self._search_view()._get_fields(request)
+
+    def _streaming_response(self, stream_format: str, events, fields: List[str] = None) -> StreamingHttpResponse:
+        return self._search_view()._streaming_response(stream_format, events, fields)
+
+
+class BatchSearchAPI(BatchSearchMixin, APIView):
+    """Queue many searches at once: `POST {"jobs": [{"address": ...} | {"latitude": ..., "longitude": ...}, ...]}`.
+
+    Each job takes the same parameters as `/api/search/` (category, area_size, grid_size,
+    ...). Answers 202 with a job ID; the searches run in the background (see batch_jobs.py).
+    """
+    def post(self, request):
+        jobs = request.data.get('jobs') if isinstance(request.data, dict) else request.data
+        if not isinstance(jobs, list) or not jobs:
+            return Response({'error': 'Body must be {"jobs": [...]} with at least one job.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        max_jobs = getattr(settings, 'BATCH_MAX_JOBS', 1000)
+        if len(jobs) > max_jobs:
+            return Response({'error': f'At most {max_jobs} jobs per batch.'}, status=status.HTTP_400_BAD_REQUEST)
+        items = []
+        for index, raw in enumerate(jobs):
+            try:
+                items.append(self._parse_batch_item(raw))
+            except (TypeError, ValueError) as e:
+                return Response({'error': f'Job {index}: {str(e)}'}, status=status.HTTP_400_BAD_REQUEST)
+        job_id = batch_jobs.submit(items, self._run_batch_item)
+        return Response({
+            'job_id': job_id,
+            'total': len(items),
+            'status_url': request.build_absolute_uri(reverse('api-search-batch-status', args=[job_id])),
+            'results_url': request.build_absolute_uri(reverse('api-search-batch-results', args=[job_id])),
+        }, status=status.HTTP_202_ACCEPTED)
+
+
+class BatchSearchStatusAPI(APIView):
+    """Progress of a batch job."""
+    def get(self, request, job_id):
+        job = batch_jobs.status(job_id)
+        if job is None:
+            return Response({'error': 'Unknown or expired batch job.'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(job)
+
+
+class BatchSearchResultsAPI(BatchSearchMixin, APIView):
+    """Results of a batch job's finished searches, in submission order.
+
+    JSON by default; `?stream=ndjson` streams one line per search followed by a final
+    status line, and with `?wait=true` keeps the download open until every search is done.
+    """
+    def get(self, request, job_id):
+        job = batch_jobs.status(job_id)
+        if job is None:
+            return Response({'error': 'Unknown or expired batch job.'}, status=status.HTTP_404_NOT_FOUND)
+        try:
+            fields = self._get_fields(request)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        if request.query_params.get('stream', '').strip().lower() == 'ndjson':
+            wait = request.query_params.get('wait', '').strip().lower() in ('1', 'true', 'yes')
+            return self._streaming_response('ndjson', self._batch_events(job_id, job['total'], fields, wait))
+        items = batch_jobs.finished_items(job_id, job['total'])
+        return Response({'job': job, 'items': [self._batch_item_output(record, fields) for record in items]})
+
+    def _batch_events(self, job_id: str, total: int, fields: List[str] = None, wait: bool = False):
+        """One `search` event per finished item, in submission order, then the job's `status`."""
+        for record in batch_jobs.iter_items(job_id, total, wait=wait):
+            yield dict(self._batch_item_output(record, fields), type='search')
+        yield {'type': 'status', 'job': batch_jobs.status(job_id)}
+
+
+class PlaceDetailsAPI(GooglePlacesHotelSearchView):
+    """Rich details (phone, website, opening hours) for one place from a search result.
+
+    Fetched from Google on first request and cached for PLACES_DETAILS_TIMEOUT.
+    """
+    def get(self, request, place_id):
+        if not PLACE_ID_RE.match(place_id):
+            return Response({'error': 'Invalid place ID.'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            fields = self._get_fields(request)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            data = self._fetch_place_details(place_id)
+        except requests.RequestException as e:
+            return Response({'error': f'Place details temporarily unavailable: {str(e)}'},
+                            status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        if not data:
+            return Response({'error': 'Place not found.'}, status=status.HTTP_404_NOT_FOUND)
+        return Response({'result': self._shape_results([self.format_place_data(data, data)], fields)[0]})
+
+
+class PlaceDetailsBatchAPI(GooglePlacesHotelSearchView):
+    """Details for several places at once: `GET ?ids=a,b,c` or `POST {"ids": [...]}`.
+
+    Results keep the order of the requested IDs; IDs unknown upstream are listed under
+    `missing`, and IDs whose lookup failed (worth retrying) under `unavailable`.
+    """
+    def get(self, request):
+        return self._details_response(request, request.query_params.get('ids', '').split(','))
+
+    def post(self, request):
+        ids = request.data.get('ids') if isinstance(request.data, dict) else None
+        if not isinstance(ids, list):
+            return Response({'error': 'Body must be {"ids": [...]}.'}, status=status.HTTP_400_BAD_REQUEST)
+        return self._details_response(request, ids)
+
+    def _details_response(self, request, ids):
+        place_ids = []
+        for place_id in ids:
+            place_id = str(place_id).strip()
+            if place_id and place_id not in place_ids:
+                place_ids.append(place_id)
+        if not place_ids:
+            return Response({'error': 'At least one place ID is required.'}, status=status.HTTP_400_BAD_REQUEST)
+        max_ids = getattr(settings, 'PLACES_DETAILS_BATCH_MAX', 50)
+        if len(place_ids) > max_ids:
+            return Response({'error': f'At most {max_ids} place IDs per request.'}, status=status.HTTP_400_BAD_REQUEST)
+        invalid = [place_id for place_id in place_ids if not PLACE_ID_RE.match(place_id)]
+        if invalid:
+            return Response({'error': f"Invalid place IDs: {', '.join(invalid)}"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            fields = self._get_fields(request)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        unavailable = []
+        details = self._load_place_details(place_ids, unavailable)
+        return Response({
+            'results': self._shape_results([details[place_id] for place_id in place_ids if place_id in details], fields),
+            'missing': [place_id for place_id in place_ids if place_id not in details and place_id not in unavailable],
+            'unavailable': unavailable,
+        })
+
+
 class GoogleGeocodingView(APIView):
     def get(self, request):
         address = request.query_params.get('address')
-        region_code = request.query_params.get('region', 'in')  # Default to 'in' but allow override
-        
+        region_code = request.query_params.get('region', settings.GEOCODE_DEFAULT_REGION)  # Default to 'in' but allow override
+        invalid = self._check_geocode_request(address)
+        if invalid is not None:
+            return invalid
+
+        try:
+            logger.debug('Geocoding address: %s', address)
+            with metrics.phase('geocode'):
+                place = geocoding.geocode(address, region_code)
+            return self._geocode_response(address, place)
+        except Exception as e:
+            return self._geocode_error(e)
+
+    def _check_geocode_request(self, address: str):
+        """Error response for a request that cannot be geocoded, or None."""
         if not address:
             return Response(
                 {'error': 'Address parameter is required'}, 
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        api_key = os.getenv('GOOGLE_PLACES_API_KEY')
-        if not api_key:
+        if not providers.get_provider().configured():
             return Response(
                 {'error': 'Google API key is not configured'}, 
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
+        return None
 
-        url = "https://places.googleapis.com/v1/places:searchText"
-        headers = {
-            "Content-Type": "application/json",
-            "X-Goog-Api-Key": api_key,
-            "X-Goog-FieldMask": "places.formattedAddress,places.location,places.types,places.viewport"
-        }
-        payload = {
-            "textQuery": address,
-            "regionCode": region_code  # Use configured region code
-        }
+    def _geocode_error(self, e: Exception) -> Response:
+        if isinstance(e, UPSTREAM_REFUSED):
+            return Response(
+                {"error": f"Geocoding temporarily unavailable: {str(e)}"},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+        logger.warning('Places API error: %s', e)
+        return Response(
+            {"error": f"Failed to geocode address: {str(e)}"}, 
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
 
-        try:
-            print(f"Calling Places API for address: {address}")
-            response = requests.post(url, headers=headers, json=payload, timeout=15)
-            data = response.json()
-            
-            print(f"Places API response status: {response.status_code}")
-            print(f"Places API response: {data}")
-            
-            if "places" not in data or not data["places"]:
-                return Response(
-                    {"error": "No location found for this address"},
-                    status=status.HTTP_404_NOT_FOUND
-                )
+    def _geocode_response(self, address: str, place: Dict) -> Response:
+        """Shape a geocoding match (or None) into the `/geocode/` response."""
+        if not place:
+            return Response(
+                {"error": "No location found for this address"},
+                status=status.HTTP_404_NOT_FOUND
+            )
 
-            place = data["places"][0]
-            location = place.get("location", {})
-            
-            # Use viewport for search area if available, otherwise use default
-            viewport = place.get("viewport", {})
-            if viewport and viewport.get("high") and viewport.get("low"):
-                bounds = {
-                    'northeast': {
-                        'lat': viewport["high"]["latitude"],
-                        'lng': viewport["high"]["longitude"]
-                    },
-                    'southwest': {
-                        'lat': viewport["low"]["latitude"],
-                        'lng': viewport["low"]["longitude"]
-                    }
+        location = place.get("location", {})
+
+        # Use viewport for search area if available, otherwise use default
+        viewport = place.get("viewport", {})
+        if viewport and viewport.get("high") and viewport.get("low"):
+            bounds = {
+                'northeast': {
+                    'lat': viewport["high"]["latitude"],
+                    'lng': viewport["high"]["longitude"]
+                },
+                'southwest': {
+                    'lat': viewport["low"]["latitude"],
+                    'lng': viewport["low"]["longitude"]
                 }
-                # Use standard 5km area size for consistency
-                area_size = 5000
-            else:
-                # Default search area (5km radius for consistency)
-                area_size = 5000
-                bounds = {
-                    'northeast': {
-                        'lat': location["latitude"] + 0.045,  # Approximately 5km
-                        'lng': location["longitude"] + 0.045
-                    },
-                    'southwest': {
-                        'lat': location["latitude"] - 0.045,
-                        'lng': location["longitude"] - 0.045
-                    }
+            }
+            # Use standard 5km area size for consistency
+            area_size = 5000
+        else:
+            # Default search area (5km radius for consistency)
+            area_size = 5000
+            bounds = {
+                'northeast': {
+                    'lat': location["latitude"] + 0.045,  # Approximately 5km
+                    'lng': location["longitude"] + 0.045
+                },
+                'southwest': {
+                    'lat': location["latitude"] - 0.045,
+                    'lng': location["longitude"] - 0.045
                 }
-
-            response_data = {
-                'results': [{
-                    'formatted_address': place.get("formattedAddress", address),
-                    'geometry': {
-                        'location': {
-                            'lat': location["latitude"],
-                            'lng': location["longitude"]
-                        },
-                        'bounds': bounds
-                    },
-                    'area_info': {
-                        'type': place.get("types", ["UNKNOWN"])[0],
-                        'name': place.get("formattedAddress", address),
-                        'grid_size': 3,  # Match backend default (3x3 grid)
-                        'overlap': 0.4,  # Match backend default (40% overlap)
-                        'area_size': area_size
-                    }
-                }]
             }
-            return Response(response_data)
 
-        except Exception as e:
-            print(f"Places API error: {str(e)}")  # Debug log
-            return Response(
-                {"error": f"Failed to geocode address: {str(e)}"}, 
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
+        response_data = {
+            'results': [{
+                'formatted_address': place.get("formattedAddress", address),
+                'geometry': {
+                    'location': {
+                        'lat': location["latitude"],
+                        'lng': location["longitude"]
+                    },
+                    'bounds': bounds
+                },
+                'area_info': {
+                    'type': place.get("types", ["UNKNOWN"])[0],
+                    'name': place.get("formattedAddress", address),
+                    'grid_size': 3,  # Match backend default (3x3 grid)
+                    'overlap': 0.4,  # Match backend default (40% overlap)
+                    'area_size': area_size
+                }
+            }]
+        }
+        return Response(response_data)
@@ -1,3 +1,4 @@
+import logging
 import os
 import requests
 import math
@@ -8,6 +9,10 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from django.core.cache import cache
+import circuit_breaker
+import upstream
+
+logger = logging.getLogger(__name__)
 
 class GooglePlacesHotelSearchView(APIView):
     def _make_request_with_retry(self, url: str, headers: Dict, json: Dict = None, method: str = 'get', max_retries: int = 3) -> Dict:
@@ -20,29 +25,31 @@ class GooglePlacesHotelSearchView(APIView):
         
         for attempt in range(max_retries):
             try:
-                # Add SSL verification bypass for Render deployment
-                session = requests.Session()
-                session.verify = False  # Bypass SSL verification
+                # Reuse the pooled upstream client; keep the SSL verification bypass for Render deployment
+                client = upstream.get_client()
                 
                 if method.lower() == 'post':
-                    response = session.post(url, headers=headers, json=json, timeout=30)
+                    response = client.post(url, headers=headers, json=json, timeout=30, verify=False)
                 else:
-                    response = session.get(url, headers=headers, timeout=30)
+                    response = client.get(url, headers=headers, timeout=30, verify=False)
                 
                 # For 400 errors, return empty dict immediately as these won't succeed with retry
                 if response.status_code == 400:
-                    error_msg = f"Bad request for {url}"
-                    if hasattr(response, 'text'):
-                        error_msg += f"\nResponse: {response.text}"
-                    print(error_msg)
+                    # The body can echo the request back; keep it out of the default log level
+                    logger.warning('Bad request for %s', url)
+                    logger.debug('Upstream response for %s: %s', url, getattr(response, 'text', ''))
                     return {}
                 
                 response.raise_for_status()
                 return response.json()
+            except circuit_breaker.CircuitOpen as e:
+                # Retrying while the circuit is open would only wait out the backoff
+                logger.warning('Skipping request to %s: %s', url, e)
+                return {"results": [], "error": "API temporarily unavailable"}
             except Exception as e:
-                print(f"Request attempt {attempt + 1} failed: {str(e)}")
+                logger.info('Request attempt %s failed: %s', attempt + 1, e)
                 if attempt == max_retries - 1:  # Last attempt failed
-                    print(f"All {max_retries} attempts failed for {url}: {str(e)}")
+                    logger.warning('All %s attempts failed for %s: %s', max_retries, url, e)
                     # Return a mock response to prevent total failure
                     return {"results": [], "error": "API temporarily unavailable"}
                 time.sleep(2 * (attempt + 1))  # Progressive delay
@@ -181,7 +188,7 @@ class GooglePlacesHotelSearchView(APIView):
 
                     # Make the API request
                     try:
-                        response = requests.post(url, headers=headers, json=payload)
+                        response = upstream.get_client().post(url, headers=headers, json=payload, timeout=None)
                         if response.status_code == 200:
                             data = response.json()
                             if 'places' in data:
@@ -214,7 +221,7 @@ class GooglePlacesHotelSearchView(APIView):
                                         places[place_id] = formatted_place
 
                     except requests.exceptions.RequestException as e:
-                        print(f"Error in grid cell ({i},{j}): {e}")
+                        logger.warning('Error in grid cell (%s,%s): %s', i, j, e)
                         continue  # Skip this cell and continue with the next one
 
         # Prepare final response with metadata